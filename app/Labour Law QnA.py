@@ -1,11 +1,17 @@
 import streamlit as st
 import time
-from jamaibase import JamAI, types as t
 import tempfile
+from answer_cache import get_cached_answer, get_fallback_answer, remember_answer, answer_cache
+from statute_index import retrieve_sections, format_sections
+from jamai_gateway import gateway, add_action_rows, get_jamai, CircuitOpenError, INTERACTIVE
+import session_store
+import chat_history
+import warmup
+import rerun_profiler
+from config import CHAT_PAGE_SIZE
 
 JAMAI_API_KEY = st.secrets["JAMAI_API_KEY"]
 JAMAI_PROJECT_ID = st.secrets["JAMAI_PROJECT_ID"]
-jamai = JamAI(project_id=JAMAI_PROJECT_ID, token=JAMAI_API_KEY)
 
 
 # --- Page navigation state ---
@@ -19,6 +25,8 @@ st.set_page_config(
     initial_sidebar_state="expanded", 
     layout="wide"
 )
+rerun_profiler.profile_rerun("qna")
+warmup.prewarm("chat", (JAMAI_PROJECT_ID, JAMAI_API_KEY))
 
 
 st.markdown("""
@@ -81,6 +89,26 @@ with st.sidebar:
     </div>
     """, unsafe_allow_html=True)
 
+    cache_stats = answer_cache.stats()
+    if cache_stats["hits"] + cache_stats["misses"]:
+        st.caption(
+            f"⚡ Answer cache: {cache_stats['hit_rate']:.0%} hit rate "
+            f"({cache_stats['hits']} hits / {cache_stats['misses']} misses, {cache_stats['entries']} cached)"
+        )
+
+    gateway_stats = gateway.stats()
+    if gateway_stats["calls"]:
+        st.caption(
+            f"🚦 JamAI: {gateway_stats['in_flight']} running, {gateway_stats['queue_depth']} queued "
+            f"(limit {gateway_stats['concurrency_limit']}, p95 wait {gateway_stats['wait_p95_s']:.2f}s)"
+        )
+        st.caption("⚖️ p95 wait by priority: " + ", ".join(
+            f"{name} {c['wait_p95_s']:.2f}s ({c['queued']} queued)"
+            for name, c in gateway_stats["classes"].items() if c["samples"] or c["queued"]
+        ))
+
+rerun_profiler.render_sidebar()
+
 # --- Page: Chat ---
 
 st.title("⚖️ Malaysian Labour Law Assistant")
@@ -90,72 +118,108 @@ if "messages" not in st.session_state:
     st.session_state.messages = [
         {"role": "assistant", "content": "Hello! I'm your AI Assistant. How can I help you today?"}
     ]
+    # Restore a saved transcript when the URL carries its chat id (e.g. after a reload)
+    chat_id = st.query_params.get("chat")
+    saved = chat_history.load_transcript(chat_id)
+    if not saved:
+        chat_id = chat_history.new_chat_id()
+    st.session_state.chat_id = chat_id
+    st.session_state.messages += [
+        chat_history.new_message(role, content, session_store.current_session_id()) for role, content in saved
+    ]
+    st.query_params["chat"] = chat_id
+
+if "chat_shown" not in st.session_state:
+    st.session_state.chat_shown = CHAT_PAGE_SIZE
 
-# Persistent conversation history string for JamAI
-if "conversation_history" not in st.session_state:
-    st.session_state.conversation_history = ""  # <-- store full chat here
+# Message contents (and their rendered HTML) live in the session blob store; session state only keeps handles
+def add_message(role: str, content: str):
+    st.session_state.messages.append(
+        chat_history.new_message(role, content, session_store.current_session_id())
+    )
+    chat_history.append_transcript(st.session_state.chat_id, role, content)
 
-# Render chat history
+def message_text(message: dict) -> str:
+    return session_store.get(message["content"], session_store.current_session_id()) or ""
+
+# Render chat history (only the most recent window; older messages load on demand)
 chat_container = st.container()
 with chat_container:
-    for message in st.session_state.messages:
+    first = chat_history.window_start(len(st.session_state.messages), st.session_state.chat_shown)
+    if first > 0 and st.button(f"⬆️ Load earlier messages ({first} hidden)", key="load_earlier"):
+        st.session_state.chat_shown += CHAT_PAGE_SIZE
+        st.rerun()
+
+    session_id = session_store.current_session_id()
+    for message in st.session_state.messages[first:]:
         with st.chat_message(message["role"]):
-            st.markdown(message["content"])
+            body, is_html = chat_history.render_args(message, session_id)
+            st.markdown(body, unsafe_allow_html=is_html)
 
 # Chat input at the bottom
 user_input = st.chat_input("Ask a question", key="input_box")
 
 if user_input:
     # Store new user message
-    st.session_state.messages.append({"role": "user", "content": user_input})
-
-    # Append to conversation history
-    st.session_state.conversation_history += f"User: {user_input}\n"
+    add_message("user", user_input)
 
     st.rerun()
 
 # Process user input with JamAI
 if st.session_state.messages[-1]["role"] == "user":
-    user_query = st.session_state.messages[-1]["content"]
+    user_query = message_text(st.session_state.messages[-1])
     CHATBOT_ACTION_TABLE_ID = st.secrets["JAMAI_CHATBOT_ACTION_TABLE_ID"] # type: ignore
 
-    history_text = st.session_state.conversation_history.strip()
-
-    # ---- SEND to JamAI with History ----
-    try:
-        response = jamai.table.add_table_rows(
-            table_type=t.TableType.ACTION,
-            request=t.MultiRowAddRequest(
-                table_id=CHATBOT_ACTION_TABLE_ID,
-                data=[{
-                    "User": history_text + user_query,
+    # Rebuilt from the message handles (greeting excluded), last CHAT_HISTORY_MESSAGES only
+    history_text = chat_history.conversation_history(
+        st.session_state.messages[1:], session_store.current_session_id()
+    ).strip()
+
+    # ---- Near-duplicate of an already answered standalone question? ----
+    ai_response_text = get_cached_answer(user_query)
+
+    if ai_response_text is None:
+        # ---- Relevant statute sections from the local index (empty if not built) ----
+        law_context = format_sections(retrieve_sections([user_query]))
+        if law_context:
+            law_context += "\n\n"
+
+        # ---- SEND to JamAI with History ----
+        try:
+            response = gateway.call_hedged(
+                "chat",
+                add_action_rows,
+                CHATBOT_ACTION_TABLE_ID,
+                [{
+                    "User": law_context + history_text + user_query,
                 }],
-                stream=False
+                client=get_jamai(JAMAI_PROJECT_ID, JAMAI_API_KEY),
+                priority=INTERACTIVE
             )
-        )
-    except Exception as e:
-        st.error(f"❌ JamAI API error: {e}")
-        st.stop()
-    
-    row = response.rows[0]
-    ai_response_obj = row.columns.get("Final")
-
-    if ai_response_obj:
-        ai_response_text = ai_response_obj.text
-    else:
-        ai_response_text = "⚠️ No response returned. Check JamAI column names."
-
-    ai_response_text = ai_response_text.replace("\\n", "\n")
-
-    def preserve_indentation(text: str):
-        fixed_lines = []
-        for line in text.split("\n"):
-            leading_spaces = len(line) - len(line.lstrip(" "))
-            fixed_line = "&nbsp;" * leading_spaces + line.lstrip(" ")
-            fixed_lines.append(fixed_line)
-        return "<br>".join(fixed_lines)
-
-    safe_markdown = preserve_indentation(ai_response_text)
+        except (CircuitOpenError, TimeoutError) as e:
+            # JamAI is unhealthy: answer from a looser cache match rather than make the user wait
+            response = None
+            ai_response_text = get_fallback_answer(user_query)
+            if ai_response_text is None:
+                st.error(f"❌ JamAI is temporarily unavailable, please try again shortly. ({e})")
+                st.stop()
+            st.warning("⚠️ JamAI is temporarily unavailable. Showing the closest previously answered question.")
+        except Exception as e:
+            st.error(f"❌ JamAI API error: {e}")
+            st.stop()
+
+        if response is not None:
+            row = response.rows[0]
+            ai_response_obj = row.columns.get("Final")
+
+            if ai_response_obj:
+                ai_response_text = ai_response_obj.text.replace("\\n", "\n")
+                # Only standalone questions are cached (see answer_cache.is_standalone_question)
+                remember_answer(user_query, ai_response_text)
+            else:
+                ai_response_text = "⚠️ No response returned. Check JamAI column names."
+
+    safe_markdown = chat_history.preserve_indentation(ai_response_text)
 
     with chat_container:
         with st.chat_message("assistant"):
@@ -170,11 +234,6 @@ if st.session_state.messages[-1]["role"] == "user":
 
             msg_box.markdown(streamed_html, unsafe_allow_html=True)
 
-    st.session_state.messages.append({
-        "role": "assistant",
-        "content": ai_response_text
-    })
-
-    st.session_state.conversation_history += f"Assistant: {ai_response_text}\n"
+    add_message("assistant", ai_response_text)
 
     st.stop()
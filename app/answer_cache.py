@@ -0,0 +1,179 @@
+# answer_cache.py
+import math
+import re
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+from config import (
+    QA_CACHE_ENABLED, QA_CACHE_SIMILARITY, QA_CACHE_FALLBACK_SIMILARITY, QA_CACHE_TTL_SECONDS, QA_CACHE_MAX_ENTRIES
+)
+
+# Words that carry no meaning for matching (English + common Malay)
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "to", "of", "in", "on", "for", "and", "or",
+    "do", "does", "did", "can", "could", "should", "would", "will", "i", "my", "me", "we", "our",
+    "you", "your", "what", "whats", "how", "much", "many", "please", "tell", "about", "there", "any",
+    "malaysia", "malaysian", "under", "with", "by", "as", "at", "if", "have", "has", "get", "am",
+    "apa", "berapa", "adakah", "bagaimana", "saya", "kami", "di", "ke", "dan", "atau", "untuk",
+    "yang", "ini", "boleh", "tolong", "ialah", "adalah"
+}
+
+# Phrases that refer back to earlier turns -> the answer depends on the conversation
+FOLLOW_UP_PATTERN = re.compile(
+    r"\b(it|its|that|this|these|those|they|them|he|she|his|her|above|previous|earlier|"
+    r"same|also|again|instead|what about|how about|and if|then|itu|tersebut|tadi|dia|juga)\b"
+)
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace."""
+    text = question.lower().replace("'", "")
+    text = re.sub(r"[^a-z0-9%]+", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def tokenize(question: str) -> list:
+    words = [w for w in normalize_question(question).split() if w not in STOPWORDS]
+    # Crude plural folding so "holidays" matches "holiday"
+    words = [w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w for w in words]
+    bigrams = [f"{a}_{b}" for a, b in zip(words, words[1:])]
+    return words + bigrams
+
+
+def is_standalone_question(question: str) -> bool:
+    """
+    True if the question can be answered without the chat history.
+    Follow-ups ("what about part-timers?", "is that the same for Sabah?") are never cached.
+    """
+    normalized = normalize_question(question)
+    if FOLLOW_UP_PATTERN.search(normalized):
+        return False
+    # Very short questions ("why?", "and overtime") usually lean on context
+    return len([w for w in normalized.split() if w not in STOPWORDS]) >= 2
+
+
+class AnswerCache:
+    """
+    In-process cache of chatbot answers keyed by question similarity.
+    Questions are compared with TF-IDF cosine similarity over word unigrams
+    and bigrams; an inverted index limits scoring to entries sharing a term.
+    """
+
+    def __init__(self, threshold: float, ttl_seconds: int, max_entries: int):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = {}        # id -> {"terms": Counter, "answer": str, "question": str, "created": float}
+        self._postings = {}       # term -> set(entry ids)
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0          # Follow-up questions that bypassed the cache
+
+    # --- internal helpers (caller holds the lock) ---
+    def _idf(self, term: str) -> float:
+        df = len(self._postings.get(term, ()))
+        return math.log((1 + len(self._entries)) / (1 + df)) + 1
+
+    def _vector(self, terms: Counter) -> dict:
+        vec = {term: count * self._idf(term) for term, count in terms.items()}
+        norm = math.sqrt(sum(w * w for w in vec.values())) or 1.0
+        return {term: w / norm for term, w in vec.items()}
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        for term in entry["terms"]:
+            ids = self._postings.get(term)
+            if ids:
+                ids.discard(entry_id)
+                if not ids:
+                    del self._postings[term]
+
+    def _evict(self):
+        now = time.time()
+        expired = [i for i, e in self._entries.items() if now - e["created"] > self.ttl_seconds]
+        for entry_id in expired:
+            self._remove(entry_id)
+        # Oldest first once over capacity
+        while len(self._entries) > self.max_entries:
+            self._remove(min(self._entries, key=lambda i: self._entries[i]["created"]))
+
+    # --- public API ---
+    def lookup(self, question: str, threshold: Optional[float] = None) -> Optional[str]:
+        """Returns a cached answer for a sufficiently similar standalone question."""
+        threshold = self.threshold if threshold is None else threshold
+        if not is_standalone_question(question):
+            with self._lock:
+                self.skipped += 1
+            return None
+
+        terms = Counter(tokenize(question))
+        with self._lock:
+            self._evict()
+            candidates = set()
+            for term in terms:
+                candidates |= self._postings.get(term, set())
+
+            query = self._vector(terms)
+            best_id, best_score = None, 0.0
+            for entry_id in candidates:
+                vec = self._vector(self._entries[entry_id]["terms"])
+                score = sum(w * vec.get(term, 0.0) for term, w in query.items())
+                if score > best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is not None and best_score >= threshold:
+                self.hits += 1
+                print(f"⚡ Answer cache hit ({best_score:.2f}): {self._entries[best_id]['question']}")
+                return self._entries[best_id]["answer"]
+            self.misses += 1
+            return None
+
+    def store(self, question: str, answer: str):
+        """Caches an answer, but only for questions that don't depend on the chat history."""
+        if not answer or not is_standalone_question(question):
+            return
+        terms = Counter(tokenize(question))
+        if not terms:
+            return
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = {
+                "terms": terms, "answer": answer, "question": question, "created": time.time()
+            }
+            for term in terms:
+                self._postings.setdefault(term, set()).add(entry_id)
+            self._evict()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "skipped": self.skipped,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+# Shared by every chat session in this server process
+answer_cache = AnswerCache(QA_CACHE_SIMILARITY, QA_CACHE_TTL_SECONDS, QA_CACHE_MAX_ENTRIES)
+
+
+def get_cached_answer(question: str) -> Optional[str]:
+    return answer_cache.lookup(question) if QA_CACHE_ENABLED else None
+
+
+def get_fallback_answer(question: str) -> Optional[str]:
+    """Looser match used only while JamAI is unavailable (better than no answer)."""
+    return answer_cache.lookup(question, QA_CACHE_FALLBACK_SIMILARITY) if QA_CACHE_ENABLED else None
+
+
+def remember_answer(question: str, answer: str):
+    if QA_CACHE_ENABLED:
+        answer_cache.store(question, answer)
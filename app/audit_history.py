@@ -0,0 +1,319 @@
+# audit_history.py
+"""
+Persistent history of contract audits (SQLite, stdlib only).
+
+Every validated audit is recorded with its violations, risk tags, extracted
+employee facts and calculate_liability() totals, so compliance questions
+("which employers have overtime violations?", "likely liability by month")
+are answered from the store instead of re-auditing. Detail rows are kept
+for drill-down; the aggregations read small rollup tables (keyed by
+employer, violation category and day / month) that are updated in the same
+transaction as each audit, so query time doesn't grow with the audit count.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from config import CACHE_DIR, AUDIT_HISTORY_ENABLED
+
+DB_PATH = os.path.join(CACHE_DIR, "audit_history.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS audits (
+    id INTEGER PRIMARY KEY,
+    audit_key TEXT NOT NULL UNIQUE,         -- sha1 of the contract text
+    employer TEXT NOT NULL,
+    employee_name TEXT,
+    position TEXT,
+    file_name TEXT,
+    audited_at TEXT NOT NULL,               -- ISO timestamp
+    violation_count INTEGER NOT NULL,
+    total_likely REAL NOT NULL,
+    total_worst REAL NOT NULL,
+    employee_facts TEXT,                    -- JSON
+    report TEXT                             -- JSON (full report, for drill-down)
+);
+CREATE TABLE IF NOT EXISTS violations (
+    audit_id INTEGER NOT NULL REFERENCES audits(id) ON DELETE CASCADE,
+    employer TEXT NOT NULL,
+    category TEXT NOT NULL,
+    status TEXT,
+    audited_at TEXT NOT NULL,
+    clause_text TEXT
+);
+CREATE TABLE IF NOT EXISTS risk_items (
+    audit_id INTEGER NOT NULL REFERENCES audits(id) ON DELETE CASCADE,
+    employer TEXT NOT NULL,
+    calc_tag TEXT NOT NULL,
+    violation_name TEXT,
+    audited_at TEXT NOT NULL
+);
+-- Rollups at two grains: 'D' (period = YYYY-MM-DD) and 'M' (period = YYYY-MM)
+CREATE TABLE IF NOT EXISTS liability_rollup (
+    grain TEXT NOT NULL,
+    employer TEXT NOT NULL,
+    period TEXT NOT NULL,
+    audits INTEGER NOT NULL,
+    total_likely REAL NOT NULL,
+    total_worst REAL NOT NULL,
+    PRIMARY KEY (grain, employer, period)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS violation_rollup (
+    grain TEXT NOT NULL,
+    category TEXT NOT NULL,
+    employer TEXT NOT NULL,
+    period TEXT NOT NULL,
+    audits INTEGER NOT NULL,                -- audits with at least one violation in this category
+    violations INTEGER NOT NULL,
+    PRIMARY KEY (grain, category, employer, period)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_audits_employer ON audits(employer, audited_at);
+CREATE INDEX IF NOT EXISTS idx_audits_date ON audits(audited_at);
+CREATE INDEX IF NOT EXISTS idx_violations_category ON violations(category, employer, audited_at);
+CREATE INDEX IF NOT EXISTS idx_violations_audit ON violations(audit_id);
+CREATE INDEX IF NOT EXISTS idx_risk_items_tag ON risk_items(calc_tag, employer, audited_at);
+CREATE INDEX IF NOT EXISTS idx_risk_items_audit ON risk_items(audit_id);
+CREATE INDEX IF NOT EXISTS idx_liability_rollup_period ON liability_rollup(grain, period, employer, audits, total_likely, total_worst);
+CREATE INDEX IF NOT EXISTS idx_violation_rollup_employer ON violation_rollup(grain, employer, period, category, audits, violations);
+CREATE INDEX IF NOT EXISTS idx_violation_rollup_period ON violation_rollup(grain, period, category, employer, audits, violations);
+"""
+
+# "ABC Sdn. Bhd." / "XYZ Berhad" style company names in the contract body
+EMPLOYER_PATTERN = re.compile(
+    r"\b((?:[A-Z][\w&.'-]*\s+){1,6}(?:Sdn\.?\s?Bhd|Berhad|Bhd|Enterprise|PLT)\b\.?)"
+)
+
+_init_lock = threading.Lock()
+_initialized = False
+
+
+def _connect() -> sqlite3.Connection:
+    """New connection per call (Streamlit runs sessions on different threads)."""
+    global _initialized
+    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+    if not _initialized:
+        with _init_lock:
+            if not _initialized:
+                conn.execute("PRAGMA journal_mode = WAL")   # Readers don't block the writer
+                conn.executescript(SCHEMA)
+                _initialized = True
+    return conn
+
+
+def find_employer(employee_facts: Dict[str, Any], contract_text: str = "") -> str:
+    """Employer from the extracted facts, else the first company name in the contract."""
+    for key in ["employer_name", "company_name", "employer"]:
+        value = str(employee_facts.get(key) or "").strip()
+        if value:
+            return value
+    match = EMPLOYER_PATTERN.search(contract_text or "")
+    return match.group(1).strip(" ,") if match else "Unknown"
+
+
+def _risk_items(contract_risk: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # Same fallbacks as calculate_liability()
+    return (contract_risk or {}).get("risk_assessment") or (contract_risk or {}).get("violations") or []
+
+
+def _update_rollups(conn: sqlite3.Connection, employer: str, day: str, likely: float, worst: float,
+                    category_counts: Dict[str, int], sign: int):
+    """Adds (sign=1) or removes (sign=-1) one audit's contribution to the rollups."""
+    for grain, period in [("D", day), ("M", day[:7])]:
+        conn.execute(
+            "INSERT INTO liability_rollup (grain, employer, period, audits, total_likely, total_worst) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (grain, employer, period) DO UPDATE SET audits = audits + excluded.audits, "
+            "total_likely = total_likely + excluded.total_likely, total_worst = total_worst + excluded.total_worst",
+            (grain, employer, period, sign, sign * likely, sign * worst)
+        )
+        conn.executemany(
+            "INSERT INTO violation_rollup (grain, category, employer, period, audits, violations) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (grain, category, employer, period) DO UPDATE SET audits = audits + excluded.audits, "
+            "violations = violations + excluded.violations",
+            [(grain, category, employer, period, sign, sign * count) for category, count in category_counts.items()]
+        )
+        if sign < 0:
+            for table in ["liability_rollup", "violation_rollup"]:
+                conn.execute(
+                    f"DELETE FROM {table} WHERE grain = ? AND employer = ? AND period = ? AND audits <= 0",
+                    (grain, employer, period)
+                )
+
+
+def _forget_audit(conn: sqlite3.Connection, audit_key: str):
+    """Removes an earlier audit of the same contract (detail rows and rollups)."""
+    old = conn.execute(
+        "SELECT id, employer, audited_at, total_likely, total_worst FROM audits WHERE audit_key = ?", (audit_key,)
+    ).fetchone()
+    if old is None:
+        return
+    counts = dict(conn.execute(
+        "SELECT category, COUNT(*) FROM violations WHERE audit_id = ? GROUP BY category", (old["id"],)
+    ).fetchall())
+    _update_rollups(conn, old["employer"], old["audited_at"][:10], old["total_likely"], old["total_worst"], counts, -1)
+    conn.execute("DELETE FROM audits WHERE id = ?", (old["id"],))
+
+
+def record_audit(contract_text: str, report: Dict[str, Any], liability: Dict[str, Any], file_name: str = "",
+                 audited_at: Optional[datetime] = None) -> Optional[int]:
+    """
+    Stores (or replaces, for the same contract text) one audit. Returns its id,
+    or None if history is disabled or the write failed.
+    """
+    if not AUDIT_HISTORY_ENABLED or not report:
+        return None
+
+    audit_key = hashlib.sha1(contract_text.encode("utf-8")).hexdigest()
+    audited_at = (audited_at or datetime.now()).isoformat(timespec="seconds")
+    facts = report.get("employee_data") or {}
+    employer = find_employer(facts, contract_text)
+    clauses = report.get("violations") or []
+    liability = liability or {}
+    likely = float(liability.get("total_likely_liability", 0.0) or 0.0)
+    worst = float(liability.get("total_worst_case_liability", 0.0) or 0.0)
+    violation_rows = [
+        (str(category).strip().lower(), details.get("status") if isinstance(details, dict) else None, clause.get("text", ""))
+        for clause in clauses
+        for category, details in (clause.get("illegal", {}) or {}).items()
+    ]
+
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                _forget_audit(conn, audit_key)
+                audit_id = conn.execute(
+                    "INSERT INTO audits (audit_key, employer, employee_name, position, file_name, audited_at, "
+                    "violation_count, total_likely, total_worst, employee_facts, report) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        audit_key, employer,
+                        facts.get("employee_name"), facts.get("position_title"), file_name,
+                        audited_at,
+                        len(violation_rows), likely, worst,
+                        json.dumps(facts, ensure_ascii=False, default=str),
+                        json.dumps(report, ensure_ascii=False, default=str)
+                    )
+                ).lastrowid
+
+                conn.executemany(
+                    "INSERT INTO violations (audit_id, employer, category, status, audited_at, clause_text) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(audit_id, employer, category, status, audited_at, text) for category, status, text in violation_rows]
+                )
+                conn.executemany(
+                    "INSERT INTO risk_items (audit_id, employer, calc_tag, violation_name, audited_at) VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (audit_id, employer,
+                         item.get("calc_tag") or item.get("calculation_tag") or "CALC_NONE",
+                         item.get("violation_name") or item.get("violation_type") or "Issue",
+                         audited_at)
+                        for item in _risk_items(report.get("contract_risk")) if isinstance(item, dict)
+                    ]
+                )
+                _update_rollups(
+                    conn, employer, audited_at[:10], likely, worst, Counter(row[0] for row in violation_rows), 1
+                )
+            print(f"🗄️ Audit recorded for {employer} (#{audit_id})")
+            return audit_id
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"⚠️ Could not record audit history: {e}")
+        return None
+
+
+# ------------------ QUERY API ------------------
+# Dates are inclusive "YYYY-MM-DD" strings (or datetime.date)
+def _filters(employer: Optional[str], since, until):
+    """
+    WHERE clauses + params over a rollup table. Month rollups are used unless
+    the date range starts or ends part-way through a month.
+    """
+    since = str(since) if since else None
+    until = str(until) if until else None
+    month_aligned = (not since or since.endswith("-01")) and (
+        not until or (date.fromisoformat(until) + timedelta(days=1)).day == 1
+    )
+    if month_aligned:
+        grain, since, until = "M", since and since[:7], until and until[:7]
+    else:
+        grain = "D"
+
+    clauses, params = ["grain = ?"], [grain]
+    if employer:
+        clauses.append("employer = ?")
+        params.append(employer)
+    if since:
+        clauses.append("period >= ?")
+        params.append(since)
+    if until:
+        clauses.append("period <= ?")
+        params.append(until)
+    return clauses, params
+
+
+def _where(clauses: List[str]) -> str:
+    return f"WHERE {' AND '.join(clauses)}"
+
+
+def _query(sql: str, params: list) -> List[Dict[str, Any]]:
+    conn = _connect()
+    try:
+        return [dict(row) for row in conn.execute(sql, params)]
+    finally:
+        conn.close()
+
+
+def employers_with_violation(category: str, since=None, until=None) -> List[Dict[str, Any]]:
+    """Employers with at least one violation in `category`, most affected first."""
+    clauses, params = _filters(None, since, until)
+    return _query(
+        "SELECT employer, SUM(audits) AS audits, SUM(violations) AS violations, MAX(period) AS last_seen "
+        f"FROM violation_rollup {_where(clauses + ['category = ?'])} GROUP BY employer ORDER BY violations DESC",
+        params + [category.strip().lower()]
+    )
+
+
+def liability_by_month(employer: Optional[str] = None, since=None, until=None) -> List[Dict[str, Any]]:
+    """Likely / worst-case liability totals per YYYY-MM."""
+    clauses, params = _filters(employer, since, until)
+    return _query(
+        "SELECT substr(period, 1, 7) AS month, SUM(audits) AS audits, SUM(total_likely) AS total_likely, "
+        f"SUM(total_worst) AS total_worst FROM liability_rollup {_where(clauses)} GROUP BY month ORDER BY month",
+        params
+    )
+
+
+def violations_by_category(employer: Optional[str] = None, since=None, until=None) -> List[Dict[str, Any]]:
+    """Violation counts per category."""
+    clauses, params = _filters(employer, since, until)
+    return _query(
+        "SELECT category, SUM(violations) AS violations, COUNT(DISTINCT employer) AS employers "
+        f"FROM violation_rollup {_where(clauses)} GROUP BY category ORDER BY violations DESC",
+        params
+    )
+
+
+def recent_audits(employer: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+    where = "WHERE employer = ?" if employer else ""
+    return _query(
+        "SELECT id, employer, employee_name, position, file_name, audited_at, violation_count, total_likely, total_worst "
+        f"FROM audits {where} ORDER BY audited_at DESC LIMIT ?",
+        ([employer] if employer else []) + [limit]
+    )
+
+
+def list_employers() -> List[str]:
+    return [row["employer"] for row in _query("SELECT DISTINCT employer FROM liability_rollup WHERE grain = 'M' ORDER BY employer", [])]
+
+
+def list_categories() -> List[str]:
+    return [row["category"] for row in _query("SELECT DISTINCT category FROM violation_rollup WHERE grain = 'M' ORDER BY category", [])]
@@ -0,0 +1,136 @@
+# cancellation.py
+"""
+Cancellation tokens with optional deadlines for long-running engine calls.
+
+Engine entry points (check_full_contract, check_contract_revision, the
+contract generators, the termination checks) take `cancel=`. The token is
+checked between stages and passed down to the gateway, which drops queued
+calls, retries and hedges, stops streams and stops waiting on in-flight
+requests once it fires. A non-streaming request JamAI is already working on
+can't be aborted (the jamaibase client has no per-request cancel): it runs
+to completion and the gateway counts it as abandoned. A child token fires with its parent, so a page can
+cancel everything it started for a file with one call.
+
+session_token() hands out a token that fires when the Streamlit session
+ends (tab closed and the session expired); pages keep one per session and
+hang the tokens of individual runs off it.
+"""
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Any, Optional
+
+from config import CANCEL_POLL_INTERVAL_S, SESSION_REAP_INTERVAL_S
+
+
+class OperationCancelled(Exception):
+    """Raised inside an engine call whose token was cancelled or ran past its deadline."""
+
+
+class CancelToken:
+    def __init__(self, deadline_s: Optional[float] = None, parent: Optional["CancelToken"] = None):
+        self.deadline = time.monotonic() + deadline_s if deadline_s is not None else None
+        self.parent = parent
+        self.reason = None
+        self._event = threading.Event()
+
+    def cancel(self, reason: str = "cancelled"):
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        if self._event.is_set():
+            return True
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel("deadline exceeded")
+            return True
+        if self.parent is not None and self.parent.cancelled:
+            self.cancel(self.parent.reason)
+            return True
+        return False
+
+    def check(self, stage: str = ""):
+        """Raises OperationCancelled if the token has fired."""
+        if self.cancelled:
+            raise OperationCancelled(f"{self.reason}{f' before {stage}' if stage else ''}")
+
+    def sleep(self, seconds: float):
+        """time.sleep() that wakes up (and raises) as soon as the token fires."""
+        end = time.monotonic() + seconds
+        while True:
+            self.check()
+            left = end - time.monotonic()
+            if left <= 0:
+                return
+            self._event.wait(min(left, CANCEL_POLL_INTERVAL_S))
+
+
+def check(cancel: Optional[CancelToken], stage: str = ""):
+    """cancel.check(stage) for an optional token."""
+    if cancel is not None:
+        cancel.check(stage)
+
+
+def wait_future(future: Future, cancel: Optional[CancelToken]) -> Any:
+    """
+    future.result(), but raises OperationCancelled as soon as the token fires.
+    The future itself keeps running; its result is simply not waited for.
+    """
+    if cancel is None:
+        return future.result()
+    while True:
+        cancel.check()
+        try:
+            return future.result(CANCEL_POLL_INTERVAL_S)
+        except FutureTimeout:
+            pass
+
+
+# ------------------ Session-scoped tokens ------------------
+_lock = threading.Lock()
+_session_tokens = {}        # session id -> [tokens to fire when the session ends]
+_reaper = None
+
+
+def _session_alive(session_id: str) -> bool:
+    try:
+        from streamlit.runtime import Runtime
+        if not Runtime.exists():
+            return True
+        return Runtime.instance().is_active_session(session_id)
+    except Exception:
+        return True     # Can't tell (outside Streamlit / older version): never cancel
+
+
+def _reap_ended_sessions():
+    while True:
+        time.sleep(SESSION_REAP_INTERVAL_S)
+        with _lock:
+            sessions = list(_session_tokens)
+        for session_id in sessions:
+            if _session_alive(session_id):
+                with _lock:
+                    # Forget tokens that already fired
+                    tokens = _session_tokens.get(session_id, [])
+                    tokens[:] = [t for t in tokens if not t.cancelled]
+                continue
+            with _lock:
+                tokens = _session_tokens.pop(session_id, [])
+            if tokens:
+                print(f"🛑 Session {session_id[:8]} ended, cancelling its running work")
+            for token in tokens:
+                token.cancel("session ended")
+
+
+def session_token(session_id: str) -> CancelToken:
+    """New token that is cancelled when this Streamlit session ends."""
+    global _reaper
+    token = CancelToken()
+    with _lock:
+        _session_tokens.setdefault(session_id, []).append(token)
+        if _reaper is None:
+            _reaper = threading.Thread(target=_reap_ended_sessions, name="session-reaper", daemon=True)
+            _reaper.start()
+    return token
@@ -0,0 +1,155 @@
+# chat_history.py
+"""
+Chat transcript helpers for the Q&A page. Each message's display HTML is
+built once when the message is added and kept (as a session blob handle)
+next to its text, so reruns only redraw a window of recent messages and
+never re-transform old answers. Transcripts are appended to
+CACHE_DIR/transcripts/<chat id>.jsonl so a reload can restore the chat, and
+are deleted once untouched for CHAT_TRANSCRIPT_TTL_S.
+"""
+import html
+import json
+import os
+import re
+import threading
+import time
+import uuid
+
+from config import CACHE_DIR, CHAT_TRANSCRIPTS_ENABLED, CHAT_TRANSCRIPT_TTL_S, CHAT_HISTORY_MESSAGES
+import session_store
+
+TRANSCRIPT_DIR = os.path.join(CACHE_DIR, "transcripts")
+CHAT_ID = re.compile(r'[0-9a-f]{32}')
+
+_lock = threading.Lock()
+_appends_since_cleanup = 0
+
+
+def preserve_indentation(text: str) -> str:
+    """
+    Markdown with leading spaces kept (as &nbsp;) and line breaks as <br>.
+    The text is HTML-escaped first, so the only tags in the result are ours.
+    """
+    fixed_lines = []
+    for line in text.split("\n"):
+        leading_spaces = len(line) - len(line.lstrip(" "))
+        fixed_line = "&nbsp;" * leading_spaces + html.escape(line.lstrip(" "), quote=False)
+        fixed_lines.append(fixed_line)
+    return "<br>".join(fixed_lines)
+
+
+def new_message(role: str, content: str, session_id: str) -> dict:
+    """
+    Message entry for st.session_state.messages. Text and rendered HTML are
+    stored as blob handles; user text is rendered as plain markdown (no HTML).
+    Assistant HTML is always built here with preserve_indentation(), never
+    taken from the caller, since it is drawn with unsafe_allow_html.
+    """
+    message = {"role": role, "content": session_store.put(content, session_id)}
+    if role == "assistant":
+        message["html"] = session_store.put(preserve_indentation(content), session_id)
+    return message
+
+
+def history_line(role: str, content: str) -> str:
+    """One message of the conversation history string sent to JamAI."""
+    return f"{'User' if role == 'user' else 'Assistant'}: {content}\n"
+
+
+def conversation_history(messages: list, session_id: str, limit: int = CHAT_HISTORY_MESSAGES) -> str:
+    """
+    History string for JamAI, rebuilt from the handles of the last `limit`
+    messages (so the prompt and the work per turn stay bounded however long the chat gets).
+    """
+    lines = []
+    window = messages[-limit:] if limit > 0 else []
+    for message in window:
+        content = session_store.get(message["content"], session_id)
+        if content is not None:
+            lines.append(history_line(message["role"], content))
+    return "".join(lines)
+
+
+def render_args(message: dict, session_id: str) -> tuple:
+    """(body, unsafe_allow_html) for st.markdown, using the cached HTML when there is one."""
+    if message.get("html"):
+        html = session_store.get(message["html"], session_id)
+        if html is not None:
+            return html, True
+    return session_store.get(message["content"], session_id) or "", False
+
+
+def window_start(message_count: int, shown: int) -> int:
+    """Index of the first message to draw when only the last `shown` are visible."""
+    return max(message_count - shown, 0)
+
+
+# ------------------ Transcripts ------------------
+def new_chat_id() -> str:
+    return uuid.uuid4().hex
+
+
+def _transcript_path(chat_id: str):
+    # Chat ids come from the URL, so only accept our own format
+    if not chat_id or not CHAT_ID.fullmatch(chat_id):
+        return None
+    return os.path.join(TRANSCRIPT_DIR, f"{chat_id}.jsonl")
+
+
+def append_transcript(chat_id: str, role: str, content: str):
+    """Appends one message to the chat's transcript file (O(1) per turn)."""
+    global _appends_since_cleanup
+    path = _transcript_path(chat_id)
+    if not CHAT_TRANSCRIPTS_ENABLED or path is None:
+        return
+    line = json.dumps({"role": role, "content": content, "at": time.time()}, ensure_ascii=False)
+    try:
+        os.makedirs(TRANSCRIPT_DIR, exist_ok=True)
+        with _lock, open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except OSError as e:
+        print(f"⚠️ Could not save chat transcript: {e}")
+
+    with _lock:
+        _appends_since_cleanup += 1
+        run_cleanup = _appends_since_cleanup >= 50
+        if run_cleanup:
+            _appends_since_cleanup = 0
+    if run_cleanup:
+        cleanup_expired()
+
+
+def cleanup_expired():
+    """Deletes transcripts nobody has written to for CHAT_TRANSCRIPT_TTL_S."""
+    now = time.time()
+    try:
+        names = os.listdir(TRANSCRIPT_DIR)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(TRANSCRIPT_DIR, name)
+        try:
+            if name.endswith(".jsonl") and now - os.path.getmtime(path) > CHAT_TRANSCRIPT_TTL_S:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def load_transcript(chat_id: str) -> list:
+    """[(role, content)] of a saved chat, or [] if there is none."""
+    path = _transcript_path(chat_id)
+    if not CHAT_TRANSCRIPTS_ENABLED or path is None or not os.path.exists(path):
+        return []
+    messages = []
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue    # Partially written last line
+                messages.append((entry["role"], entry["content"]))
+    except (OSError, KeyError) as e:
+        print(f"⚠️ Could not read chat transcript: {e}")
+        return []
+    return messages
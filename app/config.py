@@ -1,3 +1,97 @@
 API_KEY="YOUR_API_KEY" #remember change to your own PAT
 PROJECT_ID="YOUR_PROJECT_ID" #remember change to your project ID
 
+# --- Speculative background work (Contract Checker) ---
+SPECULATIVE_ENABLED = True              # Start audits / rewrites before the user clicks
+SPECULATIVE_MAX_CALLS_PER_HOUR = 200    # Budget cap for speculative JamAI calls (whole deployment)
+SPECULATIVE_WORKERS = 4                 # Background threads shared by all sessions
+
+# --- Q&A answer cache (near-duplicate questions) ---
+QA_CACHE_ENABLED = True
+QA_CACHE_SIMILARITY = 0.8               # TF-IDF cosine similarity needed to reuse an answer
+QA_CACHE_FALLBACK_SIMILARITY = 0.5      # Looser match used only while JamAI is down
+QA_CACHE_TTL_SECONDS = 7 * 24 * 3600    # Re-ask JamAI after a week in case the answer changed
+QA_CACHE_MAX_ENTRIES = 2000
+
+# --- Local storage / statute retrieval ---
+CACHE_DIR = ".cache"                                        # Local caches & indexes (relative to app/)
+STATUTE_PARQUET_PATH = "../jamaibase_project_tables.parquet"  # JamAI project export (see README)
+LOCAL_RETRIEVAL_ENABLED = True          # Use the local BM25 index when it has been built
+LOCAL_RETRIEVAL_TOP_K = 4               # Statute sections added per prompt
+
+# --- JamAI call limits (shared by every page in a server process) ---
+JAMAI_RATE_PER_SECOND = 5               # Token bucket refill rate
+JAMAI_BURST = 10                        # Token bucket capacity
+JAMAI_INITIAL_CONCURRENCY = 4           # AIMD starting point for parallel calls
+JAMAI_MIN_CONCURRENCY = 1
+JAMAI_MAX_CONCURRENCY = 16
+JAMAI_MAX_RETRIES = 2                   # Retries after a 429 / 5xx
+JAMAI_SHARED_LIMITER = False            # Share the rate limit across processes via a lock file (Linux/macOS)
+JAMAI_CALL_TIMEOUT_S = 120              # Give up on a hedged call this long after it got a slot (queueing not included)
+JAMAI_HEDGE_ENABLED = True              # Fire a backup request for slow idempotent calls
+JAMAI_HEDGE_MIN_DELAY_S = 2.0           # Never hedge sooner than this (even if p95 is lower)
+JAMAI_HEDGE_MIN_SAMPLES = 20            # Latency samples needed before hedging starts
+# Share of JamAI slots each priority class gets while calls are queueing (weighted fair queuing).
+# "interactive": Q&A chat, single-contract validation, rewrites; "batch": bulk termination runs, load tests.
+JAMAI_PRIORITY_WEIGHTS = {"interactive": 4, "batch": 1}
+CIRCUIT_FAILURE_THRESHOLD = 5           # Consecutive failures before failing fast
+CIRCUIT_COOLDOWN_S = 30                 # How long to fail fast before trying JamAI again
+
+# --- Single-flight coalescing of identical requests ---
+SINGLE_FLIGHT_WAIT_S = 300              # Longest wait for another server process running the same request
+
+# --- Cancellation / deadlines of engine calls ---
+ENGINE_DEADLINE_S = 300                 # Abandon an audit / rewrite / termination run taking longer than this
+CANCEL_POLL_INTERVAL_S = 0.1            # How often waits check their cancellation token
+SESSION_REAP_INTERVAL_S = 5             # How often ended Streamlit sessions are looked for (their work is cancelled)
+
+# --- Session storage (large values offloaded to disk) ---
+SESSION_MEMORY_CAP_MB = 256             # In-memory LRU cap for session blobs (per server process)
+SESSION_TTL_S = 6 * 3600                # Sessions idle longer than this are cleaned up
+
+# --- Q&A chat ---
+CHAT_PAGE_SIZE = 20                     # Messages drawn per rerun; older ones load on demand
+CHAT_TRANSCRIPTS_ENABLED = True         # Save chats to CACHE_DIR/transcripts (restored via ?chat=<id>)
+CHAT_TRANSCRIPT_TTL_S = 7 * 24 * 3600   # Transcripts not written to for this long are deleted
+CHAT_HISTORY_MESSAGES = 20              # Most recent messages sent to JamAI as the conversation history
+
+# --- Rerun profiler (admins) ---
+PROFILER_ENABLED = False                # Sample every script rerun of every page (writes CACHE_DIR/profiles)
+PROFILER_QUERY_TOKEN = ""               # If set, ?profile=<token> turns profiling on for that session only
+PROFILER_SAMPLE_INTERVAL_S = 0.005      # Stack sampling period
+PROFILER_MAX_RERUN_S = 300              # Stop sampling a rerun after this long
+PROFILER_MAX_FILES = 200                # Reruns kept in CACHE_DIR/profiles
+
+# --- Startup ---
+PREWARM_ENABLED = True                  # Load PyMuPDF / ReportLab / pandas / JamAI in the background after first paint
+STARTUP_IMPORT_BUDGET_MS = 1500         # Per-page import budget checked by profile_startup.py
+
+# --- Uploaded workforce files (Termination page) ---
+WORKFORCE_CACHE_MAX_FILES = 20          # Parsed uploads kept as Arrow files in CACHE_DIR/workforce
+
+# --- Audit history (compliance analytics) ---
+AUDIT_HISTORY_ENABLED = True            # Record every validated audit in CACHE_DIR/audit_history.sqlite3
+
+# --- Contract audit payload ---
+PAYLOAD_MINIMIZATION_ENABLED = True     # Strip headers / footers, duplicates and signature blocks before auditing
+SPLIT_AUDIT_ENABLED = False             # Request violations, risk tags and employee facts as three concurrent calls
+SPLIT_AUDIT_TABLES = {                  # Output column -> action table (input column: full_contract_text)
+    "final_json_report": "Contract_Auditor_Violations",
+    "contract_risk": "Contract_Auditor_Risk",
+    "employee_data": "Contract_Auditor_Facts",
+}
+TEMPLATE_REUSE_ENABLED = True           # Reuse the audit of an already seen contract template (CACHE_DIR/templates.sqlite3)
+TEMPLATE_SIMILARITY = 0.9               # Estimated Jaccard (MinHash) needed before clauses are compared
+TEMPLATE_TTL_S = 30 * 24 * 3600         # Templates are forgotten this long after they were stored
+TEMPLATE_MAX_ROWS = 2000                # Oldest templates are dropped beyond this many
+
+# --- Liability simulation (Contract Checker dashboard) ---
+LIABILITY_SIMULATION_ENABLED = True
+LIABILITY_SIMULATIONS = 20000           # Monte Carlo scenarios per contract
+LIABILITY_DISTRIBUTIONS = {             # (kind, params...): triangular / uniform / poisson / normal / lognormal / fixed
+    "fine_fraction": ("triangular", 0.10, 0.25, 0.60),          # Share of the max fine imposed (non-serious)
+    "serious_fine_fraction": ("triangular", 0.50, 1.00, 1.00),  # Share of the max fine imposed (jail-term offences)
+    "ot_hours_per_week": ("triangular", 2, 5, 12),              # Unpaid overtime hours
+    "ot_weeks": ("uniform", 26, 52),                            # Weeks of unpaid overtime claimed
+    "leave_days_denied": ("poisson", 4),
+}
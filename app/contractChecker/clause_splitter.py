@@ -0,0 +1,73 @@
+import re
+from difflib import SequenceMatcher
+from typing import List, Tuple
+
+# Top-level clause headings look like "1. Salary" or "**2. Working Hours**".
+# Sub-clauses ("2.1", "2.1.3") are deliberately NOT split points, so a clause
+# keeps all of its sub-items together.
+CLAUSE_HEADING = re.compile(r'(?<!\S)(?:\*\*)?\d{1,2}\.\s+(?=\S)')
+PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+
+
+def clause_spans(text: str) -> List[Tuple[int, int]]:
+    """
+    Returns (start, end) offsets of every clause in the contract text.
+    A new clause starts at a blank line or at a top-level numbered heading.
+    Offsets point into the ORIGINAL text, so text[start:end] is verbatim.
+    """
+    if not text:
+        return []
+
+    # 1. Collect every split point
+    cuts = {0, len(text)}
+    for match in PARAGRAPH_BREAK.finditer(text):
+        cuts.add(match.end())
+    for match in CLAUSE_HEADING.finditer(text):
+        cuts.add(match.start())
+
+    # 2. Turn split points into trimmed, non-empty spans
+    spans = []
+    points = sorted(cuts)
+    for start, end in zip(points, points[1:]):
+        chunk = text[start:end]
+        if not chunk.strip():
+            continue
+        lead = len(chunk) - len(chunk.lstrip())
+        trail = len(chunk) - len(chunk.rstrip())
+        spans.append((start + lead, end - trail))
+    return spans
+
+
+def split_clauses(text: str) -> List[str]:
+    """Splits contract text into a list of verbatim clause strings."""
+    return [text[start:end] for start, end in clause_spans(text)]
+
+
+def normalize_clause(text: str) -> str:
+    """Lowercases and strips formatting noise so trivial edits don't count as changes."""
+    text = re.sub(r'[\u200b\u200c\u200d\uFEFF]', '', text or "")
+    text = re.sub(r'\*\*|__', '', text)
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+
+def find_clause_index(snippet: str, clauses: List[str], min_ratio: float = 0.6) -> int:
+    """
+    Finds which clause an AI-quoted snippet came from.
+    Tries an exact (normalized) substring match first, then falls back to the
+    closest fuzzy match. Returns -1 if nothing is close enough.
+    """
+    needle = normalize_clause(snippet)
+    if not needle:
+        return -1
+
+    normalized = [normalize_clause(c) for c in clauses]
+    for i, clause in enumerate(normalized):
+        if needle in clause or (clause and clause in needle):
+            return i
+
+    best_index, best_ratio = -1, 0.0
+    for i, clause in enumerate(normalized):
+        ratio = SequenceMatcher(None, needle, clause).ratio()
+        if ratio > best_ratio:
+            best_index, best_ratio = i, ratio
+    return best_index if best_ratio >= min_ratio else -1
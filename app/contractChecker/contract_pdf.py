@@ -0,0 +1,93 @@
+import re
+from io import BytesIO
+
+# ReportLab is imported inside the functions: it is slow to load and most
+# page views never render a PDF.
+
+
+def _build_styles():
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.enums import TA_JUSTIFY
+    from reportlab.lib import colors
+
+    styles = getSampleStyleSheet()
+
+    # Custom Styles
+    header_style = ParagraphStyle(
+        'CustomHeader', parent=styles['Heading2'],
+        fontSize=14, spaceAfter=12, textColor=colors.black, fontName='Helvetica-Bold'
+    )
+    normal_style = ParagraphStyle(
+        'CustomNormal', parent=styles['Normal'],
+        fontSize=11, leading=14, spaceAfter=6, alignment=TA_JUSTIFY
+    )
+    return header_style, normal_style
+
+
+class IncrementalContractPdf:
+    """
+    Builds the PDF story line by line while the contract is still being
+    generated, so only the final layout pass is left once the text is complete.
+    """
+
+    def __init__(self):
+        self.header_style, self.normal_style = _build_styles()
+        self.story = []
+        self.pending = ""   # Incomplete last line
+
+    def _add_line(self, line):
+        from reportlab.platypus import Paragraph, Spacer
+
+        line = line.strip()
+        if not line:
+            self.story.append(Spacer(1, 6))
+            return
+
+        # Detect Markdown Headers (##)
+        if line.startswith('##'):
+            clean_line = line.replace('#', '').strip()
+            self.story.append(Paragraph(clean_line, self.header_style))
+
+        # Detect Bullets
+        elif line.startswith('- ') or line.startswith('* '):
+            clean_line = line[2:].strip()
+            # Convert bold syntax **text** to HTML <b>text</b>
+            formatted_line = re.sub(r'\*\*(.*?)\*\*', r'<b>\1</b>', clean_line)
+            self.story.append(Paragraph(f"•  {formatted_line}", self.normal_style))
+
+        # Standard Text
+        else:
+            formatted_line = re.sub(r'\*\*(.*?)\*\*', r'<b>\1</b>', line)
+            self.story.append(Paragraph(formatted_line, self.normal_style))
+
+    def feed(self, chunk: str):
+        """Adds streamed text; every completed line becomes a flowable right away."""
+        lines = (self.pending + chunk).split('\n')
+        self.pending = lines.pop()
+        for line in lines:
+            self._add_line(line)
+
+    def finish(self) -> BytesIO:
+        """Flushes the last line and lays out the document."""
+        from reportlab.lib.pagesizes import A4
+        from reportlab.platypus import SimpleDocTemplate
+
+        self._add_line(self.pending)
+        self.pending = ""
+
+        buffer = BytesIO()
+        doc = SimpleDocTemplate(
+            buffer,
+            pagesize=A4,
+            rightMargin=72, leftMargin=72,
+            topMargin=72, bottomMargin=18
+        )
+        doc.build(self.story)
+        buffer.seek(0)
+        return buffer
+
+
+def create_pdf_from_markdown(markdown_text):
+    renderer = IncrementalContractPdf()
+    renderer.feed(markdown_text)
+    return renderer.finish()
@@ -0,0 +1,193 @@
+import re
+from typing import Any, Dict, List, Optional
+
+# Fast, local stand-in for the auditor's employee_data / contract_risk columns.
+# Good enough for a provisional dashboard while the JamAI audit runs; the
+# LLM-extracted values replace these as soon as they arrive.
+
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8,
+    "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "fourteen": 14, "thirty": 30, "sixty": 60, "ninety": 90,
+    "satu": 1, "dua": 2, "tiga": 3, "empat": 4, "lima": 5, "enam": 6, "tujuh": 7, "lapan": 8,
+    "sembilan": 9, "sepuluh": 10, "sebelas": 11, "dua belas": 12,
+}
+# Months per unit, for durations written in weeks or days
+UNIT_MONTHS = {"month": 1.0, "bulan": 1.0, "week": 12 / 52, "minggu": 12 / 52, "day": 1 / 30, "hari": 1 / 30}
+
+AMOUNT = re.compile(r'RM\s?(\d{1,3}(?:,\d{3})+|\d+)(\.\d{1,2})?', re.IGNORECASE)
+DURATION = re.compile(
+    r'\b(\d{1,3}|' + '|'.join(sorted(NUMBER_WORDS, key=len, reverse=True)) + r')\s*(?:\(\d{1,3}\)\s*)?'
+    r'(months?|bulan|weeks?|minggu|days?|hari)\b',
+    re.IGNORECASE
+)
+SALARY_WORDS = re.compile(r'\b(?:salary|wages?|remuneration|gaji|upah)\b', re.IGNORECASE)
+PROBATION_WORDS = re.compile(r'\b(?:probation(?:ary)?|percubaan)\b', re.IGNORECASE)
+NOTICE_WORDS = re.compile(r'\b(?:notice|notis)\b', re.IGNORECASE)
+LEAVE_WORDS = re.compile(r'\b(?:annual leave|cuti tahunan)\b', re.IGNORECASE)
+
+# Names run up to the next label, digit, colon or markdown marker (PDF text often has no line breaks)
+EMPLOYEE_NAME_LABEL = re.compile(
+    r'(?:Employee(?:\'s)?\s+(?:Full\s+)?Name|(?:Full\s+)?Name\s+of\s+(?:the\s+)?Employee|Nama(?:\s+Penuh)?\s+Pekerja)'
+    r'\s*:\s*([^\n:\d*\[\]]{3,80})',
+    re.IGNORECASE
+)
+# A bare "Name:" only when it is a label of its own, not "Company Name:" / "Employer's Name:"
+NAME_LABEL = re.compile(r'(?<![\w\'] )\b(?:Full\s+Name|Name|Nama(?:\s+Penuh)?)\s*:\s*([^\n:\d*\[\]]{3,80})', re.IGNORECASE)
+NEXT_LABEL = re.compile(
+    r'\s+(?:IC|NRIC|I/C|MyKad|Identity Card|Passport|Pasport|No\.?\s*K/P|K/P|Registration|Address|Alamat|'
+    r'Position|Designation|Job Title|Jawatan|Date|Tarikh|E-?mail|Tel|Phone|Telefon|Nationality|Warganegara|'
+    r'Age|Umur|Gender|Jantina|Department|Jabatan)\b.*$',
+    re.IGNORECASE | re.DOTALL
+)
+NAME_TITLE = re.compile(r'\b(?:Mr|Mrs|Ms|Miss|Madam|Encik|En|Puan|Pn|Cik)\.?\s+((?:[A-Z][A-Za-z\'@/-]*\.?\s?){1,6})')
+POSITION_LABEL = re.compile(r'(?:Position|Designation|Job Title|Jawatan)\s*:\s*([^\n]{2,80})', re.IGNORECASE)
+POSITION_PHRASE = re.compile(
+    r'(?:employed|appointed|engaged|hired)\s+as\s+(?:an?\s+|the\s+)?([A-Za-z][A-Za-z &/-]{2,60}?)(?=[,.;(\n]|\s+(?:with|at|in|on|for|effective)\b)',
+    re.IGNORECASE
+)
+DATE = r'(\d{1,2}(?:st|nd|rd|th)?\s+[A-Za-z]+\s+\d{4}|\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}|[A-Za-z]+\s+\d{1,2},?\s+\d{4})'
+START_DATE = re.compile(
+    r'(?:commencement date|start(?:ing)? date|date of (?:joining|commencement)|commenc\w* (?:on|from)|'
+    r'effective (?:from|on)|tarikh (?:mula|lapor diri))\s*:?\s*' + DATE,
+    re.IGNORECASE
+)
+
+OVERTIME_UNPAID = re.compile(
+    r'\bover\s?time\b[^.\n]{0,80}\b(?:not|no|without)\b[^.\n]{0,40}\b(?:paid|payable|compensat\w*|entitled)|'
+    r'\b(?:not|no|without)\b[^.\n]{0,40}\bover\s?time\b[^.\n]{0,40}\b(?:pay|paid|payment|allowance)|'
+    r'\bkerja lebih masa\b[^.\n]{0,80}\btidak\b',
+    re.IGNORECASE
+)
+SOCIAL_SECURITY_WAIVED = re.compile(
+    r'\b(?:not|no|without|tidak)\b[^.\n]{0,40}\b(?:EPF|KWSP|SOCSO|PERKESO)\b', re.IGNORECASE
+)
+
+MIN_WAGE_RM = 1500              # Same floor financial_calculator uses for CALC_MIN_WAGE
+MIN_ANNUAL_LEAVE_DAYS = 8       # Employment Act s.60E (under two years of service)
+MIN_NOTICE_MONTHS = 4 * 12 / 52 # Employment Act s.12: four weeks (under two years of service)
+
+
+def _windows(text: str, keywords: re.Pattern, size: int = 200) -> List[str]:
+    """The sentence around each keyword ("two weeks' notice" puts the figure first)."""
+    windows = []
+    for match in keywords.finditer(text):
+        start = max(text.rfind("\n", 0, match.start()), text.rfind(". ", 0, match.start()) + 1, match.start() - 100, 0)
+        window = text[start:match.start() + size]
+        end = re.search(r'\.\s|\n\s*\n', window[match.start() - start:])
+        windows.append(window[:match.start() - start + end.start()] if end else window)
+    return windows
+
+
+def _amount(match: re.Match) -> float:
+    return float(match.group(1).replace(",", "") + (match.group(2) or ""))
+
+
+def _duration_months(windows: List[str]) -> Optional[float]:
+    for window in windows:
+        match = DURATION.search(window)
+        if match:
+            raw, unit = match.group(1).lower(), match.group(2).lower().rstrip("s")
+            count = int(raw) if raw.isdigit() else NUMBER_WORDS[raw]
+            return round(count * UNIT_MONTHS[unit], 2)
+    return None
+
+
+def _salary(text: str) -> Optional[float]:
+    # Prefer an amount stated with the salary, else the first plausible monthly figure
+    for window in _windows(text, SALARY_WORDS, 250):
+        match = AMOUNT.search(window)
+        if match:
+            return _amount(match)
+    for match in AMOUNT.finditer(text):
+        if 500 <= _amount(match) <= 100000:
+            return _amount(match)
+    return None
+
+
+def _clean(value: str) -> str:
+    return re.sub(r'\s+', ' ', value).strip(" *_:,.;")
+
+
+def _employee_name(text: str) -> Optional[str]:
+    # Employee-specific labels first; a bare "Name:" may belong to the employer's details
+    for label in (EMPLOYEE_NAME_LABEL, NAME_LABEL):
+        for match in label.finditer(text):
+            name = _clean(NEXT_LABEL.sub('', match.group(1)))
+            if name:
+                return name
+    match = NAME_TITLE.search(text)
+    return _clean(match.group(1)) if match and _clean(match.group(1)) else None
+
+
+def extract_employee_facts(contract_text: str) -> Dict[str, Any]:
+    """
+    Salary, probation, notice period, name, position and start date read with
+    regexes, in the same shape as the auditor's employee_data. Missing facts are left out.
+    """
+    text = contract_text or ""
+    facts = {}
+
+    salary = _salary(text)
+    if salary is not None:
+        facts["basic_salary_monthly"] = salary
+
+    probation = _duration_months(_windows(text, PROBATION_WORDS))
+    if probation is not None:
+        facts["probation_months"] = probation
+
+    notice = _duration_months(_windows(text, NOTICE_WORDS))
+    if notice is not None:
+        facts["notice_period_months"] = notice
+
+    name = _employee_name(text)
+    if name:
+        facts["employee_name"] = name
+
+    position = POSITION_LABEL.search(text) or POSITION_PHRASE.search(text)
+    if position and _clean(position.group(1)):
+        facts["position_title"] = _clean(position.group(1))
+
+    start = START_DATE.search(text)
+    if start:
+        facts["start_date"] = start.group(1)
+    return facts
+
+
+def provisional_risk(contract_text: str, facts: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Risk tags for the clear-cut cases the local facts can show (pay below the
+    minimum wage, short notice / leave, unpaid overtime, EPF / SOCSO waived),
+    in the same shape as the auditor's contract_risk.
+    """
+    text = contract_text or ""
+    items = []
+
+    salary = facts.get("basic_salary_monthly")
+    if salary is not None and salary < MIN_WAGE_RM:
+        items.append({"calc_tag": "CALC_MIN_WAGE", "violation_name": "Salary below minimum wage"})
+
+    notice = facts.get("notice_period_months")
+    if notice is not None and notice < MIN_NOTICE_MONTHS:
+        items.append({"calc_tag": "CALC_NOTICE", "violation_name": "Notice period below statutory minimum"})
+
+    for window in _windows(text, LEAVE_WORDS):
+        match = DURATION.search(window)
+        if match and match.group(2).lower().startswith(("day", "hari")):
+            raw = match.group(1).lower()
+            if (int(raw) if raw.isdigit() else NUMBER_WORDS[raw]) < MIN_ANNUAL_LEAVE_DAYS:
+                items.append({"calc_tag": "CALC_LEAVE", "violation_name": "Annual leave below statutory minimum"})
+            break
+
+    if OVERTIME_UNPAID.search(text):
+        items.append({"calc_tag": "CALC_OT", "violation_name": "Overtime not paid"})
+    if SOCIAL_SECURITY_WAIVED.search(text):
+        items.append({"calc_tag": "CALC_EPF", "violation_name": "EPF / SOCSO contributions excluded"})
+
+    return {"risk_assessment": items} if items else {}
+
+
+def merge_facts(llm_facts: Dict[str, Any], local_facts: Dict[str, Any]) -> Dict[str, Any]:
+    """LLM-extracted facts, with the local ones filling any gaps."""
+    merged = dict(local_facts or {})
+    merged.update({k: v for k, v in (llm_facts or {}).items() if v not in (None, "", "-")})
+    return merged
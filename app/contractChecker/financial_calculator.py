@@ -1,12 +1,8 @@
 import re
+from config import LIABILITY_SIMULATIONS, LIABILITY_DISTRIBUTIONS
 
-def calculate_liability(risk_json, employee_data):
-    """
-    Takes raw risk tags from AI (contract_risk) + extracted employee facts (employee_data).
-    Returns the final calculated breakdown and totals for the Dashboard.
-    """
-    
-    # --- 1. SETUP & PARSING ---
+def employee_terms(employee_data):
+    """(monthly salary, probation months, notice months) with the dashboard's fallbacks."""
     # Parse Salary safely (Handle numbers or strings like "RM 1,500.00")
     raw_salary = employee_data.get("basic_salary_monthly", 1500)
     try:
@@ -15,48 +11,71 @@ def calculate_liability(risk_json, employee_data):
         salary = float(clean_salary)
     except:
         salary = 1500.00 # Fallback to Min Wage
-    
+
     # Parse Other Facts
     probation_mos = float(employee_data.get("probation_months", 6) or 6)
     notice_mos = float(employee_data.get("notice_period_months", 2) or 2)
-    
-    # Initialize Totals
-    total_likely = 0.0
-    total_worst = 0.0
-    breakdown_list = []
+    return salary, probation_mos, notice_mos
 
-    # Safety check: If AI didn't return a risk assessment list, return empty
+def _risk_list(risk_json):
     # Note: We look for 'risk_assessment' based on the Simplified Prompt
     # If using older prompt, it might be 'violations'. We check both.
     risk_list = risk_json.get("risk_assessment", [])
     if not risk_list:
         risk_list = risk_json.get("violations", [])
+    return risk_list
+
+def _item_terms(item):
+    """(calc tag, violation name, max fine, jail term, is serious) for one AI risk item."""
+    # key names might vary slightly depending on which prompt you used last
+    tag = item.get("calc_tag") or item.get("calculation_tag") or "CALC_NONE"
+    violation_name = item.get("violation_name") or item.get("violation_type") or "Issue"
+
+    # Fine Amount
+    try:
+        max_fine = float(item.get("max_fine_rm", 50000))
+    except:
+        max_fine = 50000.0
+
+    # Jail / Serious Offense Check
+    jail_term = item.get("jail_term", "None")
+    is_serious = False
+    if jail_term and str(jail_term).lower() != "none":
+        is_serious = True
+    # Keyword check for safety
+    if "forced" in violation_name.lower() or "foreign" in violation_name.lower():
+        is_serious = True
+    return tag, violation_name, max_fine, jail_term, is_serious
+
+def calculate_liability(risk_json, employee_data):
+    """
+    Takes raw risk tags from AI (contract_risk) + extracted employee facts (employee_data).
+    Returns the final calculated breakdown and totals for the Dashboard.
+    """
+    return evaluate_liability_model(build_liability_model(risk_json), *employee_terms(employee_data))
+
+
+# --- LINEAR MODEL (what-if mode) ---
+def build_liability_model(risk_json):
+    """
+    Per-risk-item model of calculate_liability(), built once per audit. Each
+    item has a fixed fine and arrears of
+        salary * (k_salary + k_probation * probation months + k_notice * notice months)
+        + k_topup * max(0, 1500 - salary)
+    so what-if salary / probation / notice values only need a few multiplications.
+    Returns {} if there are no risk items.
+    """
+    # Safety check: If AI didn't return a risk assessment list, return empty
+    risk_list = _risk_list(risk_json)
 
     if not risk_list:
         return {}
 
-    # --- 2. CALCULATION LOOP ---
+    items = []
     for item in risk_list:
-        
+
         # A. EXTRACT AI DATA
-        # key names might vary slightly depending on which prompt you used last
-        tag = item.get("calc_tag") or item.get("calculation_tag") or "CALC_NONE"
-        violation_name = item.get("violation_name") or item.get("violation_type") or "Issue"
-        
-        # Fine Amount
-        try:
-            max_fine = float(item.get("max_fine_rm", 50000))
-        except:
-            max_fine = 50000.0
-
-        # Jail / Serious Offense Check
-        jail_term = item.get("jail_term", "None")
-        is_serious = False
-        if jail_term and str(jail_term).lower() != "none":
-            is_serious = True
-        # Keyword check for safety
-        if "forced" in violation_name.lower() or "foreign" in violation_name.lower():
-            is_serious = True
+        tag, violation_name, max_fine, jail_term, is_serious = _item_terms(item)
 
         # B. FINE CALCULATION (Government Penalty)
         # Logic: 50% for standard offenses, 100% for serious/jail offenses
@@ -65,58 +84,172 @@ def calculate_liability(risk_json, employee_data):
         else:
             likely_fine = max_fine * 0.25
 
-        # C. ARREARS CALCULATION (Employee Debt)
-        arrears = 0.0
+        # C. ARREARS COEFFICIENTS (Employee Debt)
+        k_salary = k_probation = k_notice = k_topup = 0.0
         math_note = ""
 
         if tag == "CALC_OT":
             # Formula: Hourly Rate * 1.5 * 5 hours/week * 52 weeks
             # 26 days is the statutory divisor
-            hourly_rate = (salary / 26) / 8
-            arrears = hourly_rate * 1.5 * 5 * 52
+            k_salary = 1 / 26 / 8 * 1.5 * 5 * 52
             math_note = "(Est. 5hrs OT/week x 1 year)"
 
         elif tag == "CALC_EPF":
             # Formula: 13% * Salary * Probation Months
-            arrears = (salary * 0.13) * probation_mos
-            math_note = f"(13% EPF for {probation_mos} months)"
+            k_probation = 0.13
+            math_note = "(13% EPF for {probation_mos} months)"
 
         elif tag == "CALC_NOTICE" or tag == "CALC_TERMINATION":
             # Formula: Salary * Notice Months
-            arrears = salary * notice_mos
-            math_note = f"({notice_mos} months indemnity pay)"
+            k_notice = 1.0
+            math_note = "({notice_mos} months indemnity pay)"
 
         elif tag == "CALC_MIN_WAGE":
-            if salary < 1500:
-                arrears = (1500 - salary) * 12
-                math_note = "(Top-up to RM1,500 for 1 year)"
-        
+            # Formula: (1500 - Salary) * 12, only while below the minimum wage
+            k_topup = 12.0
+            math_note = "(Top-up to RM1,500 for 1 year)"
+
         elif tag == "CALC_LEAVE":
             # Formula: Daily Rate * 4 days (conservative avg of days denied)
-            daily_rate = salary / 26
-            arrears = daily_rate * 4
+            k_salary = 1 / 26 * 4
             math_note = "(Compensation for approx 4 days leave)"
 
-        # --- 3. AGGREGATE ---
+        items.append({
+            "name": violation_name, "calc_tag": tag,
+            "likely_fine": likely_fine, "worst_fine": max_fine,
+            "jail_term": jail_term, "is_serious": is_serious,
+            "k_salary": k_salary, "k_probation": k_probation, "k_notice": k_notice, "k_topup": k_topup,
+            "math_note": math_note
+        })
+    return {"items": items}
+
+def evaluate_liability_model(model, salary, probation_mos, notice_mos):
+    """calculate_liability() output for the given salary / probation / notice, from build_liability_model()."""
+    if not model:
+        return {}
+
+    # Initialize Totals
+    total_likely = 0.0
+    total_worst = 0.0
+    breakdown_list = []
+
+    top_up = max(0.0, 1500 - salary)
+    for item in model["items"]:
+        likely_fine = item["likely_fine"]
+        arrears = (
+            salary * (item["k_salary"] + item["k_probation"] * probation_mos + item["k_notice"] * notice_mos)
+            + item["k_topup"] * top_up
+        )
+        # Nothing to top up: no note, as before
+        math_note = "" if item["k_topup"] and not top_up else item["math_note"].format(
+            probation_mos=probation_mos, notice_mos=notice_mos
+        )
+
+        # --- AGGREGATE ---
         item_likely_total = likely_fine + arrears
-        item_worst_total = max_fine + arrears
-        
+        item_worst_total = item["worst_fine"] + arrears
+
         total_likely += item_likely_total
         total_worst += item_worst_total
 
         # Format the String for UI
-        jail_badge = f" | ⛓️ Jail: {jail_term}" if is_serious else ""
-        
+        jail_badge = f" | ⛓️ Jail: {item['jail_term']}" if item["is_serious"] else ""
+
         breakdown_str = (
-            f"⚠️ {violation_name}: RM {likely_fine:,.0f} (Fine) + "
+            f"⚠️ {item['name']}: RM {likely_fine:,.0f} (Fine) + "
             f"RM {arrears:,.2f} (Arrears) **{math_note}**{jail_badge}"
         )
         breakdown_list.append(breakdown_str)
 
-    # --- 4. FINAL OUTPUT STRUCTURE ---
+    # --- FINAL OUTPUT STRUCTURE ---
     # This dictionary matches exactly what 'render_financial_dashboard' expects
     return {
         "breakdown": breakdown_list,
         "total_likely_liability": total_likely,
         "total_worst_case_liability": total_worst
-    }
\ No newline at end of file
+    }
+
+
+# --- MONTE CARLO MODE ---
+def _draw(rng, spec, size):
+    """Samples one assumption from a config spec like ("triangular", low, mode, high)."""
+    import numpy as np
+
+    kind, *params = spec
+    if kind == "fixed":
+        return np.full(size, float(params[0]))
+    if kind == "poisson":
+        return rng.poisson(params[0], size).astype(float)
+    if kind == "normal":
+        # Liabilities can't go negative
+        return rng.normal(params[0], params[1], size).clip(min=0)
+    return getattr(rng, kind)(*params, size)  # triangular / uniform / lognormal
+
+def simulate_liability(risk_json, employee_data, n_scenarios=LIABILITY_SIMULATIONS, seed=0):
+    """
+    Monte Carlo version of calculate_liability(): the fixed assumptions (25% fine,
+    5 OT hours a week for a year, 4 leave days denied) are drawn from
+    LIABILITY_DISTRIBUTIONS instead. All scenarios are evaluated at once as
+    NumPy arrays. Returns p50/p90/p99 per risk item and for the total.
+    The fixed seed keeps the numbers stable across Streamlit reruns.
+    """
+    import numpy as np
+
+    risk_list = _risk_list(risk_json)
+    if not risk_list:
+        return {}
+
+    salary, probation_mos, notice_mos = employee_terms(employee_data)
+    rng = np.random.default_rng(seed)
+    dist = LIABILITY_DISTRIBUTIONS
+    n_items = len(risk_list)
+
+    # One employee -> OT hours and leave denied are shared by all items in a scenario;
+    # each offence gets its own fine draw
+    ot_hours = _draw(rng, dist["ot_hours_per_week"], n_scenarios)
+    ot_weeks = _draw(rng, dist["ot_weeks"], n_scenarios)
+    leave_days = _draw(rng, dist["leave_days_denied"], n_scenarios)
+    fine_fraction = _draw(rng, dist["fine_fraction"], (n_items, n_scenarios))
+    serious_fraction = _draw(rng, dist["serious_fine_fraction"], (n_items, n_scenarios))
+
+    max_fines = np.empty(n_items)
+    serious = np.zeros(n_items, dtype=bool)
+    arrears = np.zeros((n_items, n_scenarios))
+    names, tags = [], []
+    for i, item in enumerate(risk_list):
+        tag, violation_name, max_fine, _, is_serious = _item_terms(item)
+        names.append(violation_name)
+        tags.append(tag)
+        max_fines[i] = max_fine
+        serious[i] = is_serious
+
+        # Same formulas as calculate_liability(), with the drawn assumptions
+        if tag == "CALC_OT":
+            arrears[i] = (salary / 26) / 8 * 1.5 * ot_hours * ot_weeks
+        elif tag == "CALC_EPF":
+            arrears[i] = (salary * 0.13) * probation_mos
+        elif tag == "CALC_NOTICE" or tag == "CALC_TERMINATION":
+            arrears[i] = salary * notice_mos
+        elif tag == "CALC_MIN_WAGE" and salary < 1500:
+            arrears[i] = (1500 - salary) * 12
+        elif tag == "CALC_LEAVE":
+            arrears[i] = (salary / 26) * leave_days
+
+    fines = max_fines[:, None] * np.where(serious[:, None], serious_fraction, fine_fraction)
+    scenarios = fines + arrears                     # (items, scenarios)
+    totals = scenarios.sum(axis=0)
+
+    item_pct = np.percentile(scenarios, [50, 90, 99], axis=1)
+    total_pct = np.percentile(totals, [50, 90, 99])
+    return {
+        "scenarios": n_scenarios,
+        "items": [
+            {"name": names[i], "calc_tag": tags[i],
+             "p50": float(item_pct[0, i]), "p90": float(item_pct[1, i]), "p99": float(item_pct[2, i])}
+            for i in range(n_items)
+        ],
+        "total": {
+            "p50": float(total_pct[0]), "p90": float(total_pct[1]), "p99": float(total_pct[2]),
+            "mean": float(totals.mean())
+        }
+    }
@@ -1,43 +1,289 @@
-from jamaibase import JamAI, types as t
-import os
+import json
 import re
-from config import PROJECT_ID, API_KEY
-
-os.environ["JAMAI_API_KEY"] = API_KEY
-os.environ["JAMAI_PROJECT_ID"] = PROJECT_ID
-jamai = JamAI(project_id=PROJECT_ID, token=API_KEY)
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Dict, Any, Optional, Tuple
+from cancellation import CancelToken, OperationCancelled, check
+from jamai_gateway import gateway, add_action_rows, INTERACTIVE
+from single_flight import single_flight, content_key
+from contractChecker.clause_splitter import clause_spans, find_clause_index, normalize_clause
 
 TABLE_ID = "Contract_Generator"
+OUTPUT_COLUMN = "answer"
+FENCE = "```"
+MAX_PARALLEL_REWRITES = 4
 
-def generate_corrected_contract(contract_text: str, language: str = "en") -> str:
+def build_prompt(contract_text: str, language: str = "en") -> str:
     # Simple prompt passing data only
     target_lang = "Bahasa Melayu" if language == 'ms' else "English"
-    prompt = f"Target Language: {target_lang}\n\nContract:\n{contract_text}"
+    return f"Target Language: {target_lang}\n\nContract:\n{contract_text}"
+
+def strip_markdown_fences(text: str) -> str:
+    """Removes a leading ```markdown fence and a trailing ``` fence."""
+    text = re.sub(r'^```(markdown)?', '', text.strip())
+    return re.sub(r'```$', '', text).strip()
+
+class GenerationError(Exception):
+    """The drafter returned no usable contract (JamAI error or empty response)."""
+
+def generate_corrected_contract(contract_text: str, language: str = "en", cancel: Optional[CancelToken] = None) -> str:
+    """
+    The whole contract rewritten by the drafter. Raises GenerationError if no
+    contract came back and OperationCancelled once `cancel` fires; the error is
+    never returned as text, so it can't end up in the preview or the PDF.
+    """
+    # Identical requests in flight at the same time share one JamAI call
+    try:
+        return single_flight(
+            content_key("rewrite", contract_text, language),
+            _generate_corrected_contract, contract_text, language, cancel,
+            cancel=cancel
+        )
+    except OperationCancelled as e:
+        print(f"🛑 Rewrite cancelled: {e}")
+        raise
+
+def _generate_corrected_contract(contract_text: str, language: str = "en", cancel: Optional[CancelToken] = None) -> str:
+    prompt = build_prompt(contract_text, language)
 
     try:
-        response = jamai.table.add_table_rows(
-            table_type=t.TableType.ACTION,
-            request=t.MultiRowAddRequest(
-                table_id=TABLE_ID,
-                data=[{"question": prompt}],
-                stream=False
-            )
+        check(cancel, "the rewrite request")
+        response = gateway.call(
+            add_action_rows,
+            TABLE_ID,
+            [{"question": prompt}],
+            priority=INTERACTIVE,
+            cancel=cancel
         )
+        check(cancel, "parsing the rewrite")
 
+        text = ""
         if response.rows:
             row = response.rows[0]
             # Find output column
-            for col in ["answer"]:
-                if col in row.columns:
-                    text = row.columns[col].text
-                    # Clean Markdown
-                    text = re.sub(r'^```(markdown)?', '', text.strip())
-                    return re.sub(r'```$', '', text).strip()
-            
-            # Fallback
-            return list(row.columns.values())[-1].text
-            
-        return "Error: No response."
+            if OUTPUT_COLUMN in row.columns:
+                # Clean Markdown
+                text = strip_markdown_fences(row.columns[OUTPUT_COLUMN].text)
+            else:
+                # Fallback
+                text = list(row.columns.values())[-1].text
+
+    except OperationCancelled:
+        raise
 
     except Exception as e:
-        return f"Generation Error: {str(e)}"
\ No newline at end of file
+        raise GenerationError(str(e)) from e
+
+    if not (text or "").strip():
+        raise GenerationError("No response.")
+    return text
+
+
+class FenceStripper:
+    """
+    Streaming version of strip_markdown_fences().
+    Holds back just enough text to recognise an opening ```markdown fence and
+    a closing ``` fence, and passes everything else through immediately.
+    """
+
+    def __init__(self):
+        self.head = ""          # Text seen before we know whether it opens with a fence
+        self.started = False
+        self.emitted = False    # Leading whitespace after the opening fence is dropped
+        self.tail = ""          # Text that might still turn out to be the closing fence
+
+    def feed(self, chunk: str) -> str:
+        if not self.started:
+            self.head += chunk
+            stripped = self.head.lstrip()
+            # Wait until we can tell "```markdown" apart from ordinary text
+            if len(stripped) < len(FENCE + "markdown") and (FENCE + "markdown").startswith(stripped):
+                return ""
+            self.started = True
+            chunk = re.sub(r'^```(markdown)?', '', stripped)
+
+        text = self.tail + chunk
+        if not self.emitted:
+            text = text.lstrip()
+        # Keep trailing whitespace and any partial "```" back until more text arrives
+        body = text.rstrip()
+        for size in range(len(FENCE), 0, -1):
+            if body.endswith(FENCE[:size]):
+                body = body[:-size].rstrip()
+                break
+        self.tail = text[len(body):]
+        self.emitted = self.emitted or bool(body)
+        return body
+
+    def flush(self) -> str:
+        if not self.started:
+            return strip_markdown_fences(self.head)
+        return re.sub(r'```$', '', self.tail.rstrip()).rstrip()
+
+
+def stream_corrected_contract(contract_text: str, language: str = "en", cancel: Optional[CancelToken] = None) -> Iterator[str]:
+    """
+    Same as generate_corrected_contract() but yields the rewritten contract in
+    chunks as the model writes it, with Markdown fences already removed.
+    Stops (closing the stream) and raises OperationCancelled once `cancel` fires.
+    JamAI errors are raised rather than yielded as well: the text streamed so
+    far is incomplete, and the caller must not treat it as a contract.
+    """
+    prompt = build_prompt(contract_text, language)
+    stripper = FenceStripper()
+
+    completion = gateway.stream(
+        add_action_rows,
+        TABLE_ID,
+        [{"question": prompt}],
+        stream=True,
+        priority=INTERACTIVE,
+        cancel=cancel
+    )
+
+    for chunk in completion:
+        # Skip reference chunks and other output columns
+        column = getattr(chunk, "output_column_name", None) or getattr(chunk, "column_name", None)
+        text = getattr(chunk, "text", None)
+        if column != OUTPUT_COLUMN or not text:
+            continue
+        piece = stripper.feed(text)
+        if piece:
+            yield piece
+
+    yield stripper.flush()
+
+
+# ------------------ TARGETED CLAUSE REWRITING ------------------
+def locate_flagged_spans(contract_text: str, violations: List[Dict[str, Any]]) -> List[Tuple[int, int, List[Dict[str, Any]]]]:
+    """
+    Maps each flagged clause back to (start, end) offsets in the contract.
+    Uses the verbatim quote when it can be found, otherwise the closest whole
+    clause. Overlapping spans are merged so each region is rewritten once.
+    Returns a sorted list of (start, end, [violations in that span]).
+    """
+    spans = clause_spans(contract_text)
+    clauses = [contract_text[a:b] for a, b in spans]
+    located = []
+
+    for violation in violations:
+        quote = (violation.get("text") or "").strip()
+        if not quote:
+            continue
+        start = contract_text.find(quote)
+        if start != -1:
+            located.append([start, start + len(quote), [violation]])
+            continue
+        index = find_clause_index(quote, clauses)
+        if index != -1:
+            located.append([spans[index][0], spans[index][1], [violation]])
+        else:
+            print(f"⚠️ Could not locate flagged clause: {quote[:60]}...")
+            return []
+
+    # Merge overlaps
+    located.sort(key=lambda item: item[0])
+    merged = []
+    for start, end, items in located:
+        if merged and start < merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+            merged[-1][2].extend(items)
+        else:
+            merged.append([start, end, items])
+    return [tuple(item) for item in merged]
+
+
+def build_clause_prompt(clause_text: str, violations: List[Dict[str, Any]], language: str = "en") -> str:
+    """Prompt for rewriting a single clause, with the auditor's reason / correction hints."""
+    target_lang = "Bahasa Melayu" if language == 'ms' else "English"
+    hints = []
+    for violation in violations:
+        for category, details in (violation.get("illegal") or {}).items():
+            if isinstance(details, dict):
+                hint = f"- {category}: {details.get('reason', '')}"
+                if details.get("corrected"):
+                    hint += f" (Suggested: {details['corrected']})"
+            else:
+                hint = f"- {category}: {details}"
+            hints.append(hint)
+
+    return (
+        f"Target Language: {target_lang}\n\n"
+        "Rewrite ONLY the clause below so it complies with Malaysian labour law. "
+        "Keep its numbering and return the corrected clause text only.\n\n"
+        "Issues:\n" + "\n".join(hints) + "\n\n"
+        f"Contract:\n{clause_text}"
+    )
+
+
+def _rewrite_clause(prompt: str, cancel: Optional[CancelToken] = None) -> str:
+    """One small Contract_Generator call. Returns "" on any failure other than cancellation."""
+    try:
+        response = gateway.call(
+            add_action_rows,
+            TABLE_ID,
+            [{"question": prompt}],
+            priority=INTERACTIVE,
+            cancel=cancel
+        )
+        if response.rows and OUTPUT_COLUMN in response.rows[0].columns:
+            return strip_markdown_fences(response.rows[0].columns[OUTPUT_COLUMN].text)
+    except OperationCancelled:
+        raise
+    except Exception as e:
+        print(f"🔥 Clause rewrite error: {e}")
+    return ""
+
+
+def _is_replaced(original: str, rewritten: str) -> bool:
+    return bool(rewritten.strip()) and normalize_clause(rewritten) != normalize_clause(original)
+
+
+def generate_targeted_contract(contract_text: str, violations: List[Dict[str, Any]], language: str = "en",
+                               cancel: Optional[CancelToken] = None) -> str:
+    """
+    Rewrites only the flagged clauses (concurrently) and splices them back into
+    the original text. Everything outside the flagged spans is kept byte-for-byte.
+    Falls back to a full generate_corrected_contract() if any flagged clause
+    can't be located or isn't actually replaced. Raises GenerationError /
+    OperationCancelled like generate_corrected_contract().
+    """
+    try:
+        return single_flight(
+            content_key("targeted", contract_text, json.dumps(violations, sort_keys=True, default=str), language),
+            _generate_targeted_contract, contract_text, violations, language, cancel,
+            cancel=cancel
+        )
+    except OperationCancelled as e:
+        print(f"🛑 Targeted rewrite cancelled: {e}")
+        raise
+
+def _generate_targeted_contract(contract_text: str, violations: List[Dict[str, Any]], language: str = "en",
+                                cancel: Optional[CancelToken] = None) -> str:
+    spans = locate_flagged_spans(contract_text, violations)
+    if not spans:
+        return generate_corrected_contract(contract_text, language, cancel)
+
+    originals = [contract_text[start:end] for start, end, _ in spans]
+    prompts = [build_clause_prompt(original, items, language) for original, (_, _, items) in zip(originals, spans)]
+
+    print(f"✂️ Rewriting {len(spans)} flagged clause(s) instead of the whole contract...")
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_REWRITES) as pool:
+        rewrites = list(pool.map(_rewrite_clause, prompts, [cancel] * len(prompts)))
+
+        # Retry anything that came back empty or unchanged once
+        retry = [i for i, text in enumerate(rewrites) if not _is_replaced(originals[i], text)]
+        check(cancel, "retrying clauses")
+        for i, text in zip(retry, pool.map(_rewrite_clause, [prompts[i] for i in retry], [cancel] * len(retry))):
+            rewrites[i] = text
+
+    # Verify every flagged clause was actually replaced
+    missing = [i for i, text in enumerate(rewrites) if not _is_replaced(originals[i], text)]
+    if missing:
+        print(f"⚠️ {len(missing)} clause(s) not rewritten, falling back to full regeneration")
+        return generate_corrected_contract(contract_text, language, cancel)
+
+    # Splice back from the end so earlier offsets stay valid
+    result = contract_text
+    for (start, end, _), text in sorted(zip(spans, rewrites), key=lambda pair: pair[0][0], reverse=True):
+        result = result[:start] + text + result[end:]
+    return result
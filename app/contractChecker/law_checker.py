@@ -1,20 +1,35 @@
 import json
 import ast
-import os
+import copy
+import hashlib
 import re
-from typing import Dict, Any
-from config import PROJECT_ID, API_KEY
-from jamaibase import JamAI, types as t
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, List, Optional
+from cancellation import CancelToken, OperationCancelled, check
+from jamai_gateway import gateway, add_action_rows, CircuitOpenError, INTERACTIVE
+from single_flight import single_flight, content_key
+from contractChecker.payload_minimizer import minimize_contract, restore_verbatim
+from contractChecker.template_index import reuse_template_audit, remember_audit
+from config import PAYLOAD_MINIMIZATION_ENABLED, SPLIT_AUDIT_ENABLED, SPLIT_AUDIT_TABLES
 
 # ------------------ JamAI Setup ------------------
-os.environ["JAMAI_API_KEY"] = API_KEY
-os.environ["JAMAI_PROJECT_ID"] = PROJECT_ID
-
-jamai = JamAI(project_id=PROJECT_ID, token=API_KEY)
+# The client itself is built lazily by jamai_gateway.get_jamai() on the first audit
 
 # This must match your Table ID in JamAI Base
 TABLE_ID = "Contract_Auditor_Full"
 
+# Last good reports, served while JamAI is unhealthy (circuit open / timed out)
+RECENT_REPORTS_MAX = 64
+_recent_lock = threading.Lock()
+_recent_reports = OrderedDict()
+
+# Split audit: the three section calls run here; landed sections are visible via partial_report()
+_section_pool = ThreadPoolExecutor(max_workers=12, thread_name_prefix="audit-section")
+_partial_lock = threading.Lock()
+_partial_reports = {}
+
 def parse_json_safely(text: str) -> Dict[str, Any]:
     """Helper to clean and parse JSON from AI responses."""
     if not text: 
@@ -40,65 +55,236 @@ def parse_json_safely(text: str) -> Dict[str, Any]:
                 return {}
     return {}
 
-def check_full_contract(contract_text: str) -> Dict[str, Any]:
+def check_full_contract(contract_text: str, priority: str = INTERACTIVE,
+                        cancel: Optional[CancelToken] = None, page_starts: Optional[List[int]] = None) -> Dict[str, Any]:
     """
     Sends text to JamAI and returns a combined dictionary of:
     1. Legal Violations (final_json_report)
     2. Financial Risk Tags (contract_risk)
     3. Employee Facts (employee_data)
+    Identical contracts audited at the same time (any session) share one JamAI call.
+    Someone is waiting on a single-contract validation, so it runs as INTERACTIVE;
+    bulk audits should pass priority=BATCH.
+    Returns {} once `cancel` fires (checked between stages; stops waiting on JamAI).
+    `page_starts` (pdf_parser.extract_pages_from_pdf) lets running headers and
+    footers be left out of the request.
     """
-    print("🚀 Sending contract to JamAI Auditor...")
+    try:
+        return single_flight(
+            content_key("audit", contract_text), _audit_contract, contract_text, priority, cancel, page_starts,
+            cancel=cancel
+        )
+    except OperationCancelled as e:
+        print(f"🛑 Audit cancelled: {e}")
+        return {}
 
+def audit_fragment(fragment_text: str, priority: str = INTERACTIVE,
+                   cancel: Optional[CancelToken] = None) -> Dict[str, Any]:
+    """
+    Audits an excerpt of a contract (e.g. the clauses a revision changed).
+    Same report shape as check_full_contract(), but an excerpt is not a
+    contract: it is never learned as a template nor kept as a recent report.
+    Returns {} if the audit failed or `cancel` fired.
+    """
     try:
-        # 1. Send Request to JamAI Action Table
-        response = jamai.table.add_table_rows(
-            table_type=t.TableType.ACTION,
-            request=t.MultiRowAddRequest(
-                table_id=TABLE_ID,
-                data=[{"full_contract_text": contract_text}],
-                stream=False
-            )
+        return single_flight(
+            content_key("audit-fragment", fragment_text), _audit_fragment, fragment_text, priority, cancel,
+            cancel=cancel
         )
+    except OperationCancelled as e:
+        print(f"🛑 Audit cancelled: {e}")
+        return {}
 
-        if not response.rows: 
-            return {}
+def _recent_report(report_key: str) -> Dict[str, Any]:
+    """Copy of the last good report for this text ({} if none)."""
+    with _recent_lock:
+        return copy.deepcopy(_recent_reports.get(report_key, {}))
 
-        row = response.rows[0]
-        
-        # 2. Extract Columns (Safe Fetching)
-        
-        # A. Legal Violations (Try exact name first, then fallbacks)
-        raw_report = ""
-        if "final_json_report" in row.columns:
-            raw_report = row.columns["final_json_report"].text
-        
-            
-        # B. Financial Risk Tags (The simplified prompt output)
-        raw_risk = ""
-        if "contract_risk" in row.columns:
-            raw_risk = row.columns["contract_risk"].text
-            
-        # C. Employee Data (Salary, Name, etc.)
-        raw_facts = ""
-        if "employee_data" in row.columns:
-            raw_facts = row.columns["employee_data"].text
-
-        # 3. Parse and Combine
-        final_data = parse_json_safely(raw_report)
-        risk_data = parse_json_safely(raw_risk)
-        facts_data = parse_json_safely(raw_facts)
-
-        # Merge them into the structure expected by main.py/core.py
-        if not final_data:
-            final_data = {"summary": {}, "violations": []}
-
-        # Store with keys that match core.py expectations
-        final_data["contract_risk"] = risk_data
-        final_data["employee_data"] = facts_data
-
-        print("✅ Data received from JamAI")
+def _remember_recent(report_key: str, report: Dict[str, Any]):
+    with _recent_lock:
+        _recent_reports[report_key] = copy.deepcopy(report)
+        _recent_reports.move_to_end(report_key)
+        while len(_recent_reports) > RECENT_REPORTS_MAX:
+            _recent_reports.popitem(last=False)
+
+def partial_report(contract_text: str) -> Dict[str, Any]:
+    """
+    Sections of a split audit that have already landed (keys of the merged
+    report: summary / violations, contract_risk, employee_data). Empty once
+    the audit has finished or when it isn't running split.
+    """
+    with _partial_lock:
+        return dict(_partial_reports.get(hashlib.sha1(contract_text.encode("utf-8")).hexdigest(), {}))
+
+def _audit_section(column: str, audit_text: str, priority: str, cancel: Optional[CancelToken]) -> Dict[str, Any]:
+    """One output column from its own action table."""
+    response = gateway.call_hedged(
+        "audit", add_action_rows, SPLIT_AUDIT_TABLES[column], [{"full_contract_text": audit_text}],
+        priority=priority, cancel=cancel
+    )
+    check(cancel, f"parsing {column}")
+    if not response.rows or column not in response.rows[0].columns:
+        return {}
+    return parse_json_safely(response.rows[0].columns[column].text)
+
+def _audit_split(report_key: str, audit_text: str, payload, priority: str, cancel: Optional[CancelToken]) -> Dict[str, Any]:
+    """
+    Requests violations, risk tags and employee facts concurrently and publishes
+    each to partial_report() as it lands. Returns the same merged shape as the
+    single-table audit.
+    """
+    futures = {
+        _section_pool.submit(_audit_section, column, audit_text, priority, cancel): column
+        for column in SPLIT_AUDIT_TABLES
+    }
+    sections = {}
+    try:
+        for future in as_completed(futures):
+            column = futures[future]
+            try:
+                sections[column] = future.result()
+            except (CircuitOpenError, TimeoutError, OperationCancelled):
+                raise
+            except Exception as e:
+                if column == "final_json_report":
+                    raise
+                # Risk tags / facts are optional, as when the column is missing
+                print(f"⚠️ Split audit: {column} failed: {e}")
+                sections[column] = {}
+
+            if column == "final_json_report":
+                landed = sections[column] or {"summary": {}, "violations": []}
+                if payload:
+                    restore_verbatim(landed, payload)
+            else:
+                landed = {column: sections[column]}
+            print(f"🧩 Split audit: {column} received")
+            with _partial_lock:
+                _partial_reports.setdefault(report_key, {}).update(landed)
+    finally:
+        with _partial_lock:
+            _partial_reports.pop(report_key, None)
+
+    final_data = sections["final_json_report"] or {"summary": {}, "violations": []}
+    final_data["contract_risk"] = sections["contract_risk"]
+    final_data["employee_data"] = sections["employee_data"]
+    return final_data
+
+def _audit_contract(contract_text: str, priority: str = INTERACTIVE, cancel: Optional[CancelToken] = None,
+                    page_starts: Optional[List[int]] = None) -> Dict[str, Any]:
+    report_key = hashlib.sha1(contract_text.encode("utf-8")).hexdigest()
+    check(cancel, "the template lookup")
+
+    # Another instance of an already audited template: reuse its findings, no JamAI call
+    reused = reuse_template_audit(contract_text)
+    if reused:
+        return reused
+
+    try:
+        final_data = _run_audit(report_key, contract_text, priority, cancel, page_starts)
+        if final_data is None:
+            return {}
+        remember_audit(contract_text, final_data)
+        _remember_recent(report_key, final_data)
         return final_data
 
+    except OperationCancelled:
+        raise
+
+    except (CircuitOpenError, TimeoutError) as e:
+        print(f"🔌 JamAI unhealthy, serving cached audit if available: {e}")
+        return _recent_report(report_key)
+
     except Exception as e:
         print(f"🔥 Critical API Error: {e}")
-        return {}
\ No newline at end of file
+        return {}
+
+def _audit_fragment(fragment_text: str, priority: str, cancel: Optional[CancelToken]) -> Dict[str, Any]:
+    report_key = hashlib.sha1(fragment_text.encode("utf-8")).hexdigest()
+    try:
+        return _run_audit(report_key, fragment_text, priority, cancel) or {}
+
+    except OperationCancelled:
+        raise
+
+    except Exception as e:
+        print(f"🔥 Fragment audit failed: {e}")
+        return {}
+
+def _run_audit(report_key: str, contract_text: str, priority: str, cancel: Optional[CancelToken],
+               page_starts: Optional[List[int]] = None) -> Optional[Dict[str, Any]]:
+    """Minimizes the text and sends it to the auditor (None if no row came back)."""
+    # Headers / footers, page numbers, duplicates and signature blocks are not sent
+    payload = minimize_contract(contract_text, page_starts) if PAYLOAD_MINIMIZATION_ENABLED else None
+    audit_text = payload.text if payload else contract_text
+    if payload:
+        size = payload.stats()
+        print(f"✂️ Contract payload {size['original_chars']:,} -> {size['minimized_chars']:,} chars (-{size['saved_pct']}%)")
+    check(cancel, "the audit request")
+    print("🚀 Sending contract to JamAI Auditor...")
+
+    if SPLIT_AUDIT_ENABLED:
+        # Quotes are restored as the violations land, so partial reports show them too
+        final_data = _audit_split(report_key, audit_text, payload, priority, cancel)
+    else:
+        final_data = _audit_single(audit_text, priority, cancel)
+        if final_data is None:
+            return None
+        # Quoted clauses point back at the text the user uploaded
+        if payload:
+            restore_verbatim(final_data, payload)
+    if payload:
+        final_data["payload"] = payload.stats()
+
+    print("✅ Data received from JamAI")
+    return final_data
+
+def _audit_single(audit_text: str, priority: str, cancel: Optional[CancelToken]):
+    """All three columns from the one Contract_Auditor_Full row (None if no row came back)."""
+    # 1. Send Request to JamAI Action Table (hedged: the audit is idempotent)
+    response = gateway.call_hedged(
+        "audit",
+        add_action_rows,
+        TABLE_ID,
+        [{"full_contract_text": audit_text}],
+        priority=priority,
+        cancel=cancel
+    )
+    check(cancel, "parsing the report")
+
+    if not response.rows: 
+        return None
+
+    row = response.rows[0]
+    
+    # 2. Extract Columns (Safe Fetching)
+    
+    # A. Legal Violations (Try exact name first, then fallbacks)
+    raw_report = ""
+    if "final_json_report" in row.columns:
+        raw_report = row.columns["final_json_report"].text
+    
+        
+    # B. Financial Risk Tags (The simplified prompt output)
+    raw_risk = ""
+    if "contract_risk" in row.columns:
+        raw_risk = row.columns["contract_risk"].text
+        
+    # C. Employee Data (Salary, Name, etc.)
+    raw_facts = ""
+    if "employee_data" in row.columns:
+        raw_facts = row.columns["employee_data"].text
+
+    # 3. Parse and Combine
+    final_data = parse_json_safely(raw_report)
+    risk_data = parse_json_safely(raw_risk)
+    facts_data = parse_json_safely(raw_facts)
+
+    # Merge them into the structure expected by main.py/core.py
+    if not final_data:
+        final_data = {"summary": {}, "violations": []}
+
+    # Store with keys that match core.py expectations
+    final_data["contract_risk"] = risk_data
+    final_data["employee_data"] = facts_data
+    return final_data
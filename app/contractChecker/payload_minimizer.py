@@ -0,0 +1,169 @@
+import bisect
+import re
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from contractChecker.clause_splitter import clause_spans, normalize_clause
+
+# "Page 3 of 10", "Page 3", "Halaman 3 daripada 10"
+PAGE_NUMBER = re.compile(r'\b(?:Page|Halaman|Muka Surat)\s+\d{1,3}(?:\s*(?:of|/|dari|daripada)\s*\d{1,3})?\b', re.IGNORECASE)
+# Segments that are nothing but a page number: "3", "- 3 -", "3 / 10"
+BARE_PAGE_NUMBER = re.compile(r'[-–—\s]*\d{1,3}(?:\s*/\s*\d{1,3})?[-–—\s]*')
+# A page number trailing a running header / footer: "ACME SDN BHD | 3"
+TRAILING_PAGE_NUMBER = re.compile(r'(?:^|[\s|·•\-–—]+)\d{1,3}(?:\s*/\s*\d{1,3})?[\s\-–—]*$')
+
+# Signature blocks, table of contents and other text with no legal content
+NON_SUBSTANTIVE = re.compile(
+    r'^(?:in witness whereof|signed (?:by|for and on behalf)|signature\s*:|witness(?:ed by)?\s*:|'
+    r'table of contents|kandungan|this page (?:is )?intentionally left blank|'
+    r'ditandatangani oleh|tandatangan\s*:|saksi\s*:)'
+    r'|\.{5,}\s*\d+\s*$',
+    re.IGNORECASE
+)
+NON_SUBSTANTIVE_MAX_CHARS = 400     # Longer segments are kept even if they match (they may hold real terms)
+
+HEADER_MAX_CHARS = 150              # Repeated per-page headers / footers are short...
+HEADER_MIN_REPEATS = 3              # ...and open or close at least this many distinct pages
+DUPLICATE_MIN_CHARS = 40            # Shorter repeats are left alone (headings, "Nil", etc.)
+
+
+class MinimizedContract:
+    """
+    The text sent to the auditor plus a map back to the original text.
+    The minimized text is made only of verbatim slices of the original
+    ("pieces"), joined by a blank line or a space where text was removed.
+    """
+
+    def __init__(self, original: str, pieces: List[Tuple[int, int]], removed: Counter):
+        self.original = original
+        self.removed = removed
+        self.starts = []        # Offset of each piece in the minimized text
+        self.pieces = pieces    # (start, end) of each piece in the original text
+
+        parts, length = [], 0
+        for i, (start, end) in enumerate(pieces):
+            if i:
+                separator = "\n\n" if "\n" in original[pieces[i - 1][1]:start] else " "
+                parts.append(separator)
+                length += len(separator)
+            self.starts.append(length)
+            parts.append(original[start:end])
+            length += end - start
+        self.text = "".join(parts)
+
+    def to_original(self, start: int, end: int) -> Tuple[int, int]:
+        """Maps a [start, end) range of the minimized text to the original text."""
+        if not self.pieces:
+            return 0, 0
+        i = max(bisect.bisect_right(self.starts, start) - 1, 0)
+        piece_start, piece_end = self.pieces[i]
+        original_start = piece_start + (start - self.starts[i])
+        if original_start >= piece_end and i + 1 < len(self.pieces):
+            original_start = self.pieces[i + 1][0]   # Started inside a separator
+
+        j = max(bisect.bisect_right(self.starts, max(end - 1, start)) - 1, 0)
+        piece_start, piece_end = self.pieces[j]
+        original_end = min(piece_start + (end - self.starts[j]), piece_end)
+        return original_start, max(original_end, original_start)
+
+    def verbatim(self, snippet: str) -> str:
+        """The original text behind a snippet quoted from the minimized text (or the snippet itself)."""
+        index = self.text.find(snippet.strip()) if snippet else -1
+        if index == -1:
+            return snippet
+        start, end = self.to_original(index, index + len(snippet.strip()))
+        return self.original[start:end]
+
+    def stats(self) -> Dict[str, Any]:
+        before, after = len(self.original), len(self.text)
+        return {
+            "original_chars": before,
+            "minimized_chars": after,
+            "saved_pct": round(100 * (before - after) / before, 1) if before else 0.0,
+            "removed": dict(self.removed)
+        }
+
+
+def _segment_key(text: str) -> str:
+    """Normalized segment text without page numbers."""
+    return normalize_clause(PAGE_NUMBER.sub('', text))
+
+
+def _header_key(key: str) -> str:
+    """A segment key with a trailing page number dropped (running headers differ only by page)."""
+    return TRAILING_PAGE_NUMBER.sub('', key)
+
+
+def _page_edges(spans: List[Tuple[int, int]], page_starts: Optional[List[int]]) -> Tuple[List[bool], List[int]]:
+    """(whether each segment is the first or last one on its page, page index of each segment)."""
+    if not page_starts:
+        return [False] * len(spans), [0] * len(spans)
+    pages = [max(bisect.bisect_right(page_starts, start) - 1, 0) for start, _ in spans]
+    edges = [
+        i == 0 or i == len(spans) - 1 or pages[i - 1] != pages[i] or pages[i + 1] != pages[i]
+        for i in range(len(spans))
+    ]
+    return edges, pages
+
+
+def minimize_contract(text: str, page_starts: Optional[List[int]] = None) -> MinimizedContract:
+    """
+    Strips what the auditor doesn't need: page numbers, headers / footers
+    repeated on every page, duplicated passages (first copy kept) and
+    non-substantive sections such as signature blocks and the table of contents.
+    `page_starts` (from pdf_parser.extract_pages_from_pdf) are the offsets where
+    each page begins. A short segment is a header / footer only if it opens or
+    closes at least HEADER_MIN_REPEATS different pages; without page
+    boundaries nothing is treated as one, since repeated body lines (salary
+    schedules, per-year terms) look just like them.
+    """
+    spans = clause_spans(text)
+    segments = [text[start:end] for start, end in spans]
+    keys = [_segment_key(s) for s in segments]
+    edges, pages = _page_edges(spans, page_starts)
+    edge_pages = defaultdict(set)   # header key -> pages that segments with this key open or close
+    for key, is_edge, page in zip(keys, edges, pages):
+        if is_edge:
+            edge_pages[_header_key(key)].add(page)
+
+    drops, removed, seen = [], Counter(), set()
+    for (start, end), segment, key, is_edge in zip(spans, segments, keys, edges):
+        if not key or BARE_PAGE_NUMBER.fullmatch(segment):
+            drops.append((start, end))
+            removed["page_numbers"] += 1
+        elif is_edge and len(segment) <= HEADER_MAX_CHARS and len(edge_pages[_header_key(key)]) >= HEADER_MIN_REPEATS:
+            drops.append((start, end))
+            removed["headers_footers"] += 1
+        elif len(segment) <= NON_SUBSTANTIVE_MAX_CHARS and NON_SUBSTANTIVE.search(segment.strip()):
+            drops.append((start, end))
+            removed["non_substantive"] += 1
+        elif len(segment) >= DUPLICATE_MIN_CHARS and key in seen:
+            drops.append((start, end))
+            removed["duplicates"] += 1
+        else:
+            seen.add(key)
+            # Page numbers glued onto body text by the PDF extractor
+            for match in PAGE_NUMBER.finditer(segment):
+                drops.append((start + match.start(), start + match.end()))
+                removed["page_numbers"] += 1
+
+    # Kept pieces = complement of the dropped ranges, trimmed of whitespace
+    pieces, cursor = [], 0
+    for start, end in sorted(drops) + [(len(text), len(text))]:
+        if start > cursor:
+            chunk = text[cursor:start]
+            lead = len(chunk) - len(chunk.lstrip())
+            trail = len(chunk) - len(chunk.rstrip())
+            if chunk.strip():
+                pieces.append((cursor + lead, start - trail))
+        cursor = max(cursor, end)
+
+    return MinimizedContract(text, pieces, removed)
+
+
+def restore_verbatim(report: Dict[str, Any], payload: MinimizedContract) -> Dict[str, Any]:
+    """Swaps the clause quotes in an audit report for the original (unminimized) text."""
+    for clause in report.get("violations", []) or []:
+        if isinstance(clause, dict) and clause.get("text"):
+            clause["text"] = payload.verbatim(clause["text"])
+    return report
@@ -1,15 +1,22 @@
-import fitz  # PyMuPDF
 import re
 import tempfile
 import os
-from typing import Union
+from typing import List, Tuple, Union
 from io import BytesIO
 
 def extract_text_from_pdf(file_source: Union[str, BytesIO]) -> str:
     """
     Extracts text and fixes common PDF spacing/newline issues.
     """
-    text = ""
+    return extract_pages_from_pdf(file_source)[0]
+
+def extract_pages_from_pdf(file_source: Union[str, BytesIO]) -> Tuple[str, List[int]]:
+    """
+    Same text as extract_text_from_pdf(), plus the offset in it where each
+    page starts (pages are separated by a blank line). The payload minimizer
+    uses the page boundaries to tell running headers / footers from body text.
+    """
+    pages = []
     temp_file_path = None
 
     try:
@@ -23,45 +30,59 @@ def extract_text_from_pdf(file_source: Union[str, BytesIO]) -> str:
                 pdf_path = tmp.name
                 temp_file_path = tmp.name
         else:
-            return ""
+            return "", []
 
         # --- 2. Extract Text Page by Page ---
+        import fitz  # PyMuPDF (imported on first use: it's slow to load)
+
         with fitz.open(pdf_path) as doc:
             for page in doc:
-                # Add a newline after each page to prevent joining words across pages
-                text += page.get_text("text") + "\n"
-
-        # --- 3. Smart Cleaning Logic ---
-        
-        # A. Normalize newlines (handle Windows/Linux differences)
-        # Replace \r\n or \r with standard \n
-        cleaned_text = text.replace('\r\n', '\n').replace('\r', '\n')
-
-        # B. Fix Hyphenation (Optional but recommended)
-        # Example: "Respon- \n sibility" -> "Responsibility"
-        cleaned_text = re.sub(r'(\w+)-\n(\w+)', r'\1\2', cleaned_text)
+                pages.append(_clean_page(page.get_text("text")))
 
-        # C. The "Mask & Restore" Strategy
-        # 1. Protect real paragraphs (double newlines) by turning them into a special marker
-        cleaned_text = re.sub(r'\n\s*\n', '||PARAGRAPH||', cleaned_text)
-        
-        # 2. Convert remaining single newlines (which are usually line-wraps) into spaces
-        # This fixes "Employee\nat" -> "Employee at"
-        cleaned_text = cleaned_text.replace('\n', ' ')
-        
-        # 3. Restore the real paragraphs
-        cleaned_text = cleaned_text.replace('||PARAGRAPH||', '\n\n')
-
-        # D. Final Cleanup
-        # Remove multiple spaces (e.g., "Employee   at" -> "Employee at")
-        cleaned_text = re.sub(r'[ \t]+', ' ', cleaned_text)
-        
-        return cleaned_text.strip()
+        # --- 3. Join the pages, remembering where each one starts ---
+        text, page_starts = "", []
+        for page_text in pages:
+            if not page_text:
+                continue
+            if text:
+                text += "\n\n"
+            page_starts.append(len(text))
+            text += page_text
+        return text, page_starts
 
     except Exception as e:
         print(f"Error reading PDF: {e}")
-        return ""
+        return "", []
 
     finally:
         if temp_file_path and os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
\ No newline at end of file
+            os.remove(temp_file_path)
+
+def _clean_page(text: str) -> str:
+    """Smart cleaning of one page's text."""
+    # A. Normalize newlines (handle Windows/Linux differences)
+    # Replace \r\n or \r with standard \n
+    cleaned_text = text.replace('\r\n', '\n').replace('\r', '\n')
+    # Zero-width characters some PDF generators insert between words
+    cleaned_text = re.sub(r'[\u200b\u200c\u200d\uFEFF]', '', cleaned_text)
+
+    # B. Fix Hyphenation (Optional but recommended)
+    # Example: "Respon- \n sibility" -> "Responsibility"
+    cleaned_text = re.sub(r'(\w+)-\n(\w+)', r'\1\2', cleaned_text)
+
+    # C. The "Mask & Restore" Strategy
+    # 1. Protect real paragraphs (double newlines) by turning them into a special marker
+    cleaned_text = re.sub(r'\n\s*\n', '||PARAGRAPH||', cleaned_text)
+    
+    # 2. Convert remaining single newlines (which are usually line-wraps) into spaces
+    # This fixes "Employee\nat" -> "Employee at"
+    cleaned_text = cleaned_text.replace('\n', ' ')
+    
+    # 3. Restore the real paragraphs
+    cleaned_text = cleaned_text.replace('||PARAGRAPH||', '\n\n')
+
+    # D. Final Cleanup
+    # Remove multiple spaces (e.g., "Employee   at" -> "Employee at")
+    cleaned_text = re.sub(r'[ \t]+', ' ', cleaned_text)
+    
+    return cleaned_text.strip()
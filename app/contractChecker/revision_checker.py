@@ -0,0 +1,200 @@
+from difflib import SequenceMatcher
+from typing import Dict, Any, List, Optional
+
+from cancellation import CancelToken
+from contractChecker.clause_splitter import split_clauses, normalize_clause, find_clause_index
+from contractChecker.law_checker import audit_fragment, check_full_contract
+
+# Below this clause-level similarity the new upload is treated as a different contract
+REVISION_SIMILARITY_THRESHOLD = 0.5
+
+
+def diff_clauses(old_text: str, new_text: str) -> Dict[str, Any]:
+    """
+    Compares two contract versions clause by clause.
+    Returns:
+    - old_clauses / new_clauses: the split clause lists
+    - unchanged: {new_index: old_index} for clauses that did not change
+    - changed / added: new-version indices that need re-auditing
+    - removed: old-version indices that no longer exist (or were rewritten)
+    - rewritten: {old_index: [new indices]} for removed clauses whose place
+      was taken by changed ones
+    - similarity: 0..1 ratio of matching clauses
+    """
+    old_clauses = split_clauses(old_text)
+    new_clauses = split_clauses(new_text)
+
+    matcher = SequenceMatcher(
+        None,
+        [normalize_clause(c) for c in old_clauses],
+        [normalize_clause(c) for c in new_clauses],
+        autojunk=False
+    )
+
+    unchanged, changed, added, removed, rewritten = {}, [], [], [], {}
+    for tag, o1, o2, n1, n2 in matcher.get_opcodes():
+        if tag == "equal":
+            for offset in range(n2 - n1):
+                unchanged[n1 + offset] = o1 + offset
+        elif tag == "replace":
+            changed.extend(range(n1, n2))
+            removed.extend(range(o1, o2))
+            for old_index in range(o1, o2):
+                rewritten[old_index] = list(range(n1, n2))
+        elif tag == "insert":
+            added.extend(range(n1, n2))
+        elif tag == "delete":
+            removed.extend(range(o1, o2))
+
+    return {
+        "old_clauses": old_clauses,
+        "new_clauses": new_clauses,
+        "unchanged": unchanged,
+        "changed": changed,
+        "added": added,
+        "removed": removed,
+        "rewritten": rewritten,
+        "similarity": matcher.ratio()
+    }
+
+
+def is_revision_of(old_text: str, new_text: str) -> bool:
+    """True if the new upload looks like an edited version of the old contract."""
+    if not old_text or not new_text:
+        return False
+    return diff_clauses(old_text, new_text)["similarity"] >= REVISION_SIMILARITY_THRESHOLD
+
+
+def _linked_text(item: Dict[str, Any]) -> str:
+    """Returns whichever field the AI used to quote the clause (if any)."""
+    for key in ["text", "clause_text", "clause", "original_clause"]:
+        if isinstance(item.get(key), str) and item.get(key).strip():
+            return item[key]
+    return ""
+
+
+def _risk_key(item: Dict[str, Any]):
+    tag = item.get("calc_tag") or item.get("calculation_tag") or "CALC_NONE"
+    name = item.get("violation_name") or item.get("violation_type") or ""
+    return (tag, name.strip().lower())
+
+
+def _still_flagged(old_index: int, rewritten: Dict[int, list], new_violations: list, new_clauses: list) -> set:
+    """
+    Laws (keys of "illegal") the re-audit still flags on the clause that
+    replaced old clause `old_index`. Findings whose quote can't be placed
+    count for every clause, so an edit is never reported as a fix on a guess.
+    """
+    replacements = set(rewritten.get(old_index, []))
+    flagged = set()
+    for violation in new_violations:
+        new_index = find_clause_index(_linked_text(violation), new_clauses)
+        if new_index == -1 or new_index in replacements:
+            flagged.update((violation.get("illegal") or {}).keys())
+    return flagged
+
+
+def check_contract_revision(new_text: str, previous_text: str, previous_report: Dict[str, Any],
+                            cancel: Optional[CancelToken] = None, page_starts: Optional[List[int]] = None) -> Dict[str, Any]:
+    """
+    Revision-aware audit: only clauses that changed (or were added) since the
+    previous version are sent to the auditor. Findings for unchanged clauses
+    are reused from the previous report; a finding on an edited clause is
+    reported as resolved only for the laws the re-audit no longer flags there.
+
+    The returned dict has the same shape as check_full_contract() (without
+    "payload": only an excerpt was sent), plus:
+    - "revision": summary of the clause diff (the "changed since last version" view)
+    - each violation carries "revision_status": "new" or "unchanged"
+    Returns {} once `cancel` fires, like check_full_contract().
+    `page_starts` is only used when the whole contract has to be audited.
+    """
+    if not previous_report or not previous_text:
+        return check_full_contract(new_text, cancel=cancel, page_starts=page_starts)
+
+    diff = diff_clauses(previous_text, new_text)
+    old_clauses, new_clauses = diff["old_clauses"], diff["new_clauses"]
+    kept_old = set(diff["unchanged"].values())
+    to_audit = sorted(diff["changed"] + diff["added"])
+
+    print(f"♻️ Revision audit: {len(to_audit)} of {len(new_clauses)} clauses changed")
+
+    # --- 1. Audit only the changed / added clauses ---
+    partial_report = {}
+    if to_audit:
+        partial_text = "\n\n".join(new_clauses[i] for i in to_audit)
+        partial_report = audit_fragment(partial_text, cancel=cancel)
+        if not partial_report:
+            # Partial audit failed: don't pretend the edits are clean
+            return {}
+
+    new_violations = [
+        {**v, "revision_status": "new"} for v in partial_report.get("violations", [])
+    ]
+
+    # --- 2. Reuse findings attached to unchanged clauses ---
+    reused_violations, resolved_violations = [], []
+    for violation in previous_report.get("violations", []):
+        old_index = find_clause_index(_linked_text(violation), old_clauses)
+        # -1 means the AI paraphrased the clause; keep the finding rather than drop it silently
+        if old_index == -1 or old_index in kept_old:
+            reused_violations.append({**violation, "revision_status": "unchanged"})
+            continue
+        # Edited / removed clause: resolved only for the laws the re-audit no longer flags on it
+        still_flagged = _still_flagged(old_index, diff["rewritten"], new_violations, new_clauses)
+        illegal = violation.get("illegal") or {}
+        fixed = {law: details for law, details in illegal.items() if law not in still_flagged}
+        if fixed:
+            resolved_violations.append({**violation, "illegal": fixed})
+        elif not illegal and not still_flagged:
+            resolved_violations.append(violation)
+
+    old_risk = previous_report.get("contract_risk") or {}
+    risk_key = "risk_assessment" if old_risk.get("risk_assessment") else "violations"
+    reused_risks = []
+    for item in old_risk.get(risk_key, []):
+        quoted = _linked_text(item)
+        # Risk tags without a quoted clause can't be tied to an edit: after a
+        # re-audit they come from the partial report instead
+        if not to_audit or (quoted and find_clause_index(quoted, old_clauses) in kept_old):
+            reused_risks.append(item)
+
+    # --- 3. Merge risk tags (de-duplicated by tag + name) ---
+    new_risk = partial_report.get("contract_risk") or {}
+    merged_risks = list(reused_risks)
+    seen = {_risk_key(item) for item in merged_risks}
+    for item in new_risk.get("risk_assessment", []) or new_risk.get("violations", []):
+        if _risk_key(item) not in seen:
+            seen.add(_risk_key(item))
+            merged_risks.append(item)
+
+    # --- 4. Merge employee facts (fresh values win) ---
+    facts = dict(previous_report.get("employee_data") or {})
+    facts.update({k: v for k, v in (partial_report.get("employee_data") or {}).items() if v not in (None, "")})
+
+    # --- 5. Clause count: old count minus rewritten clauses plus the new audit's count ---
+    old_total = (previous_report.get("summary") or {}).get("total_clauses_found", len(old_clauses)) or 0
+    new_total = (partial_report.get("summary") or {}).get("total_clauses_found", len(to_audit)) or 0
+    try:
+        total_clauses = max(int(old_total) - len(diff["removed"]), 0) + int(new_total)
+    except (TypeError, ValueError):
+        total_clauses = len(new_clauses)
+
+    summary = dict(previous_report.get("summary") or {})
+    summary.update(partial_report.get("summary") or {})
+    summary["total_clauses_found"] = total_clauses
+
+    return {
+        "summary": summary,
+        "violations": reused_violations + new_violations,
+        "contract_risk": {"risk_assessment": merged_risks} if merged_risks else {},
+        "employee_data": facts,
+        "revision": {
+            "unchanged_count": len(diff["unchanged"]),
+            "changed_clauses": [new_clauses[i] for i in diff["changed"]],
+            "added_clauses": [new_clauses[i] for i in diff["added"]],
+            "removed_clauses": [old_clauses[i] for i in diff["removed"]],
+            "resolved_violations": resolved_violations,
+            "reaudited_count": len(to_audit)
+        }
+    }
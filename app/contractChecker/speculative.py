@@ -0,0 +1,150 @@
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, Callable, Optional
+
+from config import CACHE_DIR, SPECULATIVE_ENABLED, SPECULATIVE_MAX_CALLS_PER_HOUR, SPECULATIVE_WORKERS, ENGINE_DEADLINE_S
+from cancellation import CancelToken, OperationCancelled, wait_future
+
+# Start times of speculative calls, shared by every server process (the budget is deployment-wide)
+BUDGET_DB_PATH = os.path.join(CACHE_DIR, "speculative_budget.sqlite3")
+
+# Shared by every session in this server process
+_executor = ThreadPoolExecutor(max_workers=SPECULATIVE_WORKERS, thread_name_prefix="speculative")
+_lock = threading.Lock()
+_stats = {"started": 0, "used": 0, "cancelled": 0, "abandoned": 0, "over_budget": 0}
+
+
+class SpeculativeTask:
+    """A background call started before the user asked for it."""
+
+    def __init__(self, key: str, future: Future, token: CancelToken):
+        self.key = key
+        self.future = future
+        self.token = token
+        self.cancelled = False
+
+
+def _connect() -> sqlite3.Connection:
+    """New connection per call; transactions are started explicitly (BEGIN IMMEDIATE)."""
+    os.makedirs(os.path.dirname(BUDGET_DB_PATH), exist_ok=True)
+    conn = sqlite3.connect(BUDGET_DB_PATH, timeout=30, isolation_level=None)
+    conn.execute("CREATE TABLE IF NOT EXISTS speculative_calls (started_at REAL NOT NULL)")
+    return conn
+
+
+def _take_budget() -> bool:
+    """
+    Rolling one-hour cap on speculative calls for the whole deployment. The
+    check and the insert run in one write transaction, so concurrent server
+    processes can't overshoot the cap between them.
+    """
+    now = time.time()
+    try:
+        conn = _connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM speculative_calls WHERE started_at <= ?", (now - 3600,))
+            (in_last_hour,) = conn.execute("SELECT COUNT(*) FROM speculative_calls").fetchone()
+            allowed = in_last_hour < SPECULATIVE_MAX_CALLS_PER_HOUR
+            if allowed:
+                conn.execute("INSERT INTO speculative_calls (started_at) VALUES (?)", (now,))
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        # Can't tell how much budget is left: don't spend any
+        print(f"⚠️ Speculative budget unavailable: {e}")
+        allowed = False
+    with _lock:
+        _stats["started" if allowed else "over_budget"] += 1
+    return allowed
+
+
+def _calls_in_last_hour() -> int:
+    try:
+        conn = _connect()
+        try:
+            return conn.execute(
+                "SELECT COUNT(*) FROM speculative_calls WHERE started_at > ?", (time.time() - 3600,)
+            ).fetchone()[0]
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return 0
+
+
+def speculate(key: str, fn: Callable[..., Any], *args, cancel: Optional[CancelToken] = None,
+              **kwargs) -> Optional[SpeculativeTask]:
+    """
+    Starts fn(*args, cancel=<task token>, **kwargs) in the background. `key` identifies
+    the exact request (e.g. file id + mode) so the result is only reused for
+    the same request. The task's token is a child of `cancel` with an
+    ENGINE_DEADLINE_S deadline. Returns None if speculation is disabled or the
+    budget is used up.
+    """
+    if not SPECULATIVE_ENABLED or not _take_budget():
+        return None
+    print(f"🔮 Speculatively starting: {key}")
+    token = CancelToken(ENGINE_DEADLINE_S, parent=cancel)
+    return SpeculativeTask(key, _executor.submit(fn, *args, cancel=token, **kwargs), token)
+
+
+def cancel(task: Optional[SpeculativeTask]):
+    """
+    Drops a speculative task (e.g. a different file was uploaded).
+    Queued work never starts ("cancelled"). Running work is aborted at its
+    next stage and stops waiting on JamAI, but a request already sent still
+    runs to completion ("abandoned", see JamAIGateway.call()).
+    """
+    if task is None or task.cancelled:
+        return
+    task.cancelled = True
+    task.token.cancel("superseded")
+    if task.future.cancel():
+        outcome = "cancelled"
+    elif not task.future.done():
+        outcome = "abandoned"
+    else:
+        return      # Already finished: nothing left to stop
+    with _lock:
+        _stats[outcome] += 1
+
+
+def collect(task: Optional[SpeculativeTask], key: str, fn: Callable[..., Any], *args,
+            cancel: Optional[CancelToken] = None, **kwargs) -> Any:
+    """
+    Returns the speculative result if it belongs to this request (waiting for
+    it if still running). Otherwise, or if the speculative call failed or came
+    back empty, runs fn(*args, cancel=cancel, **kwargs) directly (which returns
+    at once if `cancel` fired). A task still queued for a worker is dropped and
+    run here instead of waiting behind other sessions' speculation.
+    """
+    if task is not None and not task.cancelled and task.key == key:
+        if task.future.cancel():
+            task.cancelled = True
+            print(f"🔮 Speculative call still queued, running it now: {key}")
+        else:
+            try:
+                result = wait_future(task.future, cancel)
+                if result:
+                    with _lock:
+                        _stats["used"] += 1
+                    return result
+            except OperationCancelled:
+                pass
+            except Exception as e:
+                print(f"⚠️ Speculative call failed, retrying directly: {e}")
+    return fn(*args, cancel=cancel, **kwargs)
+
+
+def get_stats() -> dict:
+    """
+    Counts of started / used / cancelled (never ran) / abandoned (dropped while
+    running) / over-budget speculative calls (in_last_hour: all processes).
+    """
+    in_last_hour = _calls_in_last_hour()
+    with _lock:
+        return dict(_stats, in_last_hour=in_last_hour)
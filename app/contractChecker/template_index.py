@@ -0,0 +1,329 @@
+"""
+Near-duplicate contract template detection (MinHash + LSH, SQLite).
+
+Most uploads are one employer template with only the employee's name, IC
+number, contact details, salary and start date changed. Every full audit is
+stored as a template: the text with those variable fields masked is shingled into word 5-grams and
+summarised by a MinHash signature, whose LSH band buckets are indexed in
+SQLite. Only the masked clauses, hashes and the masked report are kept (no
+names or IC numbers), and templates expire after TEMPLATE_TTL_S. A new contract whose signature lands in the same buckets, is
+similar enough, and has exactly the same masked clauses is an instance of
+that template: its clause findings are reused and only the variable fields
+are re-checked locally (salary against the minimum wage, facts fed into
+calculate_liability). No JamAI call is made for it.
+"""
+import copy
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import CACHE_DIR, TEMPLATE_REUSE_ENABLED, TEMPLATE_SIMILARITY, TEMPLATE_TTL_S, TEMPLATE_MAX_ROWS
+from contractChecker.clause_splitter import split_clauses, normalize_clause
+from contractChecker.fact_extractor import AMOUNT, NAME_TITLE, MIN_WAGE_RM, extract_employee_facts
+
+DB_PATH = os.path.join(CACHE_DIR, "templates.sqlite3")
+
+NUM_PERM = 128                  # MinHash signature length
+BANDS, ROWS = 32, 4             # LSH banding (BANDS * ROWS == NUM_PERM); ~0.9 Jaccard pairs collide almost surely
+SHINGLE_WORDS = 5
+MERSENNE_PRIME = (1 << 61) - 1
+
+# Facts that differ between instances of one template; everything else is taken from the template audit
+VARIABLE_FIELDS = ("employee_name", "basic_salary_monthly", "start_date")
+# Variable fields a reused report takes from the local regexes. The name is left out: a regex-read
+# name is only a guess, and the page already shows it as a provisional fact
+REREAD_FIELDS = ("basic_salary_monthly", "start_date")
+
+NRIC = re.compile(r'\b\d{6}-\d{2}-\d{4}\b')
+CONTACT = re.compile(r'[\w.+-]+@[\w-]+\.[\w.]+|(?:\+?6?0)\d{1,2}-?\d{3,4}\s?\d{4}\b')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS templates (
+    id INTEGER PRIMARY KEY,
+    variant_key TEXT NOT NULL UNIQUE,       -- sha1 of the sorted masked clauses + minimum wage finding
+    signature BLOB NOT NULL,                -- NUM_PERM uint64 MinHash values
+    clause_keys TEXT NOT NULL,              -- JSON list of masked clauses
+    report TEXT NOT NULL,                   -- JSON audit report, variable fields masked
+    created_at REAL NOT NULL,
+    reuse_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS template_bands (
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    template_id INTEGER NOT NULL REFERENCES templates(id) ON DELETE CASCADE,
+    PRIMARY KEY (band, bucket, template_id)
+) WITHOUT ROWID;
+"""
+
+_init_lock = threading.Lock()
+_initialized = False
+_permutations = None
+
+
+def _connect() -> sqlite3.Connection:
+    """New connection per call (Streamlit runs sessions on different threads)."""
+    global _initialized
+    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+    if not _initialized:
+        with _init_lock:
+            if not _initialized:
+                conn.execute("PRAGMA journal_mode = WAL")
+                if "contract_text" in {row["name"] for row in conn.execute("PRAGMA table_info(templates)")}:
+                    # Older layout kept the full contract text (names, IC numbers): start over
+                    conn.executescript("DROP TABLE IF EXISTS template_bands; DROP TABLE IF EXISTS templates;")
+                conn.executescript(SCHEMA)
+                _initialized = True
+    return conn
+
+
+# ------------------ Masking & MinHash ------------------
+def mask_variable_fields(contract_text: str, facts: Optional[Dict[str, Any]] = None, names: Tuple[str, ...] = ()) -> str:
+    """
+    The contract with instance-specific values (name, IC number, contact
+    details, basic salary, start date) replaced by placeholders. `names` are
+    extra spellings of the employee's name (e.g. the one the auditor read).
+    Every other amount, date, duration, hour and leave figure is kept: OT
+    rates, deductions, allowances and the like change the findings.
+    """
+    facts = extract_employee_facts(contract_text) if facts is None else facts
+    text = contract_text or ""
+    names = {str(n or "").strip() for n in (facts.get("employee_name"), *names)}
+    for name in sorted(names, key=len, reverse=True):
+        if len(name) >= 3:
+            text = re.sub(re.escape(name), "<name>", text, flags=re.IGNORECASE)
+    text = NAME_TITLE.sub("<name> ", text)
+    salary = facts.get("basic_salary_monthly")
+    if salary is not None:
+        # Only the basic salary itself; the minimum-wage check on it is redone locally
+        text = AMOUNT.sub(lambda m: "<salary>" if _rm(m) == float(salary) else m.group(0), text)
+    start_date = str(facts.get("start_date") or "").strip()
+    if start_date:
+        text = text.replace(start_date, "<start_date>")
+    text = NRIC.sub("<id>", text)
+    return CONTACT.sub("<contact>", text)
+
+
+def _mask_values(value: Any, facts: Dict[str, Any], names: Tuple[str, ...]) -> Any:
+    """mask_variable_fields() applied to every string in a JSON value."""
+    if isinstance(value, str):
+        return mask_variable_fields(value, facts, names)
+    if isinstance(value, dict):
+        return {k: _mask_values(v, facts, names) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_mask_values(v, facts, names) for v in value]
+    return value
+
+
+def _rm(match: re.Match) -> float:
+    return float(match.group(1).replace(",", "") + (match.group(2) or ""))
+
+
+def _shingles(masked_text: str) -> List[int]:
+    words = normalize_clause(masked_text).split()
+    if len(words) < SHINGLE_WORDS:
+        words = words + [""] * (SHINGLE_WORDS - len(words))
+    # crc32, not hash(): signatures are stored and must match across processes
+    return list({
+        zlib.crc32(" ".join(words[i:i + SHINGLE_WORDS]).encode("utf-8"))
+        for i in range(len(words) - SHINGLE_WORDS + 1)
+    })
+
+
+def minhash(masked_text: str):
+    """MinHash signature (numpy uint64 array of NUM_PERM values)."""
+    import numpy as np
+
+    global _permutations
+    if _permutations is None:
+        rng = np.random.RandomState(1)
+        _permutations = (
+            rng.randint(1, 1 << 31, size=NUM_PERM, dtype=np.uint64),
+            rng.randint(0, 1 << 31, size=NUM_PERM, dtype=np.uint64)
+        )
+    a, b = _permutations
+    hashes = np.asarray(_shingles(masked_text), dtype=np.uint64)
+    # a, b < 2^31 and hashes < 2^32, so a * x + b cannot overflow uint64
+    return ((np.outer(hashes, a) + b) % np.uint64(MERSENNE_PRIME)).min(axis=0)
+
+
+def _band_buckets(signature) -> List[int]:
+    """One signed 64-bit bucket id per LSH band (SQLite INTEGER)."""
+    return [
+        int.from_bytes(hashlib.blake2b(signature[i * ROWS:(i + 1) * ROWS].tobytes(), digest_size=8).digest(), "big", signed=True)
+        for i in range(BANDS)
+    ]
+
+
+def _clause_keys(masked_text: str) -> List[str]:
+    return sorted({normalize_clause(c) for c in split_clauses(masked_text)} - {""})
+
+
+def _below_min_wage(facts: Dict[str, Any]):
+    salary = facts.get("basic_salary_monthly")
+    return None if salary is None else float(salary) < MIN_WAGE_RM
+
+
+def _variant_key(clause_keys: List[str], facts: Dict[str, Any]) -> str:
+    """
+    Instances share findings only if their masked clauses are identical and the
+    (masked) salary falls on the same side of the minimum wage.
+    """
+    return hashlib.sha1("\n".join(clause_keys + [f"below_min_wage={_below_min_wage(facts)}"]).encode("utf-8")).hexdigest()
+
+
+# ------------------ Remember / reuse ------------------
+def remember_audit(contract_text: str, report: Dict[str, Any]):
+    """Stores a full audit as a template (once per distinct masked clause set)."""
+    if not TEMPLATE_REUSE_ENABLED or not isinstance(report, dict) or report.get("template"):
+        return
+    if not report.get("summary") and not report.get("violations"):
+        return      # Empty / unparsed auditor output is not worth reusing
+    try:
+        facts = extract_employee_facts(contract_text)
+        # The auditor's reading of the name is masked too, in case the regex picked the wrong one
+        names = (str((report.get("employee_data") or {}).get("employee_name") or ""),)
+        masked = mask_variable_fields(contract_text, facts, names)
+        clause_keys = _clause_keys(masked)
+        if not clause_keys:
+            return
+        signature = minhash(masked)
+        stored = {k: v for k, v in report.items() if k not in ("payload", "revision")}
+        stored["employee_data"] = {k: v for k, v in (stored.get("employee_data") or {}).items() if k not in VARIABLE_FIELDS}
+        stored = _mask_values(stored, facts, names)
+        conn = _connect()
+        try:
+            with conn:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO templates (variant_key, signature, clause_keys, report, created_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (_variant_key(clause_keys, facts), signature.tobytes(), json.dumps(clause_keys, ensure_ascii=False),
+                     json.dumps(stored, ensure_ascii=False, default=str), time.time())
+                )
+                if cursor.rowcount:
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO template_bands (band, bucket, template_id) VALUES (?, ?, ?)",
+                        [(band, bucket, cursor.lastrowid) for band, bucket in enumerate(_band_buckets(signature))]
+                    )
+                    print(f"🧬 Stored contract template #{cursor.lastrowid}")
+                _prune(conn)
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"⚠️ Could not store contract template: {e}")
+
+
+def _prune(conn: sqlite3.Connection):
+    """Drops templates older than TEMPLATE_TTL_S and the oldest beyond TEMPLATE_MAX_ROWS (bands cascade)."""
+    conn.execute("DELETE FROM templates WHERE created_at < ?", (time.time() - TEMPLATE_TTL_S,))
+    conn.execute(
+        "DELETE FROM templates WHERE id NOT IN (SELECT id FROM templates ORDER BY created_at DESC, id DESC LIMIT ?)",
+        (TEMPLATE_MAX_ROWS,)
+    )
+
+
+def _find_template(masked: str, variant_key: str):
+    """
+    (template row, estimated Jaccard): the most similar indexed template with
+    this variant key, or (None, best similarity of any candidate).
+    """
+    import numpy as np
+
+    signature = minhash(masked)
+    conn = _connect()
+    try:
+        candidates = conn.execute(
+            "SELECT DISTINCT template_id FROM template_bands WHERE "
+            + " OR ".join("(band = ? AND bucket = ?)" for _ in range(BANDS)),
+            [v for pair in enumerate(_band_buckets(signature)) for v in pair]
+        ).fetchall()
+        best, best_similarity, closest = None, 0.0, 0.0
+        for (template_id,) in candidates:
+            row = conn.execute(
+                "SELECT * FROM templates WHERE id = ? AND created_at >= ?", (template_id, time.time() - TEMPLATE_TTL_S)
+            ).fetchone()
+            if row is None:
+                continue    # Expired, not pruned yet
+            similarity = float(np.mean(np.frombuffer(row["signature"], dtype=np.uint64) == signature))
+            closest = max(closest, similarity)
+            if row["variant_key"] == variant_key and similarity > best_similarity:
+                best, best_similarity = row, similarity
+        return (best, best_similarity) if best is not None else (None, closest)
+    finally:
+        conn.close()
+
+
+def _remap_violations(violations: List[Dict[str, Any]], contract_text: str, facts: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Points each reused finding (its quote masked) at the matching clause of the new contract."""
+    new_by_key = {}
+    for clause in split_clauses(contract_text):
+        new_by_key.setdefault(normalize_clause(mask_variable_fields(clause, facts)), clause)
+
+    for violation in violations:
+        quote = violation.get("text") or ""
+        if not quote or quote in contract_text:
+            continue
+        needle = normalize_clause(quote)
+        for key, clause in new_by_key.items():
+            if needle and needle in key:
+                violation["text"] = clause
+                break
+    return violations
+
+
+def reuse_template_audit(contract_text: str) -> Optional[Dict[str, Any]]:
+    """
+    The audit report for an instance of an already audited template, or None
+    (not a known template, clauses differ, or a variable field changes the findings).
+    """
+    if not TEMPLATE_REUSE_ENABLED or not contract_text:
+        return None
+    try:
+        started = time.perf_counter()
+        facts = extract_employee_facts(contract_text)
+        masked = mask_variable_fields(contract_text, facts)
+        template, similarity = _find_template(masked, _variant_key(_clause_keys(masked), facts))
+        if template is None or similarity < TEMPLATE_SIMILARITY:
+            if similarity >= TEMPLATE_SIMILARITY:
+                print(f"🧬 Near-duplicate of a known template ({similarity:.0%}) but clauses or salary findings differ, auditing in full")
+            return None
+
+        report = json.loads(template["report"])
+        report["violations"] = _remap_violations(copy.deepcopy(report.get("violations") or []), contract_text, facts)
+        # Template-level facts (employer, probation, notice...) stay; salary and start date are re-read locally
+        employee_data = {k: v for k, v in (report.get("employee_data") or {}).items() if k not in VARIABLE_FIELDS}
+        employee_data.update({k: facts[k] for k in REREAD_FIELDS if k in facts})
+        report["employee_data"] = employee_data
+        report["template"] = {"template_id": template["id"], "similarity": round(similarity, 3)}
+
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute("UPDATE templates SET reuse_count = reuse_count + 1 WHERE id = ?", (template["id"],))
+        finally:
+            conn.close()
+        print(f"🧬 Reused template #{template['id']} audit ({similarity:.0%} similar) in {(time.perf_counter() - started) * 1000:.0f} ms")
+        return report
+    except Exception as e:
+        print(f"⚠️ Template lookup failed, auditing in full: {e}")
+        return None
+
+
+def get_stats() -> Dict[str, int]:
+    try:
+        conn = _connect()
+        try:
+            row = conn.execute("SELECT COUNT(*), COALESCE(SUM(reuse_count), 0) FROM templates").fetchone()
+            return {"templates": row[0], "reused_audits": row[1]}
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return {"templates": 0, "reused_audits": 0}
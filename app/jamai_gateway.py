@@ -0,0 +1,601 @@
+# jamai_gateway.py
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Optional, Tuple
+
+from config import (
+    PROJECT_ID, API_KEY, CACHE_DIR, JAMAI_RATE_PER_SECOND, JAMAI_BURST, JAMAI_MIN_CONCURRENCY,
+    JAMAI_MAX_CONCURRENCY, JAMAI_INITIAL_CONCURRENCY, JAMAI_MAX_RETRIES, JAMAI_SHARED_LIMITER,
+    JAMAI_HEDGE_ENABLED, JAMAI_HEDGE_MIN_DELAY_S, JAMAI_HEDGE_MIN_SAMPLES, JAMAI_CALL_TIMEOUT_S,
+    JAMAI_PRIORITY_WEIGHTS, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_COOLDOWN_S, CANCEL_POLL_INTERVAL_S
+)
+from cancellation import CancelToken, OperationCancelled, wait_future
+
+try:
+    import fcntl  # Cross-process locking (Linux / macOS only)
+except ImportError:
+    fcntl = None
+
+INTERACTIVE = "interactive"     # Someone is waiting on the page for this call
+BATCH = "batch"                 # Bulk / background work that can yield to interactive calls
+
+
+def is_overload_error(error: Exception) -> bool:
+    """True for upstream throttling / overload (HTTP 429 or 5xx)."""
+    status = getattr(error, "status_code", None)
+    if status is None and getattr(error, "response", None) is not None:
+        status = getattr(error.response, "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    message = str(error).lower()
+    return any(marker in message for marker in [
+        "429", "too many requests", "rate limit", "500", "502", "503", "504",
+        "service unavailable", "bad gateway", "gateway timeout"
+    ])
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` requests per second with bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _try_take(self) -> float:
+        """Takes a token if available; otherwise returns seconds until the next one."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        while True:
+            wait = self._try_take()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+
+class FileTokenBucket(TokenBucket):
+    """Token bucket whose state lives in a locked file, shared by every server process."""
+
+    def __init__(self, rate: float, capacity: float, path: str):
+        super().__init__(rate, capacity)
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def _try_take(self) -> float:
+        with open(self.path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                try:
+                    state = json.loads(f.read() or "{}")
+                except ValueError:
+                    state = {}
+                now = time.time()
+                tokens = state.get("tokens", self.capacity)
+                tokens = min(self.capacity, tokens + (now - state.get("updated", now)) * self.rate)
+                wait = 0.0
+                if tokens >= 1:
+                    tokens -= 1
+                else:
+                    wait = (1 - tokens) / self.rate
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps({"tokens": tokens, "updated": now}))
+                return wait
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD concurrency limit: +1 slot per fully successful "window" of calls,
+    halved whenever the upstream throttles or errors with 5xx.
+
+    Queued calls are admitted by weighted fair queuing: each priority class
+    has a virtual clock that advances by 1 / weight per admitted call, and the
+    waiting class with the lowest clock goes next (FIFO within a class). With
+    weights 4:1, interactive calls get at least 80% of the freed slots while
+    batch work keeps 20%, however deep either queue is. An optional `gate`
+    (the rate limiter) is passed by one admitted call at a time, so rate-limit
+    waits follow the same order. A queued call whose cancellation token fires
+    leaves the queue without ever taking a slot.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, weights: dict):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self.waiting = 0
+        self.cond = threading.Condition()
+        self.weights = dict(weights)
+        self.queues = {name: deque() for name in self.weights}
+        self.virtual = {name: 0.0 for name in self.weights}
+        self.clock = 0.0        # Virtual time of the last admitted call
+        self.dispatching = False    # An admitted call is still waiting at the gate
+
+    def priority_class(self, priority: str) -> str:
+        return priority if priority in self.weights else next(iter(self.weights))
+
+    def _next_class(self) -> Optional[str]:
+        waiting = [name for name, queue in self.queues.items() if queue]
+        if not waiting:
+            return None
+        return min(waiting, key=lambda name: (self.virtual[name], -self.weights[name]))
+
+    def acquire(self, priority: str = INTERACTIVE, gate: Optional[Callable[[], None]] = None,
+                cancel: Optional[CancelToken] = None):
+        priority = self.priority_class(priority)
+        ticket = object()
+        with self.cond:
+            queue = self.queues[priority]
+            if not queue:
+                # A class that was idle doesn't bank credit for the time it had nothing queued
+                self.virtual[priority] = max(self.virtual[priority], self.clock)
+            queue.append(ticket)
+            self.waiting += 1
+            while (self.dispatching or self.in_flight >= int(self.limit)
+                   or self._next_class() != priority or queue[0] is not ticket):
+                if cancel is not None and cancel.cancelled:
+                    queue.remove(ticket)
+                    self.waiting -= 1
+                    self.cond.notify_all()
+                    cancel.check("a JamAI slot was free")
+                self.cond.wait(CANCEL_POLL_INTERVAL_S if cancel is not None else None)
+            queue.popleft()
+            self.clock = self.virtual[priority]
+            self.virtual[priority] += 1.0 / self.weights[priority]
+            self.waiting -= 1
+            self.in_flight += 1
+            self.dispatching = gate is not None
+            if gate is None:
+                # The next call in line may also fit under the limit
+                self.cond.notify_all()
+                return
+        try:
+            gate()
+        finally:
+            with self.cond:
+                self.dispatching = False
+                self.cond.notify_all()
+
+    def queue_depths(self) -> dict:
+        with self.cond:
+            return {name: len(queue) for name, queue in self.queues.items()}
+
+    def release(self):
+        with self.cond:
+            self.in_flight -= 1
+            self.cond.notify_all()
+
+    def on_success(self):
+        with self.cond:
+            # Additive increase: roughly +1 after `limit` consecutive successes
+            self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self.cond.notify_all()
+
+    def on_overload(self):
+        with self.cond:
+            # Multiplicative decrease
+            self.limit = max(self.minimum, self.limit / 2)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling JamAI while the circuit breaker is open."""
+
+
+class LocalTimeoutError(TimeoutError):
+    """
+    A hedged call ran out of time while none of its requests was with JamAI
+    (all waiting for a slot or backing off here). Local load, not an
+    upstream failure: the circuit breaker doesn't count it.
+    """
+
+
+class _AttemptProgress:
+    """Where one request of a hedged call is, shared with the caller that waits on it."""
+
+    def __init__(self):
+        self.admitted_at = None     # When it first got a slot (monotonic)
+        self.upstream = False       # JamAI is working on it right now
+
+
+class CircuitBreaker:
+    """
+    closed -> open after N consecutive failures; open -> half-open after a
+    cooldown, letting one trial call through; the trial decides which way it goes.
+    A trial that ends without an outcome (cancelled, gave up waiting for a slot)
+    is handed back with release_trial() so the next call can be the trial.
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_running = False
+        self.trial_id = 0
+        self.lock = threading.Lock()
+
+    def allow(self) -> Tuple[bool, Optional[int]]:
+        """(allowed, trial id if this call is the half-open trial)."""
+        with self.lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = "half_open"
+                self.trial_running = False
+            if self.state == "closed":
+                return True, None
+            if self.state == "half_open" and not self.trial_running:
+                self.trial_running = True
+                self.trial_id += 1
+                return True, self.trial_id
+            return False, None
+
+    def release_trial(self, trial: Optional[int]):
+        """Frees the half-open trial slot if `trial` still holds it (no-op once it recorded an outcome)."""
+        if trial is None:
+            return
+        with self.lock:
+            if self.state == "half_open" and self.trial_running and self.trial_id == trial:
+                self.trial_running = False
+
+    def record_success(self):
+        with self.lock:
+            self.state = "closed"
+            self.failures = 0
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.threshold:
+                if self.state != "open":
+                    print(f"🔌 JamAI circuit OPEN for {self.cooldown:.0f}s after {self.failures} failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self.trial_running = False
+
+
+class JamAIGateway:
+    """
+    Single choke point for every JamAI call in this process: a token bucket
+    caps the request rate and an AIMD limiter caps how many run at once.
+    Every call is tagged with a priority class (INTERACTIVE / BATCH) that
+    decides its share of the slots while calls are queueing.
+    Throttled calls are retried with exponential backoff, and a circuit
+    breaker fails fast while the upstream keeps failing.
+    """
+
+    def __init__(self):
+        if JAMAI_SHARED_LIMITER and fcntl is not None:
+            self.bucket = FileTokenBucket(JAMAI_RATE_PER_SECOND, JAMAI_BURST, os.path.join(CACHE_DIR, "jamai_bucket.json"))
+        else:
+            self.bucket = TokenBucket(JAMAI_RATE_PER_SECOND, JAMAI_BURST)
+        self.concurrency = AdaptiveConcurrency(JAMAI_INITIAL_CONCURRENCY, JAMAI_MIN_CONCURRENCY, JAMAI_MAX_CONCURRENCY, JAMAI_PRIORITY_WEIGHTS)
+        self.breaker = CircuitBreaker(CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_COOLDOWN_S)
+        # Worker threads for cancellable and hedged calls, one pool per priority class so a
+        # flood of batch work can't hold every thread (and keep interactive calls out of the queue)
+        self.pools = {
+            name: ThreadPoolExecutor(max_workers=JAMAI_MAX_CONCURRENCY * 2, thread_name_prefix=f"jamai-{name}")
+            for name in JAMAI_PRIORITY_WEIGHTS
+        }
+        self.lock = threading.Lock()
+        self.waits = deque(maxlen=500)      # Recent queue wait times (seconds)
+        self.class_waits = {name: deque(maxlen=500) for name in JAMAI_PRIORITY_WEIGHTS}
+        self.latencies = {}                 # operation -> deque of recent durations (seconds)
+        self.counts = {"calls": 0, "throttled": 0, "errors": 0, "retries": 0, "hedged": 0, "hedge_wins": 0,
+                       "short_circuited": 0, "abandoned": 0}
+
+    def _enter(self, priority: str, cancel: Optional[CancelToken] = None):
+        start = time.monotonic()
+        priority = self.concurrency.priority_class(priority)
+        self.concurrency.acquire(priority, gate=self.bucket.acquire, cancel=cancel)
+        with self.lock:
+            self.waits.append(time.monotonic() - start)
+            self.class_waits[priority].append(time.monotonic() - start)
+            self.counts["calls"] += 1
+
+    def _submit(self, priority: str, *args, **kwargs):
+        """Runs _attempt(*args, priority=priority, **kwargs) on the worker pool of its priority class."""
+        pool = self.pools[self.concurrency.priority_class(priority)]
+        return pool.submit(self._attempt, *args, priority=priority, **kwargs)
+
+    def _record_error(self, error: Exception) -> bool:
+        """Updates the limiter; returns True if the call is worth retrying."""
+        overloaded = is_overload_error(error)
+        with self.lock:
+            self.counts["throttled" if overloaded else "errors"] += 1
+        if overloaded:
+            self.concurrency.on_overload()
+        return overloaded
+
+    def _check_circuit(self) -> Optional[int]:
+        """Raises CircuitOpenError while open; returns the trial id if this call is the half-open trial."""
+        allowed, trial = self.breaker.allow()
+        if not allowed:
+            with self.lock:
+                self.counts["short_circuited"] += 1
+            raise CircuitOpenError("JamAI is currently unavailable (circuit open)")
+        return trial
+
+    def call(self, fn: Callable[..., Any], *args, priority: str = INTERACTIVE,
+             cancel: Optional[CancelToken] = None, **kwargs) -> Any:
+        """
+        Runs fn(*args, **kwargs) under the rate / concurrency limits. With a
+        cancellation token the call runs on a gateway thread and the caller
+        stops waiting (OperationCancelled) as soon as the token fires. A call
+        still queued or backing off never reaches JamAI; one JamAI is already
+        working on can't be aborted (the jamaibase client has no per-request
+        cancel), so it runs to completion and is counted as "abandoned".
+        """
+        trial = self._check_circuit()
+        try:
+            if cancel is None:
+                return self._attempt(fn, *args, priority=priority, **kwargs)
+            cancel.check("the JamAI call")
+            progress = _AttemptProgress()
+            future = self._submit(priority, fn, *args, cancel=cancel, progress=progress, **kwargs)
+            try:
+                return wait_future(future, cancel)
+            except OperationCancelled:
+                self._abandon(future, progress)
+                raise
+        finally:
+            self.breaker.release_trial(trial)
+
+    def _abandon(self, future: Future, progress: _AttemptProgress):
+        """Drops an attempt nobody waits for; counts it if its request is already with JamAI."""
+        if not future.cancel() and progress.upstream:
+            with self.lock:
+                self.counts["abandoned"] += 1
+
+    def _attempt(self, fn: Callable[..., Any], *args, priority: str = INTERACTIVE,
+                 cancel: Optional[CancelToken] = None, progress: Optional[_AttemptProgress] = None,
+                 **kwargs) -> Any:
+        """call() without the circuit check (the caller already passed it)."""
+        for attempt in range(JAMAI_MAX_RETRIES + 1):
+            self._enter(priority, cancel)
+            if progress is not None:
+                if progress.admitted_at is None:
+                    progress.admitted_at = time.monotonic()
+                progress.upstream = True
+            try:
+                result = fn(*args, **kwargs)
+                self.concurrency.on_success()
+                self.breaker.record_success()
+                return result
+            except Exception as e:
+                if cancel is not None and cancel.cancelled:
+                    raise OperationCancelled(cancel.reason) from e
+                if not self._record_error(e) or attempt == JAMAI_MAX_RETRIES:
+                    self.breaker.record_failure()
+                    raise
+                with self.lock:
+                    self.counts["retries"] += 1
+                print(f"⏳ JamAI throttled, retrying ({attempt + 1}/{JAMAI_MAX_RETRIES}): {e}")
+            finally:
+                if progress is not None:
+                    progress.upstream = False
+                self.concurrency.release()
+            backoff = min(8.0, 0.5 * 2 ** attempt)
+            cancel.sleep(backoff) if cancel is not None else time.sleep(backoff)
+
+    def stream(self, fn: Callable[..., Any], *args, priority: str = INTERACTIVE,
+               cancel: Optional[CancelToken] = None, **kwargs):
+        """
+        Like call(), but for streaming responses: the slot is held until the
+        stream ends. A fired cancellation token closes the stream (and its
+        connection) at the next chunk.
+        """
+        trial = self._check_circuit()
+        try:
+            self._enter(priority, cancel)
+            chunks = None
+            try:
+                chunks = fn(*args, **kwargs)
+                for chunk in chunks:
+                    if cancel is not None:
+                        cancel.check("the next chunk")
+                    yield chunk
+                self.concurrency.on_success()
+                self.breaker.record_success()
+            except OperationCancelled:
+                raise
+            except Exception as e:
+                self._record_error(e)
+                self.breaker.record_failure()
+                raise
+            finally:
+                if hasattr(chunks, "close"):
+                    chunks.close()
+                self.concurrency.release()
+        finally:
+            # Cancelled or abandoned mid-stream: no outcome was recorded
+            self.breaker.release_trial(trial)
+
+    def hedge_delay(self, operation: str) -> Optional[float]:
+        """p95 latency of recent calls for this operation, or None if there's too little history."""
+        with self.lock:
+            samples = sorted(self.latencies.get(operation, ()))
+        if len(samples) < JAMAI_HEDGE_MIN_SAMPLES:
+            return None
+        return max(JAMAI_HEDGE_MIN_DELAY_S, samples[int(0.95 * (len(samples) - 1))])
+
+    def _wait(self, pending: set, timeout: float, cancel: Optional[CancelToken]):
+        """wait(FIRST_COMPLETED) that raises OperationCancelled as soon as the token fires."""
+        if cancel is None:
+            return wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        end = time.monotonic() + timeout
+        while True:
+            cancel.check("the JamAI response")
+            step = min(CANCEL_POLL_INTERVAL_S, max(0.0, end - time.monotonic()))
+            done, not_done = wait(pending, timeout=step, return_when=FIRST_COMPLETED)
+            if done or time.monotonic() >= end:
+                return done, not_done
+
+    def call_hedged(self, operation: str, fn: Callable[..., Any], *args, priority: str = INTERACTIVE,
+                    cancel: Optional[CancelToken] = None, **kwargs) -> Any:
+        """
+        For idempotent calls only (audit, termination check, Q&A). If the first
+        request is still running after the operation's p95 latency, a second
+        identical request is fired and whichever succeeds first wins.
+        Gives up JAMAI_CALL_TIMEOUT_S after the first request got a slot: with
+        TimeoutError (counted by the circuit breaker) if JamAI was still working
+        on a request, or LocalTimeoutError if they were all queued or backing
+        off here. Raises OperationCancelled as soon as `cancel` fires. Either
+        way, and once one request wins, the others are cancelled through their
+        own tokens (no further retries or hedges are started for them); a
+        request JamAI is already working on still runs to completion and is
+        counted as "abandoned", as in call().
+        """
+        trial = self._check_circuit()
+        try:
+            return self._call_hedged(operation, fn, *args, priority=priority, cancel=cancel, **kwargs)
+        finally:
+            self.breaker.release_trial(trial)
+
+    def _call_hedged(self, operation: str, fn: Callable[..., Any], *args, priority: str,
+                     cancel: Optional[CancelToken], **kwargs) -> Any:
+        if cancel is not None:
+            cancel.check("the JamAI call")
+        attempts = {}   # future -> (its own token, its progress)
+
+        def launch():
+            token, progress = CancelToken(parent=cancel), _AttemptProgress()
+            future = self._submit(priority, fn, *args, cancel=token, progress=progress, **kwargs)
+            attempts[future] = (token, progress)
+            return future
+
+        first = launch()
+        pending, hedge = {first}, None
+        delay = self.hedge_delay(operation) if JAMAI_HEDGE_ENABLED else None
+        last_error = None
+        try:
+            while pending:
+                admitted_at = attempts[first][1].admitted_at
+                wake = [time.monotonic() + CANCEL_POLL_INTERVAL_S] if admitted_at is None else [admitted_at + JAMAI_CALL_TIMEOUT_S]
+                if admitted_at is not None and delay is not None and hedge is None:
+                    wake.append(admitted_at + delay)
+                done, pending = self._wait(pending, max(0.0, min(wake) - time.monotonic()), cancel)
+                for future in done:
+                    if future.exception() is None:
+                        progress = attempts[future][1]
+                        with self.lock:
+                            self.latencies.setdefault(operation, deque(maxlen=200)).append(time.monotonic() - progress.admitted_at)
+                            if future is hedge:
+                                self.counts["hedge_wins"] += 1
+                        return future.result()
+                    last_error = future.exception()
+                if done or admitted_at is None:
+                    continue
+
+                now = time.monotonic()
+                if now >= admitted_at + JAMAI_CALL_TIMEOUT_S:
+                    if any(attempts[future][1].upstream for future in pending):
+                        self.breaker.record_failure()
+                        raise TimeoutError(f"JamAI {operation} took longer than {JAMAI_CALL_TIMEOUT_S}s")
+                    raise LocalTimeoutError(f"JamAI {operation} timed out after {JAMAI_CALL_TIMEOUT_S}s while queued or backing off locally")
+                if delay is not None and hedge is None and now >= admitted_at + delay:
+                    delay = None
+                    # Don't hedge if calls are already queueing: that would only add load
+                    if self.concurrency.waiting == 0:
+                        hedge = launch()
+                        pending.add(hedge)
+                        with self.lock:
+                            self.counts["hedged"] += 1
+        finally:
+            # The winner is done; losers and abandoned attempts stop at their next check
+            for future, (token, progress) in attempts.items():
+                token.cancel("hedged call finished")
+                self._abandon(future, progress)
+        raise last_error
+
+    def stats(self) -> dict:
+        """Queue depth, in-flight calls, current limit and wait-time percentiles (overall and per priority class)."""
+        with self.lock:
+            waits = sorted(self.waits)
+            class_waits = {name: sorted(samples) for name, samples in self.class_waits.items()}
+            counts = dict(self.counts)
+        pct = lambda samples, p: samples[min(len(samples) - 1, int(p * len(samples)))] if samples else 0.0
+        depths = self.concurrency.queue_depths()
+        return {
+            **counts,
+            "queue_depth": self.concurrency.waiting,
+            "in_flight": self.concurrency.in_flight,
+            "concurrency_limit": int(self.concurrency.limit),
+            "circuit": self.breaker.state,
+            "wait_p50_s": pct(waits, 0.50),
+            "wait_p95_s": pct(waits, 0.95),
+            "classes": {
+                name: {
+                    "queued": depths[name],
+                    "samples": len(samples),
+                    "wait_p50_s": pct(samples, 0.50),
+                    "wait_p95_s": pct(samples, 0.95)
+                }
+                for name, samples in class_waits.items()
+            }
+        }
+
+
+# One gateway per server process, shared by every page and engine
+gateway = JamAIGateway()
+
+
+# ------------------ Lazy JamAI client ------------------
+# Importing jamaibase and building a client is slow, so it only happens on the first call
+_clients = {}
+_clients_lock = threading.Lock()
+_standin = None     # Local replacement for JamAI (load_test.py); None in normal use
+
+
+def use_standin(backend):
+    """
+    Routes every action-table call to `backend.add_action_rows(table_id, data, stream)`
+    instead of JamAI. Calls still go through the gateway's limits. Pass None to undo.
+    """
+    global _standin
+    _standin = backend
+
+
+def get_jamai(project_id: str = PROJECT_ID, token: str = API_KEY):
+    """JamAI client for these credentials, built once per process on first use."""
+    key = (project_id, token)
+    if key not in _clients:
+        with _clients_lock:
+            if key not in _clients:
+                from jamaibase import JamAI
+
+                if (project_id, token) == (PROJECT_ID, API_KEY):
+                    os.environ["JAMAI_API_KEY"] = API_KEY
+                    os.environ["JAMAI_PROJECT_ID"] = PROJECT_ID
+                _clients[key] = JamAI(project_id=project_id, token=token)
+    return _clients[key]
+
+
+def add_action_rows(table_id: str, data: list, stream: bool = False, client=None):
+    """jamai.table.add_table_rows() on an action table, pass to gateway.call*() / stream()."""
+    if _standin is not None:
+        return _standin.add_action_rows(table_id, data, stream)
+
+    from jamaibase import types as t
+
+    return (client or get_jamai()).table.add_table_rows(
+        table_type=t.TableType.ACTION,
+        request=t.MultiRowAddRequest(table_id=table_id, data=data, stream=stream)
+    )
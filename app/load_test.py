@@ -0,0 +1,382 @@
+# load_test.py
+"""
+Concurrent-user load test for the Contract Checker, Termination and Q&A flows.
+
+    python load_test.py --ramp 1,4,16,32 --duration 20 --latency 1.0 --workers 2
+
+Each simulated session loops over the same engine calls the pages make
+(PDF extraction, audit, liability, targeted rewrite + PDF; workforce upload
++ termination checks; cached / retrieved Q&A) against a local JamAI
+stand-in with configurable latency and error rate. Every concurrency level
+runs in fresh worker processes (like fresh server processes) with their own
+cache directory. Reported per level: throughput, latency percentiles per
+flow, error rate, gateway queue wait and peak RSS per worker.
+"""
+import argparse
+import csv
+import glob
+import io
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(APP_DIR)
+
+# Relative cost of each action table compared to --latency
+TABLE_LATENCY_FACTOR = {"Contract_Auditor_Full": 3.0, "Contract_Generator": 2.0}
+
+QUESTIONS = [
+    "How many days of annual leave is an employee entitled to?",
+    "What is the minimum wage in Peninsular Malaysia?",
+    "How is overtime pay calculated for a normal working day?",
+    "How long is maternity leave under the Employment Act?",
+    "What notice period is required to terminate an employee with 3 years of service?",
+    "Is an employer required to contribute to SOCSO for foreign workers?",
+    "Can an employer deduct wages for damaged equipment?",
+    "What are the maximum working hours per week?",
+]
+
+REASONS = ["Poor Performance", "Misconduct", "Redundancy", "Resignation", "Other"]
+
+
+# ------------------ JamAI STAND-IN ------------------
+class StandInError(Exception):
+    """Simulated upstream failure (status_code makes the gateway treat it as overload)."""
+
+    def __init__(self, message: str, status_code: int = 503):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _cell(text: str):
+    return SimpleNamespace(text=text)
+
+
+class StandInJamAI:
+    """
+    Answers action-table calls locally with plausible, correctly shaped output
+    after a randomized delay. Plugged in with jamai_gateway.use_standin().
+    """
+
+    def __init__(self, latency_s: float, jitter: float, error_rate: float, seed: int):
+        self.latency_s = latency_s
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def _delay(self, table_id: str):
+        with self.lock:
+            factor = TABLE_LATENCY_FACTOR.get(table_id, 1.0)
+            delay = max(0.0, self.rng.gauss(self.latency_s * factor, self.latency_s * factor * self.jitter))
+            failed = self.rng.random() < self.error_rate
+        time.sleep(delay)
+        if failed:
+            raise StandInError("503 Service Unavailable (stand-in)")
+
+    def _audit(self, text: str) -> dict:
+        from contractChecker.clause_splitter import split_clauses
+
+        clauses = split_clauses(text.split("=== REFERENCE ONLY")[0])
+        flagged = [c for c in clauses if any(w in c.lower() for w in ["hour", "overtime", "leave", "notice"])][:3]
+        report = {
+            "summary": {"total_clauses_found": len(clauses)},
+            "violations": [
+                {"text": c, "illegal": {"working_hours": {
+                    "status": "illegal", "reason": "Exceeds the statutory limit (stand-in)", "corrected": "48 hours per week"
+                }}}
+                for c in flagged
+            ]
+        }
+        risk = {"risk_assessment": [
+            {"calc_tag": "CALC_OT", "violation_name": "Excessive working hours", "max_fine_rm": 50000, "jail_term": "None"}
+        ] if flagged else []}
+        facts = {"employee_name": "Load Test", "position_title": "Clerk", "basic_salary_monthly": 2500,
+                 "probation_months": 3, "notice_period_months": 1, "employer_name": "Stand-In Sdn. Bhd."}
+        return {
+            "final_json_report": _cell(json.dumps(report)),
+            "contract_risk": _cell(json.dumps(risk)),
+            "employee_data": _cell(json.dumps(facts))
+        }
+
+    def add_action_rows(self, table_id: str, data: list, stream: bool = False):
+        from config import SPLIT_AUDIT_TABLES
+
+        self._delay(table_id)
+        row = data[0]
+
+        if table_id == "Contract_Auditor_Full":
+            columns = self._audit(row.get("full_contract_text", ""))
+        elif table_id in SPLIT_AUDIT_TABLES.values():
+            # Split audit (SPLIT_AUDIT_ENABLED): each table answers only its own column
+            columns = {
+                column: cell for column, cell in self._audit(row.get("full_contract_text", "")).items()
+                if SPLIT_AUDIT_TABLES[column] == table_id
+            }
+        elif table_id == "Contract_Generator":
+            contract = row.get("question", "").split("Contract:\n", 1)[-1]
+            answer = f"```markdown\n{contract}\n(Revised to comply with the Employment Act 1955.)\n```"
+            if stream:
+                return iter([
+                    SimpleNamespace(output_column_name="answer", text=answer[i:i + 64])
+                    for i in range(0, len(answer), 64)
+                ])
+            columns = {"answer": _cell(answer)}
+        elif table_id == "Termination&Compensation_Generator":
+            columns = {"output": _cell(json.dumps({
+                "legal_to_terminate": True, "required_notice_period": 1, "severance_pay": 3000,
+                "unused_leave_pay": 500, "legal_reasons_if_cannot": ""
+            }))}
+        else:
+            columns = {"Final": _cell("Under the Employment Act 1955 ... (stand-in answer)")}
+        return SimpleNamespace(rows=[SimpleNamespace(columns=columns)])
+
+
+# ------------------ FIXTURES ------------------
+def synthetic_employees_csv(rows: int, seed: int) -> bytes:
+    """Employee file in the same layout as mock_employees.csv."""
+    rng = random.Random(seed)
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["name", "role", "start_date", "salary", "unused_leave", "contract_type", "probation_status"])
+    for i in range(rows):
+        writer.writerow([
+            f"Employee {i}", rng.choice(["Clerk", "Engineer", "HR Executive", "Technician"]),
+            f"{rng.randint(1, 28)}/{rng.randint(1, 12):02d}/{rng.randint(2012, 2024)}",
+            rng.randint(1500, 12000), rng.randint(0, 14),
+            rng.choice(["permanent", "contract"]), rng.choice(["completed", "ongoing"])
+        ])
+    return out.getvalue().encode("utf-8")
+
+
+def load_contract_pdfs() -> list:
+    paths = sorted(glob.glob(os.path.join(REPO_DIR, "mock_contract*.pdf")))
+    if not paths:
+        sys.exit("No mock_contract*.pdf found next to the app folder")
+    pdfs = []
+    for path in paths:
+        with open(path, "rb") as f:
+            pdfs.append(f.read())
+    return pdfs
+
+
+# ------------------ FLOWS (same calls as the pages) ------------------
+def contract_flow(ctx):
+    from contractChecker.pdf_parser import extract_text_from_pdf
+    from contractChecker.law_checker import check_full_contract
+    from contractChecker.financial_calculator import calculate_liability, simulate_liability
+    from contractChecker.generate_new_contract import generate_targeted_contract
+    from contractChecker.contract_pdf import create_pdf_from_markdown
+    import audit_history
+    import session_store
+
+    text = extract_text_from_pdf(io.BytesIO(ctx.rng.choice(ctx.pdfs)))
+    if ctx.unique:
+        text += f"\n\nReference: {uuid.uuid4()}"
+    report = check_full_contract(text)
+    if not report:
+        raise RuntimeError("audit returned no report")
+    session_store.save(ctx.state, "checker_output", report)
+
+    risk, facts = report.get("contract_risk") or {}, report.get("employee_data") or {}
+    liability = calculate_liability(risk, facts) if risk else {}
+    if risk:
+        simulate_liability(risk, facts)
+    audit_history.record_audit(text, report, liability, "load_test.pdf")
+
+    violations = report.get("violations", [])
+    if violations:
+        corrected = generate_targeted_contract(text, violations, "en")
+        session_store.save(ctx.state, "corrected_pdf", create_pdf_from_markdown(corrected).getvalue())
+
+
+def termination_flow(ctx):
+    from workforce_cache import load_workforce_file
+    from termination_checker import check_terminations
+
+    df = load_workforce_file("employees.csv", ctx.employees_csv)
+    selected = df.sample(n=min(3, len(df)), random_state=ctx.rng.randint(0, 10 ** 6))
+    for result in check_terminations(selected.to_dict("records"), ctx.rng.choice(REASONS)):
+        if "legal_to_terminate" not in result:
+            raise RuntimeError("termination check returned no decision")
+
+
+def qna_flow(ctx):
+    from answer_cache import get_cached_answer, remember_answer
+    from statute_index import retrieve_sections, format_sections
+    from jamai_gateway import gateway, add_action_rows, INTERACTIVE
+
+    question = ctx.rng.choice(QUESTIONS)
+    if ctx.unique:
+        question += f" (case {uuid.uuid4().hex[:8]})"
+    if get_cached_answer(question):
+        return
+    law_context = format_sections(retrieve_sections([question]))
+    response = gateway.call_hedged(
+        "chat", add_action_rows, "Chatbot", [{"User": law_context + question}], priority=INTERACTIVE
+    )
+    answer = response.rows[0].columns.get("Final") if response.rows else None
+    if not answer:
+        raise RuntimeError("no chat answer")
+    remember_answer(question, answer.text)
+
+
+FLOWS = {"contract": contract_flow, "termination": termination_flow, "qna": qna_flow}
+
+
+# ------------------ WORKER ------------------
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def run_worker(worker_id: int, sessions: int, options: dict) -> dict:
+    """One worker process: `sessions` threads looping over flows until the deadline."""
+    os.chdir(options["cache_root"])     # CACHE_DIR is relative, so each level gets a clean cache
+    if not options["verbose"]:
+        sys.stdout = open(os.devnull, "w")  # Engine progress logs
+    sys.path.insert(0, APP_DIR)
+    from jamai_gateway import gateway, use_standin
+
+    use_standin(StandInJamAI(options["latency"], options["jitter"], options["error_rate"], seed=worker_id))
+    pdfs = load_contract_pdfs()
+    employees_csv = synthetic_employees_csv(options["employees"], seed=0)
+    flow_names = [name for name, weight in options["mix"].items() for _ in range(weight)]
+
+    results, lock = [], threading.Lock()
+    deadline = time.monotonic() + options["duration"]
+
+    def session(session_id: int):
+        ctx = SimpleNamespace(
+            rng=random.Random(worker_id * 1000 + session_id), pdfs=pdfs, employees_csv=employees_csv,
+            unique=options["unique"], state={}
+        )
+        while time.monotonic() < deadline:
+            name = ctx.rng.choice(flow_names)
+            start = time.monotonic()
+            error = None
+            try:
+                FLOWS[name](ctx)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            with lock:
+                results.append((name, time.monotonic() - start, error))
+
+    threads = [threading.Thread(target=session, args=(i,), daemon=True) for i in range(sessions)]
+    started = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return {
+        "worker": worker_id, "sessions": sessions, "elapsed": time.monotonic() - started,
+        "results": results, "peak_rss_mb": _peak_rss_mb(), "gateway": gateway.stats()
+    }
+
+
+# ------------------ REPORTING ------------------
+def _pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))] if values else 0.0
+
+
+def summarize(concurrency: int, workers: list) -> dict:
+    results = [r for w in workers for r in w["results"]]
+    elapsed = max(w["elapsed"] for w in workers)
+    errors = [r for r in results if r[2]]
+    flows = {}
+    for name in FLOWS:
+        latencies = [r[1] for r in results if r[0] == name and not r[2]]
+        count = len([r for r in results if r[0] == name])
+        if count:
+            flows[name] = {
+                "count": count,
+                "error_rate": 1 - len(latencies) / count,
+                "p50_s": _pct(latencies, 0.50), "p95_s": _pct(latencies, 0.95), "p99_s": _pct(latencies, 0.99)
+            }
+    return {
+        "concurrency": concurrency,
+        "throughput_per_s": (len(results) - len(errors)) / elapsed if elapsed else 0.0,
+        "error_rate": len(errors) / len(results) if results else 0.0,
+        "flows": flows,
+        "peak_rss_mb": [w["peak_rss_mb"] for w in workers],
+        "queue_wait_p95_s": max(w["gateway"]["wait_p95_s"] for w in workers),
+        "class_wait_p95_s": {
+            name: max(w["gateway"]["classes"][name]["wait_p95_s"] for w in workers)
+            for name in workers[0]["gateway"]["classes"]
+        },
+        "sample_errors": sorted({e[2] for e in errors})[:5]
+    }
+
+
+def print_summary(s: dict):
+    rss = ", ".join(f"{m:.0f}" for m in s["peak_rss_mb"] if m is not None) or "n/a"
+    print(f"\n=== {s['concurrency']} concurrent sessions ===")
+    print(f"  throughput {s['throughput_per_s']:.2f} flows/s | errors {s['error_rate']:.1%} | "
+          f"queue wait p95 {s['queue_wait_p95_s']:.2f}s | peak RSS per worker (MB): {rss}")
+    print("  queue wait p95 by priority: " + ", ".join(f"{name} {p95:.2f}s" for name, p95 in s["class_wait_p95_s"].items()))
+    for name, f in s["flows"].items():
+        print(f"  {name:<12} n={f['count']:<5} p50 {f['p50_s']:6.2f}s  p95 {f['p95_s']:6.2f}s  "
+              f"p99 {f['p99_s']:6.2f}s  errors {f['error_rate']:.1%}")
+    for error in s["sample_errors"]:
+        print(f"  ⚠️ {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ramp", default="1,2,4,8,16", help="Concurrent sessions per step, e.g. 1,4,16")
+    parser.add_argument("--duration", type=float, default=15, help="Seconds per step")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes (server processes) per step")
+    parser.add_argument("--latency", type=float, default=0.5, help="Stand-in base latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.3, help="Latency std-dev as a fraction of the mean")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of stand-in calls failing with 503")
+    parser.add_argument("--employees", type=int, default=500, help="Rows in the synthetic employee CSV")
+    parser.add_argument("--mix", default="contract=1,termination=1,qna=2", help="Flow weights")
+    parser.add_argument("--unique", action="store_true", help="Make every contract / question unique (defeats caches)")
+    parser.add_argument("--verbose", action="store_true", help="Show the engines' progress logs")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    mix = {k: int(v) for k, v in (part.split("=") for part in args.mix.split(","))}
+    summaries = []
+    for concurrency in [int(c) for c in args.ramp.split(",")]:
+        cache_root = tempfile.mkdtemp(prefix="labour_load_")
+        index_dir = os.path.join(APP_DIR, ".cache", "statute_index")
+        if os.path.isdir(index_dir):
+            shutil.copytree(index_dir, os.path.join(cache_root, ".cache", "statute_index"))
+        options = {
+            "cache_root": cache_root, "duration": args.duration, "latency": args.latency, "jitter": args.jitter,
+            "error_rate": args.error_rate, "employees": args.employees, "mix": mix, "unique": args.unique,
+            "verbose": args.verbose
+        }
+
+        workers = min(args.workers, concurrency)
+        sessions = [concurrency // workers + (1 if i < concurrency % workers else 0) for i in range(workers)]
+        with multiprocessing.get_context("spawn").Pool(workers) as pool:
+            results = pool.starmap(run_worker, [(i, n, options) for i, n in enumerate(sessions)])
+        shutil.rmtree(cache_root, ignore_errors=True)
+
+        summary = summarize(concurrency, results)
+        print_summary(summary)
+        summaries.append(summary)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summaries, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
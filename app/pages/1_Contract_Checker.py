@@ -1,28 +1,34 @@
 import sys
 import os
-import re
-from io import BytesIO
+import time
 import streamlit as st
 
 # Ensure Python can find your subfolder
 sys.path.append(os.path.join(os.path.dirname(__file__), "contractChecker"))
 
-from contractChecker.pdf_parser import extract_text_from_pdf
-from contractChecker.law_checker import check_full_contract
-from contractChecker.generate_new_contract import generate_corrected_contract
-from contractChecker.financial_calculator import calculate_liability
-
-# --- PDF Generation Imports ---
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.enums import TA_JUSTIFY
-from reportlab.lib import colors
+from contractChecker.pdf_parser import extract_pages_from_pdf
+from contractChecker.law_checker import check_full_contract, partial_report
+from contractChecker.generate_new_contract import stream_corrected_contract, generate_targeted_contract
+from contractChecker.financial_calculator import (
+    calculate_liability, simulate_liability, build_liability_model, evaluate_liability_model, employee_terms
+)
+from contractChecker.fact_extractor import extract_employee_facts, provisional_risk, merge_facts
+from config import LIABILITY_SIMULATION_ENABLED, SPLIT_AUDIT_ENABLED, ENGINE_DEADLINE_S
+from contractChecker.revision_checker import check_contract_revision, is_revision_of
+from contractChecker.contract_pdf import create_pdf_from_markdown, IncrementalContractPdf
+from contractChecker import speculative
+import session_store
+import cancellation
+import warmup
+import audit_history
+import rerun_profiler
 
 # --- Page Configuration ---
 st.set_page_config(
     page_title="Malaysian Labour Law Assistant",
     initial_sidebar_state="expanded", layout="wide")
+rerun_profiler.profile_rerun("contract_checker")
+warmup.prewarm("contract")
 
 st.markdown("""
 <style>
@@ -85,6 +91,8 @@ with st.sidebar:
     </div>
     """, unsafe_allow_html=True)
 
+rerun_profiler.render_sidebar()
+
 
 
 def local_detect_language(text):
@@ -98,63 +106,52 @@ def local_detect_language(text):
     malay_count = sum(1 for word in malay_keywords if word in text_lower[:1000])
     return 'ms' if malay_count >= 3 else 'en'
 
-def create_pdf_from_markdown(markdown_text):
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(
-        buffer, 
-        pagesize=A4,
-        rightMargin=72, leftMargin=72, 
-        topMargin=72, bottomMargin=18
-    )
-    styles = getSampleStyleSheet()
-    
-    # Custom Styles
-    header_style = ParagraphStyle(
-        'CustomHeader', parent=styles['Heading2'],
-        fontSize=14, spaceAfter=12, textColor=colors.black, fontName='Helvetica-Bold'
-    )
-    normal_style = ParagraphStyle(
-        'CustomNormal', parent=styles['Normal'],
-        fontSize=11, leading=14, spaceAfter=6, alignment=TA_JUSTIFY
-    )
-
-    story = []
-    lines = markdown_text.split('\n')
-    
-    for line in lines:
-        line = line.strip()
-        if not line:
-            story.append(Spacer(1, 6))
-            continue
-        
-        # Detect Markdown Headers (##)
-        if line.startswith('##'):
-            clean_line = line.replace('#', '').strip()
-            story.append(Paragraph(clean_line, header_style))
-        
-        # Detect Bullets
-        elif line.startswith('- ') or line.startswith('* '):
-            clean_line = line[2:].strip()
-            # Convert bold syntax **text** to HTML <b>text</b>
-            formatted_line = re.sub(r'\*\*(.*?)\*\*', r'<b>\1</b>', clean_line)
-            story.append(Paragraph(f"•  {formatted_line}", normal_style))
-        
-        # Standard Text
-        else:
-            formatted_line = re.sub(r'\*\*(.*?)\*\*', r'<b>\1</b>', line)
-            story.append(Paragraph(formatted_line, normal_style))
+# --- Helper: Financial Dashboard Renderer (Optimized Visuals) ---
+@st.fragment
+def render_what_if(liability_model, employee_data, key):
+    """
+    Salary / probation / notice sliders over the precomputed liability model.
+    Runs as a fragment: moving a slider only redraws this block (no audit, no full rerun).
+    """
+    base_salary, base_probation, base_notice = employee_terms(employee_data)
+    baseline = evaluate_liability_model(liability_model, base_salary, base_probation, base_notice)
+
+    with st.expander(get_text('what_if_title')):
+        w1, w2, w3 = st.columns(3)
+        salary = w1.slider(
+            get_text('what_if_salary'), 0.0, float(max(20000.0, base_salary * 2)), float(max(0.0, base_salary)), step=50.0,
+            key=f"what_if_salary_{key}"
+        )
+        probation_mos = w2.slider(
+            get_text('what_if_probation'), 0.0, float(max(12.0, base_probation)), float(base_probation), step=0.5,
+            key=f"what_if_probation_{key}"
+        )
+        notice_mos = w3.slider(
+            get_text('what_if_notice'), 0.0, float(max(6.0, base_notice)), float(base_notice), step=0.5,
+            key=f"what_if_notice_{key}"
+        )
+
+        what_if = evaluate_liability_model(liability_model, salary, probation_mos, notice_mos)
+        likely_delta = what_if["total_likely_liability"] - baseline["total_likely_liability"]
+        worst_delta = what_if["total_worst_case_liability"] - baseline["total_worst_case_liability"]
+        k1, k2 = st.columns(2)
+        k1.metric(get_text('what_if_likely'), f"RM {what_if['total_likely_liability']:,.2f}",
+                  f"{likely_delta:+,.2f}" if likely_delta else None, delta_color="inverse")
+        k2.metric(get_text('what_if_worst'), f"RM {what_if['total_worst_case_liability']:,.2f}",
+                  f"{worst_delta:+,.2f}" if worst_delta else None, delta_color="inverse")
+        for item in what_if["breakdown"]:
+            st.markdown(item.split("|")[0].strip())
 
-    doc.build(story)
-    buffer.seek(0)
-    return buffer
 
-# --- Helper: Financial Dashboard Renderer (Optimized Visuals) ---
-def render_financial_dashboard(contract_risk, employee_data):
+def render_financial_dashboard(contract_risk, employee_data, simulation=None, provisional=False,
+                               liability_model=None, what_if_key=""):
     if not contract_risk and not employee_data:
         return
 
     st.markdown("---")
     st.subheader("💰 Financial Liability Analysis")
+    if provisional:
+        st.caption(get_text('provisional_caption'))
 
     # 1. Employee Profile (Compact View)
     if employee_data:
@@ -219,6 +216,54 @@ def render_financial_dashboard(contract_risk, employee_data):
                     elif jail_text:
                         col_jail.caption(jail_text)
 
+        # What-if sliders (final report only: widgets can't be drawn twice in one run)
+        if liability_model:
+            render_what_if(liability_model, employee_data or {}, what_if_key)
+
+        # 4. Simulated Range (Monte Carlo over the fine / overtime / leave assumptions)
+        if simulation:
+            total = simulation["total"]
+            st.markdown("##### 🎲 Simulated Liability Range")
+            p1, p2, p3 = st.columns(3)
+            p1.metric("P50 (Typical)", f"RM {total['p50']:,.2f}")
+            p2.metric("P90", f"RM {total['p90']:,.2f}")
+            p3.metric("P99 (Tail Risk)", f"RM {total['p99']:,.2f}")
+            with st.expander(f"🎲 Per-issue percentiles ({simulation['scenarios']:,} scenarios)"):
+                st.dataframe(
+                    [
+                        {"Issue": item["name"], "P50 (RM)": round(item["p50"], 2),
+                         "P90 (RM)": round(item["p90"], 2), "P99 (RM)": round(item["p99"], 2)}
+                        for item in simulation["items"]
+                    ],
+                    hide_index=True, use_container_width=True
+                )
+
+
+def dashboard_inputs(report_data, contract_text, local_facts):
+    """
+    (liability summary, employee facts, simulation, provisional, liability model)
+    for the dashboard. Until the auditor's facts / risk tags land (a split audit
+    delivers them separately), they come from the local extractor; afterwards
+    local facts only fill gaps the auditor left.
+    """
+    report_data = report_data if isinstance(report_data, dict) else {}
+    contract_risk_data = report_data.get("contract_risk") or {}
+    llm_facts = report_data.get("employee_data") or {}
+    provisional = not ("contract_risk" in report_data and "employee_data" in report_data)
+
+    employee_facts = merge_facts(llm_facts, local_facts)
+    if "contract_risk" not in report_data:
+        contract_risk_data = provisional_risk(contract_text, employee_facts)
+
+    liability_summary, simulation, liability_model = {}, {}, {}
+    if contract_risk_data:
+        # Built once; the what-if sliders re-evaluate it without touching the risk JSON
+        liability_model = build_liability_model(contract_risk_data)
+        liability_summary = evaluate_liability_model(liability_model, *employee_terms(employee_facts))
+        if LIABILITY_SIMULATION_ENABLED:
+            simulation = simulate_liability(contract_risk_data, employee_facts)
+    return liability_summary, employee_facts, simulation, provisional, liability_model
+
 
 # --- UI Translations ---
 TRANSLATIONS = {
@@ -250,7 +295,33 @@ TRANSLATIONS = {
         'corrected_label': 'Correction',
         'status_legal': '✅ Legal',
         'status_illegal': '❌ Illegal',
-        'status_missing': '⚪ Not Specified'
+        'status_missing': '⚪ Not Specified',
+        'revision_toggle': '♻️ Treat as revised version of',
+        'revision_title': '🔄 Changed Since Last Version',
+        'revision_unchanged': 'Unchanged Clauses',
+        'revision_reaudited': 'Re-audited Clauses',
+        'revision_resolved': 'Resolved Issues',
+        'revision_changed': 'Changed Clauses:',
+        'revision_added': 'Added Clauses:',
+        'revision_removed': 'Removed / Rewritten Clauses:',
+        'revision_resolved_list': 'Issues No Longer Present:',
+        'revision_new_badge': '🆕 New',
+        'payload_caption': 'Sent to auditor: {after:,} of {before:,} characters ({saved}% of headers, footers, duplicates and signature blocks removed)',
+        'targeted_toggle': '✂️ Rewrite only the flagged clauses (keep the rest unchanged)',
+        'split_waiting': '⏳ Still auditing: {sections}',
+        'template_caption': 'Same template as an earlier audit ({similarity:.0%} similar): clause findings reused, salary and start date re-read from this contract',
+        'section_violations': 'violations',
+        'section_risk': 'risk tags',
+        'section_facts': 'employee facts',
+        'gen_error': '❌ The rewrite failed and nothing was saved, please try again. ({error})',
+        'gen_cancelled': '🛑 The rewrite was stopped and nothing was saved ({reason}).',
+        'provisional_caption': '⏳ Provisional estimate from facts read locally from the contract text. It is refined here once the audit returns.',
+        'what_if_title': '🧮 What-if: salary, probation and notice',
+        'what_if_salary': 'Monthly salary (RM)',
+        'what_if_probation': 'Probation (months)',
+        'what_if_notice': 'Notice period (months)',
+        'what_if_likely': '📉 Likely Liability (what-if)',
+        'what_if_worst': '💥 Worst Case (what-if)'
     },
     'ms': {
         'title': '🏢 Pembantu Undang-Undang Buruh Malaysia',
@@ -280,21 +351,101 @@ TRANSLATIONS = {
         'corrected_label': 'Pembetulan',
         'status_legal': '✅ Sah',
         'status_illegal': '❌ Tidak Sah',
-        'status_missing': '⚪ Tidak Dinyatakan'
+        'status_missing': '⚪ Tidak Dinyatakan',
+        'revision_toggle': '♻️ Anggap sebagai versi semakan bagi',
+        'revision_title': '🔄 Perubahan Sejak Versi Lepas',
+        'revision_unchanged': 'Klausa Tidak Berubah',
+        'revision_reaudited': 'Klausa Disemak Semula',
+        'revision_resolved': 'Isu Diselesaikan',
+        'revision_changed': 'Klausa Diubah:',
+        'revision_added': 'Klausa Ditambah:',
+        'revision_removed': 'Klausa Dibuang / Ditulis Semula:',
+        'revision_resolved_list': 'Isu Yang Tiada Lagi:',
+        'revision_new_badge': '🆕 Baru',
+        'payload_caption': 'Dihantar kepada juruaudit: {after:,} daripada {before:,} aksara ({saved}% pengepala, pengaki, pendua dan blok tandatangan dibuang)',
+        'targeted_toggle': '✂️ Tulis semula klausa bermasalah sahaja (kekalkan selebihnya)',
+        'split_waiting': '⏳ Masih diaudit: {sections}',
+        'template_caption': 'Templat sama seperti audit terdahulu ({similarity:.0%} serupa): dapatan klausa digunakan semula, gaji dan tarikh mula dibaca semula daripada kontrak ini',
+        'section_violations': 'pelanggaran',
+        'section_risk': 'tag risiko',
+        'section_facts': 'maklumat pekerja',
+        'gen_error': '❌ Penulisan semula gagal dan tiada apa-apa disimpan, sila cuba lagi. ({error})',
+        'gen_cancelled': '🛑 Penulisan semula dihentikan dan tiada apa-apa disimpan ({reason}).',
+        'provisional_caption': '⏳ Anggaran sementara daripada maklumat yang dibaca secara tempatan daripada teks kontrak. Ia dikemas kini di sini sebaik sahaja audit selesai.',
+        'what_if_title': '🧮 Bagaimana jika: gaji, tempoh percubaan dan notis',
+        'what_if_salary': 'Gaji bulanan (RM)',
+        'what_if_probation': 'Tempoh percubaan (bulan)',
+        'what_if_notice': 'Tempoh notis (bulan)',
+        'what_if_likely': '📉 Liabiliti Berkemungkinan (bagaimana jika)',
+        'what_if_worst': '💥 Kes Terburuk (bagaimana jika)'
     }
 }
 
 # --- Session State Management ---
 if "checker_output" not in st.session_state: st.session_state.checker_output = None
 if "full_corrected_text" not in st.session_state: st.session_state.full_corrected_text = None
+if "corrected_pdf" not in st.session_state: st.session_state.corrected_pdf = None
 if "detected_language" not in st.session_state: st.session_state.detected_language = 'en'
 if "current_contract_text" not in st.session_state: st.session_state.current_contract_text = ""
 if "file_key" not in st.session_state: st.session_state.file_key = ""
+if "file_name" not in st.session_state: st.session_state.file_name = ""
+if "local_facts" not in st.session_state: st.session_state.local_facts = {}
+if "page_starts" not in st.session_state: st.session_state.page_starts = []
+# Last audited version (used for revision-aware re-audits)
+if "previous_contract_text" not in st.session_state: st.session_state.previous_contract_text = ""
+if "previous_checker_output" not in st.session_state: st.session_state.previous_checker_output = None
+if "previous_file_name" not in st.session_state: st.session_state.previous_file_name = ""
+# Background work started before the user clicks (see contractChecker/speculative.py)
+if "speculative_audit" not in st.session_state: st.session_state.speculative_audit = None
+if "speculative_rewrite" not in st.session_state: st.session_state.speculative_rewrite = None
+# Keys speculation was refused for (budget used up): not asked again on every rerun
+if "speculation_refused" not in st.session_state: st.session_state.speculation_refused = set()
+# Cancelled when the session ends / when a different file is uploaded (see cancellation.py)
+if "session_cancel" not in st.session_state:
+    st.session_state.session_cancel = cancellation.session_token(session_store.current_session_id())
+if "file_cancel" not in st.session_state: st.session_state.file_cancel = None
+
+def run_token():
+    """Token for one engine call on the current file: fires on a new upload, session end or the deadline."""
+    return cancellation.CancelToken(ENGINE_DEADLINE_S, parent=st.session_state.file_cancel)
 
 def get_text(key):
     """Retrieve translation for the current language."""
     return TRANSLATIONS[st.session_state.detected_language].get(key, key)
 
+def show_split_audit_progress(task, key, contract_text, dashboard_slot, progress_slot):
+    """
+    While a split audit (SPLIT_AUDIT_ENABLED) runs in the background task,
+    draws each report section as soon as it lands. Returns when the audit is done.
+    """
+    if task is None or task.cancelled or task.key != key:
+        return
+    shown = None
+    while not task.future.done():
+        partial = partial_report(contract_text)
+        if partial and set(partial) != shown:
+            shown = set(partial)
+            liability_summary, employee_facts, simulation, provisional, _ = dashboard_inputs(
+                partial, contract_text, st.session_state.local_facts
+            )
+            with dashboard_slot.container():
+                render_financial_dashboard(liability_summary, employee_facts, simulation, provisional)
+            with progress_slot.container():
+                if "violations" in partial:
+                    clauses = partial.get("violations") or []
+                    st.warning(f"{get_text('violations_found')}: {sum(len(c.get('illegal', {})) for c in clauses)}")
+                    for clause in clauses:
+                        st.info(clause.get("text", ""))
+                waiting = [
+                    get_text(label) for section, label in [
+                        ("violations", 'section_violations'), ("contract_risk", 'section_risk'), ("employee_data", 'section_facts')
+                    ] if section not in partial
+                ]
+                if waiting:
+                    st.caption(get_text('split_waiting').format(sections=", ".join(waiting)))
+        time.sleep(0.2)
+    progress_slot.empty()
+
 st.title(get_text('title'))
 st.markdown(get_text('subtitle'))
 
@@ -303,17 +454,47 @@ uploaded_file = st.file_uploader(get_text('upload_label'), type=['pdf'])
 if uploaded_file is not None:
     # --- 1. AUTO-PROCESSING ON UPLOAD ---
     if uploaded_file.file_id != st.session_state.file_key:
+        # Keep the last audited version so a revised upload can be diffed against it
+        if session_store.load(st.session_state, "checker_output"):
+            session_store.save(st.session_state, "previous_contract_text", session_store.load(st.session_state, "current_contract_text"))
+            session_store.save(st.session_state, "previous_checker_output", session_store.load(st.session_state, "checker_output"))
+            st.session_state.previous_file_name = st.session_state.file_name
+
         st.session_state.file_key = uploaded_file.file_id
-        st.session_state.checker_output = None
-        st.session_state.full_corrected_text = None
+        st.session_state.file_name = uploaded_file.name
+        session_store.save(st.session_state, "checker_output", None)
+        session_store.save(st.session_state, "full_corrected_text", None)
+        session_store.save(st.session_state, "corrected_pdf", None)
         
-        # Extract Text
-        raw_text = extract_text_from_pdf(uploaded_file)
-        raw_text = re.sub(r'[\u200b\u200c\u200d\uFEFF]', '', raw_text)
-        st.session_state.current_contract_text = raw_text
+        # Extract Text (page offsets let the auditor payload skip running headers / footers)
+        raw_text, st.session_state.page_starts = extract_pages_from_pdf(uploaded_file)
+        session_store.save(st.session_state, "current_contract_text", raw_text)
+        # Milliseconds, so the dashboard can show an estimate before the audit returns
+        st.session_state.local_facts = extract_employee_facts(raw_text)
         
         # Detect Language & Update State
         st.session_state.detected_language = local_detect_language(raw_text)
+
+        # Drop background work for the previous file (including JamAI calls still queued or in flight), then start auditing this one
+        if st.session_state.file_cancel is not None:
+            st.session_state.file_cancel.cancel("a different file was uploaded")
+        st.session_state.file_cancel = cancellation.CancelToken(parent=st.session_state.session_cancel)
+        speculative.cancel(st.session_state.speculative_audit)
+        speculative.cancel(st.session_state.speculative_rewrite)
+        st.session_state.speculative_rewrite = None
+        previous_text = session_store.load(st.session_state, "previous_contract_text")
+        previous_output = session_store.load(st.session_state, "previous_checker_output")
+        if previous_output and is_revision_of(previous_text, raw_text):
+            st.session_state.speculative_audit = speculative.speculate(
+                f"audit:{uploaded_file.file_id}:revision", check_contract_revision,
+                raw_text, previous_text, previous_output, cancel=st.session_state.file_cancel,
+                page_starts=st.session_state.page_starts
+            )
+        else:
+            st.session_state.speculative_audit = speculative.speculate(
+                f"audit:{uploaded_file.file_id}:full", check_full_contract, raw_text,
+                cancel=st.session_state.file_cancel, page_starts=st.session_state.page_starts
+            )
         
         # Rerun immediately to switch the UI language
         st.rerun()
@@ -322,22 +503,81 @@ if uploaded_file is not None:
     st.success(f"{get_text('file_uploaded')} **{uploaded_file.name}**")
     st.info(get_text('detected'))
     
+    # Large values live in the session blob store; session state only holds handles
+    contract_text = session_store.load(st.session_state, "current_contract_text")
+    previous_text = session_store.load(st.session_state, "previous_contract_text")
+    previous_output = session_store.load(st.session_state, "previous_checker_output")
+
+    # Offer a revision-aware audit when this upload looks like an edit of the last one
+    use_revision = False
+    if previous_output:
+        use_revision = st.checkbox(
+            f"{get_text('revision_toggle')} **{st.session_state.previous_file_name}**",
+            value=is_revision_of(previous_text, contract_text)
+        )
+
     col1, col2 = st.columns([1, 1])
+
+    # Financial dashboard: a provisional estimate from the local facts until the audit lands, then refined in place
+    dashboard_slot = st.empty()
+    progress_slot = st.empty()
+    if not session_store.load(st.session_state, "checker_output"):
+        with dashboard_slot.container():
+            liability_summary, employee_facts, simulation, provisional, _ = dashboard_inputs(
+                None, contract_text, st.session_state.local_facts
+            )
+            render_financial_dashboard(liability_summary, employee_facts, simulation, provisional)
     
     # --- 2. VALIDATE BUTTON ---
     with col1:
         if st.button(get_text('validate_btn'), type="primary", use_container_width=True):
             with st.spinner(get_text('processing_val')):
                 # Call JamAI (Uses text from session state - No re-extraction needed)
-                st.session_state.checker_output = check_full_contract(
-                    st.session_state.current_contract_text
-                )
+                # The audit usually already ran in the background after upload
+                if use_revision:
+                    # Only changed / added clauses go to the auditor
+                    session_store.save(st.session_state, "checker_output", speculative.collect(
+                        st.session_state.speculative_audit,
+                        f"audit:{st.session_state.file_key}:revision",
+                        check_contract_revision,
+                        contract_text,
+                        previous_text,
+                        previous_output,
+                        cancel=run_token(),
+                        page_starts=st.session_state.page_starts
+                    ))
+                else:
+                    if SPLIT_AUDIT_ENABLED:
+                        show_split_audit_progress(
+                            st.session_state.speculative_audit, f"audit:{st.session_state.file_key}:full",
+                            contract_text, dashboard_slot, progress_slot
+                        )
+                    session_store.save(st.session_state, "checker_output", speculative.collect(
+                        st.session_state.speculative_audit,
+                        f"audit:{st.session_state.file_key}:full",
+                        check_full_contract,
+                        contract_text,
+                        cancel=run_token(),
+                        page_starts=st.session_state.page_starts
+                    ))
+                # Keep the result for compliance analytics (Audit History page)
+                audit_report = session_store.load(st.session_state, "checker_output")
+                if audit_report:
+                    audit_history.record_audit(
+                        contract_text, audit_report,
+                        calculate_liability(audit_report.get("contract_risk") or {}, audit_report.get("employee_data") or {}),
+                        st.session_state.file_name
+                    )
+
+                # A fresh report invalidates any rewrite prepared from the old one
+                speculative.cancel(st.session_state.speculative_rewrite)
+                st.session_state.speculative_rewrite = None
 
     # --- 3. REPORT DISPLAY ---
-    if st.session_state.checker_output:
+    report_data = session_store.load(st.session_state, "checker_output")
+    if report_data:
         st.markdown("---")
         st.subheader(get_text('report_title'))
-        report_data = st.session_state.checker_output
         
         if isinstance(report_data, dict):
             summary = report_data.get("summary", {})
@@ -355,15 +595,53 @@ if uploaded_file is not None:
         m1.metric(get_text('total_clauses'), total_clauses)
         m2.metric(get_text('issues_found'), len(illegal_clauses))
         m3.metric(get_text('total_violations'), total_violations)
+
+        payload = report_data.get("payload") if isinstance(report_data, dict) else None
+        if payload:
+            st.caption("✂️ " + get_text('payload_caption').format(
+                after=payload.get("minimized_chars", 0),
+                before=payload.get("original_chars", 0),
+                saved=payload.get("saved_pct", 0)
+            ))
+
+        template = report_data.get("template") if isinstance(report_data, dict) else None
+        if template:
+            st.caption("🧬 " + get_text('template_caption').format(similarity=template.get("similarity", 1.0)))
+
+        # --- Changed Since Last Version ---
+        revision = report_data.get("revision") if isinstance(report_data, dict) else None
+        if revision:
+            with st.expander(get_text('revision_title'), expanded=True):
+                r1, r2, r3 = st.columns(3)
+                r1.metric(get_text('revision_unchanged'), revision.get("unchanged_count", 0))
+                r2.metric(get_text('revision_reaudited'), revision.get("reaudited_count", 0))
+                r3.metric(get_text('revision_resolved'), len(revision.get("resolved_violations", [])))
+
+                for label_key, clauses, box in [
+                    ('revision_changed', revision.get("changed_clauses", []), st.warning),
+                    ('revision_added', revision.get("added_clauses", []), st.info),
+                    ('revision_removed', revision.get("removed_clauses", []), st.caption)
+                ]:
+                    if clauses:
+                        st.markdown(f"**{get_text(label_key)}**")
+                        for clause_text in clauses:
+                            box(clause_text)
+
+                if revision.get("resolved_violations"):
+                    st.markdown(f"**{get_text('revision_resolved_list')}**")
+                    for old in revision["resolved_violations"]:
+                        st.success(f"~~{old.get('text', '')}~~")
         
-        # --- Financial Impact Dashboard ---
-        contract_risk_data = report_data.get("contract_risk") or {}
-        employee_facts = report_data.get("employee_data") or {}
-        liability_summary = {}
-        if contract_risk_data:
-            liability_summary = calculate_liability(contract_risk_data, employee_facts)
-        if liability_summary or employee_facts:
-            render_financial_dashboard(liability_summary, employee_facts)
+        # --- Financial Impact Dashboard (replaces the provisional estimate) ---
+        liability_summary, employee_facts, simulation, provisional, liability_model = dashboard_inputs(
+            report_data, contract_text, st.session_state.local_facts
+        )
+        with dashboard_slot.container():
+            if liability_summary or employee_facts:
+                render_financial_dashboard(
+                    liability_summary, employee_facts, simulation, provisional,
+                    liability_model, st.session_state.file_key
+                )
 
         if not illegal_clauses:
             st.success(get_text('no_violations'))
@@ -372,7 +650,8 @@ if uploaded_file is not None:
             
             # Render Violations
             for i, clause in enumerate(illegal_clauses, 1):
-                with st.expander(f"🚩 Clause {i}", expanded=True):
+                badge = f" — {get_text('revision_new_badge')}" if clause.get("revision_status") == "new" else ""
+                with st.expander(f"🚩 Clause {i}{badge}", expanded=True):
                     st.markdown(f"**{get_text('original_clause')}**")
                     st.info(clause.get("text", ""))
                     
@@ -396,34 +675,110 @@ if uploaded_file is not None:
                         if details.get('corrected'):
                             st.success(f"**{get_text('corrected_label')}:** {details['corrected']}")
 
+        # Violations are known: prepare the targeted rewrite in the background
+        rewrite_key = f"rewrite:{st.session_state.file_key}:{st.session_state.detected_language}"
+        if (illegal_clauses and st.session_state.speculative_rewrite is None
+                and rewrite_key not in st.session_state.speculation_refused):
+            st.session_state.speculative_rewrite = speculative.speculate(
+                rewrite_key, generate_targeted_contract,
+                contract_text, illegal_clauses, st.session_state.detected_language,
+                cancel=st.session_state.file_cancel
+            )
+            if st.session_state.speculative_rewrite is None:
+                st.session_state.speculation_refused.add(rewrite_key)
+
         # --- 4. GENERATE BUTTON ---
         st.markdown("---")
         with col2:
             # Only enable if violations exist
-            if st.button(get_text('generate_btn'), type="secondary", use_container_width=True, disabled=not illegal_clauses):
+            generate_clicked = st.button(get_text('generate_btn'), type="secondary", use_container_width=True, disabled=not illegal_clauses)
+            targeted_mode = st.checkbox(get_text('targeted_toggle'), value=True, disabled=not illegal_clauses)
+
+        if generate_clicked and targeted_mode:
+            try:
                 with st.spinner(get_text('processing_gen')):
-                    # Call Generator
-                    st.session_state.full_corrected_text = generate_corrected_contract(
-                        st.session_state.current_contract_text,
-                        st.session_state.detected_language
+                    # Only the flagged clauses go to the drafter; the rest is kept verbatim
+                    corrected_text = speculative.collect(
+                        st.session_state.speculative_rewrite,
+                        rewrite_key,
+                        generate_targeted_contract,
+                        contract_text,
+                        illegal_clauses,
+                        st.session_state.detected_language,
+                        cancel=run_token()
                     )
+            except cancellation.OperationCancelled as e:
+                st.warning(get_text('gen_cancelled').format(reason=e))
+                st.stop()
+            except Exception as e:
+                # No contract came back: nothing to preview or export
+                st.error(get_text('gen_error').format(error=e))
+                st.stop()
+
+            session_store.save(st.session_state, "full_corrected_text", corrected_text)
+            session_store.save(st.session_state, "corrected_pdf", None)
+            st.rerun()
+
+        elif generate_clicked:
+            st.subheader(get_text('preview_title'))
+            preview_box = st.empty()
+            pdf_renderer = IncrementalContractPdf()
+            corrected_text = ""
+
+            try:
+                with st.spinner(get_text('processing_gen')):
+                    # Stream the rewrite into the preview and the PDF story as it arrives
+                    for piece in stream_corrected_contract(
+                        contract_text,
+                        st.session_state.detected_language,
+                        cancel=run_token()
+                    ):
+                        corrected_text += piece
+                        pdf_renderer.feed(piece)
+                        preview_box.markdown(corrected_text + "▌")
+            except cancellation.OperationCancelled as e:
+                # Deadline passed or a different file was uploaded: same as a failure, nothing is kept
+                pdf_renderer = None
+                preview_box.empty()
+                st.warning(get_text('gen_cancelled').format(reason=e))
+                st.stop()
+            except Exception as e:
+                # Half a contract is not a contract: drop the preview and the PDF story
+                pdf_renderer = None
+                preview_box.empty()
+                st.error(get_text('gen_error').format(error=e))
+                st.stop()
+
+            session_store.save(st.session_state, "full_corrected_text", corrected_text)
+            session_store.save(st.session_state, "corrected_pdf", None)
+            if corrected_text:
+                try:
+                    session_store.save(st.session_state, "corrected_pdf", pdf_renderer.finish().getvalue())
+                except Exception as e:
+                    print(f"⚠️ Incremental PDF failed, will rebuild on confirm: {e}")
+            st.rerun()
 
     # --- 5. DOWNLOAD SECTION ---
-    if st.session_state.full_corrected_text:
+    corrected_contract = session_store.load(st.session_state, "full_corrected_text")
+    if corrected_contract:
         st.markdown("---")
         st.subheader(get_text('preview_title'))
         
-        st.text_area("", st.session_state.full_corrected_text, height=300)
+        st.text_area("", corrected_contract, height=300)
         
         # PDF Download Button
         if st.button(get_text('confirm_pdf'), type="primary"):
             with st.spinner(get_text('processing_pdf')):
-                pdf_data = create_pdf_from_markdown(st.session_state.full_corrected_text)
+                # Usually already built while the contract was streaming in
+                pdf_bytes = session_store.load(st.session_state, "corrected_pdf")
+                if pdf_bytes is None:
+                    pdf_bytes = create_pdf_from_markdown(corrected_contract).getvalue()
+                    session_store.save(st.session_state, "corrected_pdf", pdf_bytes)
                 st.success(get_text('success_pdf'))
                 
                 st.download_button(
                     label=get_text('download_btn'),
-                    data=pdf_data.getvalue(),
+                    data=pdf_bytes,
                     file_name="Compliant_Contract.pdf",
                     mime="application/pdf"
                 )
@@ -1,18 +1,23 @@
 import streamlit as st
-import pandas as pd
 from datetime import datetime
 from io import BytesIO
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
 import os
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
 import config
-from termination_checker import check_termination  # <-- use your new helper
+from termination_checker import check_terminations  # <-- one legality call per equivalence class
+from jamai_gateway import INTERACTIVE, BATCH
+import cancellation
+import session_store
+import warmup
+from workforce_cache import load_workforce_file
+import rerun_profiler
 
 st.set_page_config(
     page_title="Malaysian Labour Law Assistant",
     initial_sidebar_state="expanded", layout="wide")
+rerun_profiler.profile_rerun("termination")
+warmup.prewarm("termination")
 
 
 st.markdown("""
@@ -75,16 +80,19 @@ with st.sidebar:
     </div>
     """, unsafe_allow_html=True)
 
+rerun_profiler.render_sidebar()
+
 st.title("📝 Employee Termination & Compensation Generator")
 
 # --- 1️⃣ Upload Employee Data CSV/Excel ---
 uploaded_file = st.file_uploader("Upload Employee CSV/Excel", type=["csv", "xlsx"])
 
 if uploaded_file:
-    if uploaded_file.name.endswith(".csv"):
-        employee_df = pd.read_csv(uploaded_file)
-    else:
-        employee_df = pd.read_excel(uploaded_file)
+    # Parsed once per file (then cached as Arrow for other sessions); reruns reuse this session's frame
+    if st.session_state.get("workforce_file_id") != uploaded_file.file_id:
+        st.session_state.workforce_df = load_workforce_file(uploaded_file.name, uploaded_file.getvalue())
+        st.session_state.workforce_file_id = uploaded_file.file_id
+    employee_df = st.session_state.workforce_df
 
     st.subheader("Preview Employee Data")
     st.dataframe(employee_df)
@@ -100,12 +108,24 @@ if uploaded_file:
 
         # --- 4️⃣ Check Termination & Generate Letter(s) ---
         if st.button("✅ Check Termination & Generate Letter(s)"):
-            for emp_name in selected_employees:
-                employee_row = employee_df[employee_df['name'] == emp_name].iloc[0]
-                employee_data = employee_row.to_dict()
+            selected_rows = [
+                employee_df[employee_df['name'] == emp_name].iloc[0].to_dict() for emp_name in selected_employees
+            ]
+
+            # --- One legality call per (contract type, probation, tenure band, reason) class ---
+            # Stops queued / in-flight legality calls if the session ends or the run overshoots its deadline
+            if "session_cancel" not in st.session_state:
+                st.session_state.session_cancel = cancellation.session_token(session_store.current_session_id())
+            cancel = cancellation.CancelToken(config.ENGINE_DEADLINE_S, parent=st.session_state.session_cancel)
 
-                # --- Call termination_checker helper ---
-                result = check_termination(employee_data, reason)
+            # A single employee is an interactive check; bulk runs yield to chat / contract checks
+            results = check_terminations(
+                selected_rows, reason, INTERACTIVE if len(selected_rows) == 1 else BATCH, cancel=cancel
+            )
+            class_count = len({result["class_key"] for result in results if result})
+            st.caption(f"⚖️ {len(selected_rows)} employee(s) checked with {class_count} legality call(s)")
+
+            for emp_name, employee_data, result in zip(selected_employees, selected_rows, results):
 
                 legal_to_terminate = result.get("legal_to_terminate", False)
 
@@ -125,6 +145,9 @@ if uploaded_file:
                     st.write(f"**Total Compensation: RM {total_comp}**")
 
                     # --- Generate PDF Termination Letter ---
+                    from reportlab.pdfgen import canvas
+                    from reportlab.lib.pagesizes import A4
+
                     buffer = BytesIO()
                     c = canvas.Canvas(buffer, pagesize=A4)
                     width, height = A4
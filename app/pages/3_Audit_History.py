@@ -0,0 +1,176 @@
+import streamlit as st
+import os
+import sys
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
+import audit_history
+import rerun_profiler
+
+st.set_page_config(
+    page_title="Malaysian Labour Law Assistant",
+    initial_sidebar_state="expanded", layout="wide")
+rerun_profiler.profile_rerun("audit_history")
+
+
+st.markdown("""
+<style>
+    .stApp {
+        background-color: inherit;
+        font-family: 'Helvetica Neue', sans-serif;
+    }
+
+    [data-testid="stSidebarNav"]::before {
+        content: "Malaysian Labour Law Assistant";
+        font-size: 1.5em; /* Matches h1 size */
+        text-align: center;
+        display: block;
+        padding: 15px 0 10px 0;
+        font-weight: bold;
+    }
+    
+    [data-testid="stSidebarNav"]::after {
+        content: "";
+        display: block;
+        border-bottom: 1px solid #34495e; 
+        margin-bottom: 10px;
+    }
+    
+    [data-testid="stSidebarNav"] > div:first-child > div:first-child {
+        display: none;
+    }
+
+    [data-testid="stSidebar"] > div:nth-child(1) > div:nth-child(1) > div:nth-child(1) {
+        visibility: hidden;
+        height: 0px; /* Still collapse height just in case, but rely on visibility */
+    }
+
+    .disclaimer {
+        background-color: #FFEE8C;
+        padding: 15px;
+        border-radius: 8px;
+        font-size: 0.9em;
+        color: #2c3e50;
+        border-left: 5px solid #2c3e50;
+        margin-top: 20px;
+    }
+    .disclaimer p, .disclaimer strong {
+        font-weight: normal;
+        color: #003747;
+    }
+</style>
+""", unsafe_allow_html=True)
+
+
+# --- Sidebar Setup ---
+with st.sidebar:
+    st.empty() 
+
+    st.markdown("""
+    <div class="disclaimer">
+        ⚠️ DISCLAIMER: This tool is for informational purposes only and does not constitute legal advice. 
+        Always consult with a qualified legal professional for advice regarding specific legal issues.
+    </div>
+    """, unsafe_allow_html=True)
+
+rerun_profiler.render_sidebar()
+
+# --- UI Translations (language follows the last contract checked in this session) ---
+TRANSLATIONS = {
+    'en': {
+        'title': '🗄️ Audit History & Compliance Analytics',
+        'subtitle': 'Every validated contract audit is recorded here. Figures come from the local history store; nothing is re-audited.',
+        'no_audits': 'No audits recorded yet. Validate a contract in the Contract Checker to start building the history.',
+        'employer': 'Employer',
+        'all_employers': 'All employers',
+        'category': 'Violation category',
+        'date_range': 'Audit date range',
+        'audits': 'Audits',
+        'likely': '📉 Likely Liability',
+        'worst': '💥 Worst Case',
+        'by_month': '💰 Likely Liability by Month',
+        'likely_rm': 'Likely (RM)',
+        'by_category': '🚩 Violations by Category',
+        'employers_with': '🏢 Employers with {category} Violations',
+        'recent': '🕒 Recent Audits',
+        'query_time': '⚡ Queries answered in {ms:.1f} ms'
+    },
+    'ms': {
+        'title': '🗄️ Sejarah Audit & Analitik Pematuhan',
+        'subtitle': 'Setiap audit kontrak yang disahkan direkodkan di sini. Angka diambil daripada stor sejarah tempatan; tiada audit dijalankan semula.',
+        'no_audits': 'Belum ada audit direkodkan. Sahkan kontrak dalam Pemeriksa Kontrak untuk mula membina sejarah.',
+        'employer': 'Majikan',
+        'all_employers': 'Semua majikan',
+        'category': 'Kategori pelanggaran',
+        'date_range': 'Julat tarikh audit',
+        'audits': 'Audit',
+        'likely': '📉 Liabiliti Berkemungkinan',
+        'worst': '💥 Kes Terburuk',
+        'by_month': '💰 Liabiliti Berkemungkinan Mengikut Bulan',
+        'likely_rm': 'Berkemungkinan (RM)',
+        'by_category': '🚩 Pelanggaran Mengikut Kategori',
+        'employers_with': '🏢 Majikan dengan Pelanggaran {category}',
+        'recent': '🕒 Audit Terkini',
+        'query_time': '⚡ Pertanyaan dijawab dalam {ms:.1f} ms'
+    }
+}
+
+def get_text(key):
+    """Retrieve translation for the current language."""
+    return TRANSLATIONS[st.session_state.get("detected_language", "en")].get(key, key)
+
+st.title(get_text('title'))
+st.caption(get_text('subtitle'))
+
+employers = audit_history.list_employers()
+if not employers:
+    st.info(get_text('no_audits'))
+    st.stop()
+
+# --- 1️⃣ Filters ---
+f1, f2, f3 = st.columns([1, 1, 1])
+with f1:
+    employer = st.selectbox(get_text('employer'), [None] + employers, format_func=lambda e: get_text('all_employers') if e is None else e)
+with f2:
+    categories = audit_history.list_categories()
+    category = st.selectbox(get_text('category'), categories) if categories else None
+with f3:
+    date_range = st.date_input(get_text('date_range'), value=())
+since, until = (date_range[0], date_range[1]) if len(date_range) == 2 else (None, None)
+
+start = time.perf_counter()
+monthly = audit_history.liability_by_month(employer, since, until)
+by_category = audit_history.violations_by_category(employer, since, until)
+affected = audit_history.employers_with_violation(category, since, until) if category else []
+recent = audit_history.recent_audits(employer)
+query_ms = (time.perf_counter() - start) * 1000
+
+# --- 2️⃣ Headline Metrics ---
+m1, m2, m3 = st.columns(3)
+m1.metric(get_text('audits'), sum(row["audits"] for row in monthly))
+m2.metric(get_text('likely'), f"RM {sum(row['total_likely'] or 0 for row in monthly):,.2f}")
+m3.metric(get_text('worst'), f"RM {sum(row['total_worst'] or 0 for row in monthly):,.2f}")
+
+# --- 3️⃣ Liability by Month ---
+st.subheader(get_text('by_month'))
+if monthly:
+    st.bar_chart(
+        {"month": [row["month"] for row in monthly], get_text('likely_rm'): [row["total_likely"] for row in monthly]},
+        x="month", y=get_text('likely_rm')
+    )
+    st.dataframe(monthly, use_container_width=True, hide_index=True)
+
+# --- 4️⃣ Violations ---
+c1, c2 = st.columns(2)
+with c1:
+    st.subheader(get_text('by_category'))
+    st.dataframe(by_category, use_container_width=True, hide_index=True)
+with c2:
+    if category:
+        st.subheader(get_text('employers_with').format(category=category.title()))
+        st.dataframe(affected, use_container_width=True, hide_index=True)
+
+# --- 5️⃣ Recent Audits ---
+st.subheader(get_text('recent'))
+st.dataframe(recent, use_container_width=True, hide_index=True)
+
+st.caption(get_text('query_time').format(ms=query_ms))
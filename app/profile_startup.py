@@ -0,0 +1,83 @@
+# profile_startup.py
+"""
+Reports how long each page spends importing modules before its first paint.
+
+    python profile_startup.py            # every page, top-level imports only
+    python profile_startup.py --detail   # also the slowest nested modules
+
+Each page's module-level imports are replayed in a fresh interpreter under
+`python -X importtime`. Exits with status 1 if any page is over
+STARTUP_IMPORT_BUDGET_MS, so it can run in CI.
+"""
+import ast
+import glob
+import os
+import subprocess
+import sys
+
+from config import STARTUP_IMPORT_BUDGET_MS
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def page_files() -> list:
+    return [os.path.join(APP_DIR, "Labour Law QnA.py")] + sorted(glob.glob(os.path.join(APP_DIR, "pages", "*.py")))
+
+
+def module_imports(path: str) -> list:
+    """Source of every import statement at the top level of a page script."""
+    with open(path, encoding="utf-8") as f:
+        source = f.read()
+    tree = ast.parse(source)
+    return [ast.get_source_segment(source, node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+def profile_imports(statements: list) -> tuple:
+    """
+    Runs the imports in a fresh interpreter.
+    Returns ([(module, self_us, cumulative_us, depth)], [failed statements]).
+    """
+    code = "\n".join(
+        f"try:\n    {stmt}\nexcept Exception as e:\n    print('FAILED', {stmt!r}, e)" for stmt in statements
+    )
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([APP_DIR, os.environ.get("PYTHONPATH", "")]))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=APP_DIR, env=env, capture_output=True, text=True
+    )
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # Nested imports are indented two spaces per level after the separator's space
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    failed = [line[len("FAILED "):] for line in proc.stdout.splitlines() if line.startswith("FAILED ")]
+    return rows, failed
+
+
+def report(path: str, detail: bool = False) -> bool:
+    """Prints the page's import profile. Returns True if it is within budget."""
+    rows, failed = profile_imports(module_imports(path))
+    top_level = sorted([r for r in rows if r[3] == 0], key=lambda r: r[2], reverse=True)
+    total_ms = sum(r[2] for r in top_level) / 1000
+    within = total_ms <= STARTUP_IMPORT_BUDGET_MS
+
+    status = "✅" if within else "❌"
+    print(f"\n{status} {os.path.relpath(path, APP_DIR)}: {total_ms:.0f} ms imports (budget {STARTUP_IMPORT_BUDGET_MS} ms)")
+    for name, _, cumulative_us, _ in top_level[:15]:
+        print(f"   {cumulative_us / 1000:8.1f} ms  {name}")
+    if detail:
+        print("   slowest modules (self time):")
+        for name, self_us, _, _ in sorted(rows, key=lambda r: r[1], reverse=True)[:15]:
+            print(f"   {self_us / 1000:8.1f} ms  {name}")
+    for stmt in failed:
+        print(f"   ⚠️ import failed: {stmt}")
+    return within
+
+
+if __name__ == "__main__":
+    results = [report(path, detail="--detail" in sys.argv) for path in page_files()]
+    sys.exit(0 if all(results) else 1)
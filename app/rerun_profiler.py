@@ -0,0 +1,201 @@
+# rerun_profiler.py
+"""
+Opt-in sampling profiler for Streamlit script reruns.
+
+Turned on for every session with PROFILER_ENABLED, or for one session by
+opening a page with ?profile=<PROFILER_QUERY_TOKEN>. Each page calls
+profile_rerun() right after st.set_page_config(); a background thread then
+samples the script thread's stack until the page's top-level frame is gone
+(the rerun finished, hit st.stop() / st.rerun() or raised).
+
+Every rerun is written to CACHE_DIR/profiles as
+    <time>_<page>_<session>_<trigger>.folded   collapsed stacks weighted in µs (flamegraph.pl / speedscope)
+    <time>_<page>_<session>_<trigger>.json     summary (also shown in the sidebar)
+"""
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+import streamlit as st
+
+from config import (
+    CACHE_DIR, PROFILER_ENABLED, PROFILER_QUERY_TOKEN, PROFILER_SAMPLE_INTERVAL_S,
+    PROFILER_MAX_RERUN_S, PROFILER_MAX_FILES
+)
+import session_store
+
+PROFILE_DIR = os.path.join(CACHE_DIR, "profiles")
+
+# Stacks containing one of these are time spent waiting on something outside the script
+EXTERNAL_FILES = ("jamai_gateway.py", "single_flight.py", "speculative.py")
+EXTERNAL_LEAVES = {("threading.py", "wait"), ("_base.py", "result")}
+
+_lock = threading.Lock()
+_last_summary = {}      # session id -> summary of its last finished rerun
+
+
+def is_enabled() -> bool:
+    """Profiling switched on globally or (sticky) for this session via the query parameter."""
+    if PROFILER_ENABLED or st.session_state.get("_profiler_on"):
+        return True
+    if PROFILER_QUERY_TOKEN and st.query_params.get("profile") == PROFILER_QUERY_TOKEN:
+        st.session_state._profiler_on = True
+        return True
+    return False
+
+
+def _fingerprint(value):
+    return value if isinstance(value, (str, int, float, bool, type(None))) else (type(value).__name__, id(value))
+
+
+def _trigger() -> str:
+    """
+    Best guess at what caused this rerun: the session-state keys (keyed widgets
+    included) that changed since the last profiled rerun.
+    """
+    snapshot = {
+        key: _fingerprint(value) for key, value in st.session_state.to_dict().items()
+        if not str(key).startswith("_profiler")
+    }
+    previous = st.session_state.get("_profiler_snapshot")
+    st.session_state._profiler_snapshot = snapshot
+    if previous is None:
+        return "initial_load"
+    changed = sorted(str(k) for k in snapshot if previous.get(k, object()) != snapshot[k])
+    return "+".join(changed) if changed else "unkeyed_widget"
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _sample_stack(thread_id: int, page_frame):
+    """The script thread's stack from the page frame down, or None once the rerun is over."""
+    frame = sys._current_frames().get(thread_id)
+    stack = []
+    while frame is not None:
+        stack.append(frame)
+        if frame is page_frame:
+            return stack[::-1]
+        frame = frame.f_back
+    return None
+
+
+def _is_external(stack) -> bool:
+    leaf = stack[-1].f_code
+    if (os.path.basename(leaf.co_filename), leaf.co_name) in EXTERNAL_LEAVES:
+        return True
+    return any(os.path.basename(f.f_code.co_filename) in EXTERNAL_FILES for f in stack)
+
+
+def _sampler(thread_id: int, page_frame, meta: dict):
+    started = last = time.perf_counter()
+    folded, self_us = Counter(), Counter()     # Microseconds per stack / per leaf function
+    samples = external_us = 0
+
+    while last - started < PROFILER_MAX_RERUN_S:
+        stack = _sample_stack(thread_id, page_frame)
+        now = time.perf_counter()
+        if stack is None:
+            break
+        # Each sample stands for the time since the previous one (the sampler
+        # gets the GIL less often while the script is busy computing)
+        elapsed_us = int((now - last) * 1e6)
+        last = now
+        labels = [meta["page"]] + [_frame_label(f) for f in stack[1:]]
+        folded[";".join(labels)] += elapsed_us
+        self_us[labels[-1]] += elapsed_us
+        samples += 1
+        if _is_external(stack):
+            external_us += elapsed_us
+        stack = None    # Don't keep the script's frames alive while sleeping
+        time.sleep(PROFILER_SAMPLE_INTERVAL_S)
+    page_frame = None
+
+    wall_us = sum(folded.values())
+    summary = dict(
+        meta,
+        wall_ms=round(wall_us / 1000, 1),
+        samples=samples,
+        external_ms=round(external_us / 1000, 1),
+        script_ms=round((wall_us - external_us) / 1000, 1),
+        top_functions=[
+            {"function": name, "ms": round(us / 1000, 1)} for name, us in self_us.most_common(8)
+        ]
+    )
+    with _lock:
+        _last_summary[meta["session_id"]] = summary
+    _write(meta, folded, summary)
+
+
+def _write(meta: dict, folded: Counter, summary: dict):
+    trigger = re.sub(r'[^A-Za-z0-9_+-]', '_', meta["trigger"])[:60]
+    base = os.path.join(
+        PROFILE_DIR,
+        f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(meta['started_at']))}"
+        f"_{meta['page']}_{meta['session_id'][:8]}_{trigger}"
+    )
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        with open(f"{base}.folded", "w", encoding="utf-8") as f:
+            f.writelines(f"{stack} {count}\n" for stack, count in folded.items())
+        with open(f"{base}.json", "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        _cleanup_old_files()
+    except OSError as e:
+        print(f"⚠️ Could not save rerun profile: {e}")
+
+
+def _cleanup_old_files():
+    paths = [os.path.join(PROFILE_DIR, n) for n in os.listdir(PROFILE_DIR) if n.endswith((".folded", ".json"))]
+    paths.sort(key=os.path.getmtime, reverse=True)
+    for path in paths[PROFILER_MAX_FILES * 2:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def profile_rerun(page: str):
+    """
+    Call at the top level of a page, right after st.set_page_config().
+    Starts sampling this rerun when profiling is on; does nothing otherwise.
+    """
+    if not is_enabled():
+        return
+    page_frame = sys._getframe(1)
+    meta = {
+        "page": page,
+        "session_id": session_store.current_session_id(),
+        "trigger": _trigger(),
+        "started_at": time.time()
+    }
+    threading.Thread(
+        target=_sampler, args=(threading.get_ident(), page_frame, meta),
+        name=f"rerun-profiler-{page}", daemon=True
+    ).start()
+
+
+def render_sidebar():
+    """Timing of this session's previous rerun (only while profiling is on)."""
+    if not is_enabled():
+        return
+    with _lock:
+        summary = _last_summary.get(session_store.current_session_id())
+    with st.sidebar:
+        if summary is None:
+            st.caption("🔬 Profiling on: the summary appears after the first rerun.")
+            return
+        st.caption(
+            f"🔬 Last rerun ({summary['page']}, trigger: {summary['trigger']}): "
+            f"{summary['wall_ms']:.0f} ms — script {summary['script_ms']:.0f} ms, "
+            f"waiting on JamAI / background work {summary['external_ms']:.0f} ms"
+        )
+        with st.expander("🔬 Slowest functions (self time)"):
+            for item in summary["top_functions"]:
+                st.caption(f"{item['ms']:8.1f} ms  {item['function']}")
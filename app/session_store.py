@@ -0,0 +1,178 @@
+# session_store.py
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, Counter
+from typing import Any
+
+from config import CACHE_DIR, SESSION_MEMORY_CAP_MB, SESSION_TTL_S
+
+BLOB_DIR = os.path.join(CACHE_DIR, "blobs")
+HANDLE_PREFIX = "blob:"
+
+_lock = threading.Lock()
+_memory = OrderedDict()     # handle -> (value, size in bytes), least recently used first
+_memory_bytes = 0
+_sessions = {}              # session id -> {"handles": Counter of handle refs, "last_seen": float}
+_puts_since_cleanup = 0
+
+
+def current_session_id() -> str:
+    """Streamlit session id of the running script (or "local" outside Streamlit)."""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+        return ctx.session_id if ctx else "local"
+    except Exception:
+        return "local"
+
+
+def is_handle(value: Any) -> bool:
+    return isinstance(value, str) and value.startswith(HANDLE_PREFIX)
+
+
+def _encode(value: Any):
+    """Returns (bytes, file extension) for a str / bytes / JSON value."""
+    if isinstance(value, bytes):
+        return value, "bin"
+    if isinstance(value, str):
+        return value.encode("utf-8"), "txt"
+    return json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"), "json"
+
+
+def _decode(data: bytes, ext: str) -> Any:
+    if ext == "bin":
+        return data
+    if ext == "txt":
+        return data.decode("utf-8")
+    return json.loads(data.decode("utf-8"))
+
+
+def _remember(handle: str, value: Any, size: int):
+    """Adds to the in-memory LRU and evicts down to the per-process cap (caller holds the lock)."""
+    global _memory_bytes
+    if handle in _memory:
+        _memory.move_to_end(handle)
+        return
+    _memory[handle] = (value, size)
+    _memory_bytes += size
+    while _memory_bytes > SESSION_MEMORY_CAP_MB * 1024 * 1024 and len(_memory) > 1:
+        _, (_, old_size) = _memory.popitem(last=False)
+        _memory_bytes -= old_size
+
+
+def _touch(session_id: str) -> dict:
+    session = _sessions.setdefault(session_id, {"handles": Counter(), "last_seen": 0.0})
+    session["last_seen"] = time.time()
+    return session
+
+
+def put(value: Any, session_id: str) -> str:
+    """Stores a large value on disk (content-addressed) and returns a small handle."""
+    global _puts_since_cleanup
+    data, ext = _encode(value)
+    handle = f"{HANDLE_PREFIX}{hashlib.sha1(data).hexdigest()}.{ext}"
+    path = os.path.join(BLOB_DIR, handle[len(HANDLE_PREFIX):])
+
+    if not os.path.exists(path):
+        os.makedirs(BLOB_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    else:
+        os.utime(path)  # Refresh so cleanup doesn't remove a blob that is in use again
+
+    with _lock:
+        _remember(handle, value, len(data))
+        _touch(session_id)["handles"][handle] += 1
+        _puts_since_cleanup += 1
+        run_cleanup = _puts_since_cleanup >= 50
+        if run_cleanup:
+            _puts_since_cleanup = 0
+
+    if run_cleanup:
+        cleanup_expired()
+    return handle
+
+
+def get(handle: str, session_id: str) -> Any:
+    """Resolves a handle (memory first, then disk). Non-handles are returned unchanged."""
+    if not is_handle(handle):
+        return handle
+    with _lock:
+        _touch(session_id)
+        if handle in _memory:
+            _memory.move_to_end(handle)
+            return _memory[handle][0]
+
+    name = handle[len(HANDLE_PREFIX):]
+    try:
+        with open(os.path.join(BLOB_DIR, name), "rb") as f:
+            data = f.read()
+    except OSError:
+        print(f"⚠️ Session blob missing: {name}")
+        return None
+    value = _decode(data, name.rsplit(".", 1)[-1])
+    with _lock:
+        _remember(handle, value, len(data))
+    return value
+
+
+def release(handle: Any, session_id: str):
+    """The session no longer needs this blob (e.g. it was overwritten)."""
+    if is_handle(handle):
+        with _lock:
+            handles = _sessions.get(session_id, {}).get("handles")
+            if handles and handles[handle] > 0:
+                handles[handle] -= 1
+                if handles[handle] == 0:
+                    del handles[handle]
+
+
+def cleanup_expired():
+    """Forgets idle sessions and deletes blobs no live session references."""
+    global _memory_bytes
+    now = time.time()
+    with _lock:
+        for session_id in [s for s, info in _sessions.items() if now - info["last_seen"] > SESSION_TTL_S]:
+            del _sessions[session_id]
+        live = set()
+        for info in _sessions.values():
+            live.update(info["handles"])
+        for handle in [h for h in _memory if h not in live]:
+            _memory_bytes -= _memory.pop(handle)[1]
+
+    try:
+        names = os.listdir(BLOB_DIR)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(BLOB_DIR, name)
+        try:
+            # Age check also protects blobs written by other server processes
+            if f"{HANDLE_PREFIX}{name}" not in live and now - os.path.getmtime(path) > SESSION_TTL_S:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def stats() -> dict:
+    with _lock:
+        return {"sessions": len(_sessions), "cached_blobs": len(_memory), "memory_mb": _memory_bytes / 1024 / 1024}
+
+
+# ------------------ st.session_state helpers ------------------
+def save(state, name: str, value: Any):
+    """state[name] = value, keeping only a handle in session state for large values."""
+    session_id = current_session_id()
+    release(state.get(name), session_id)
+    state[name] = value if value is None or value == "" else put(value, session_id)
+
+
+def load(state, name: str, default: Any = None) -> Any:
+    """Reads a value written with save()."""
+    value = state.get(name, default)
+    return get(value, current_session_id()) if is_handle(value) else value
@@ -0,0 +1,165 @@
+# single_flight.py
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
+
+from config import CACHE_DIR, CANCEL_POLL_INTERVAL_S, SINGLE_FLIGHT_WAIT_S
+from cancellation import CancelToken, OperationCancelled, check, wait_future
+
+try:
+    import fcntl  # Cross-process locking (Linux / macOS only)
+except ImportError:
+    fcntl = None
+
+FLIGHT_DIR = os.path.join(CACHE_DIR, "single_flight")
+
+_lock = threading.Lock()
+_in_flight = {}     # key -> Future shared by every waiting thread
+_stats = {"leaders": 0, "coalesced": 0, "from_other_process": 0}
+
+
+def content_key(namespace: str, *parts: str) -> str:
+    """Stable key for a request: namespace + sha1 of its content."""
+    digest = hashlib.sha1("\x00".join(parts).encode("utf-8")).hexdigest()
+    return f"{namespace}-{digest}"
+
+
+def _read_shared_result(path: str, waiting_since: float):
+    """
+    Result of the call that was in flight while we waited on its lock, if it
+    left one. Anything finished before we started waiting is not reused:
+    single-flight shares a running call, it doesn't cache finished ones.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            shared = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(shared, dict) or shared.get("finished_at", 0) < waiting_since:
+        return None
+    return shared.get("result")
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _cleanup_old_results():
+    # No follower waits longer than SINGLE_FLIGHT_WAIT_S, so older results have nobody left to read them
+    try:
+        for name in os.listdir(FLIGHT_DIR):
+            path = os.path.join(FLIGHT_DIR, name)
+            if name.endswith(".json") and time.time() - os.path.getmtime(path) > SINGLE_FLIGHT_WAIT_S:
+                _remove(path)
+    except OSError:
+        pass
+
+
+def _lock_exclusive(lock_file, cancel: Optional[CancelToken]) -> Optional[float]:
+    """
+    flock(LOCK_EX), polled instead of blocking so the wait stops when `cancel`
+    fires (OperationCancelled) or after SINGLE_FLIGHT_WAIT_S (TimeoutError).
+    Returns when the wait started (time.time()) if another process held the
+    lock, None if it was free.
+    """
+    waiting_since = None
+    deadline = time.monotonic() + SINGLE_FLIGHT_WAIT_S
+    while True:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return waiting_since
+        except BlockingIOError:
+            if waiting_since is None:
+                waiting_since = time.time()
+        check(cancel, "another server process finished the same request")
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"Another server process is still running this request after {SINGLE_FLIGHT_WAIT_S}s")
+        cancel.sleep(CANCEL_POLL_INTERVAL_S) if cancel is not None else time.sleep(CANCEL_POLL_INTERVAL_S)
+
+
+def _run_across_processes(key: str, share_if: Callable[[Any], bool], cancel: Optional[CancelToken],
+                          fn: Callable[..., Any], *args) -> Any:
+    """
+    Only one server process runs a given key at a time: the others wait on
+    the key's lock file and then pick up the result file it wrote. A caller
+    that finds the lock free (or no result behind it) runs fn itself.
+    """
+    if fcntl is None:
+        return fn(*args)
+
+    os.makedirs(FLIGHT_DIR, exist_ok=True)
+    result_path = os.path.join(FLIGHT_DIR, f"{key}.json")
+    with open(os.path.join(FLIGHT_DIR, f"{key}.lock"), "a") as lock_file:
+        waiting_since = _lock_exclusive(lock_file, cancel)
+        try:
+            shared = _read_shared_result(result_path, waiting_since) if waiting_since is not None else None
+            if shared:
+                with _lock:
+                    _stats["from_other_process"] += 1
+                return shared
+
+            # A result left by an earlier call must not be handed to anyone waiting on this one
+            _remove(result_path)
+            result = fn(*args)
+            # Failed / empty results are never written, so whoever waited on us retries
+            if result and share_if(result):
+                tmp_path = f"{result_path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump({"finished_at": time.time(), "result": result}, f)
+                os.replace(tmp_path, result_path)
+            return result
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            _cleanup_old_results()
+
+
+def single_flight(key: str, fn: Callable[..., Any], *args, share_if: Callable[[Any], bool] = bool,
+                  cancel: Optional[CancelToken] = None) -> Any:
+    """
+    Runs fn(*args) once for all concurrent callers with the same key.
+    Callers arriving while it runs (from any session) wait and share its result.
+    fn's result must be JSON-serialisable so other processes can reuse it;
+    `share_if` decides whether a result is good enough to hand to them.
+    `cancel` only stops this caller waiting; if the leader's own caller is
+    cancelled, a waiting caller runs fn itself instead of sharing that.
+    """
+    with _lock:
+        future = _in_flight.get(key)
+        leader = future is None
+        if leader:
+            future = Future()
+            _in_flight[key] = future
+            _stats["leaders"] += 1
+        else:
+            _stats["coalesced"] += 1
+
+    if not leader:
+        print(f"🔗 Joining in-flight request {key[:24]}...")
+        try:
+            return wait_future(future, cancel)
+        except OperationCancelled:
+            if cancel is not None and cancel.cancelled:
+                raise
+            # The leader's caller went away, not ours
+            return single_flight(key, fn, *args, share_if=share_if, cancel=cancel)
+
+    try:
+        future.set_result(_run_across_processes(key, share_if, cancel, fn, *args))
+    except Exception as e:
+        future.set_exception(e)
+    finally:
+        with _lock:
+            _in_flight.pop(key, None)
+    return future.result()
+
+
+def get_stats() -> dict:
+    with _lock:
+        return dict(_stats, in_flight=len(_in_flight))
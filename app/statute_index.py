@@ -0,0 +1,253 @@
+# statute_index.py
+"""
+Local BM25 index over the statute knowledge tables
+(epf&socso_law, employment_act_1955, industrial_relations_act_1967).
+
+Build it once from the JamAI project export:
+    python statute_index.py build ../jamaibase_project_tables.parquet
+
+At runtime the postings are memory-mapped, so startup only reads the small
+vocabulary file and retrieval is deterministic and local.
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+import threading
+from collections import Counter
+from typing import Dict, List, Optional
+
+from config import CACHE_DIR, STATUTE_PARQUET_PATH, LOCAL_RETRIEVAL_ENABLED, LOCAL_RETRIEVAL_TOP_K
+
+KNOWLEDGE_TABLES = ["epf&socso_law", "employment_act_1955", "industrial_relations_act_1967"]
+INDEX_DIR = os.path.join(CACHE_DIR, "statute_index")
+
+# BM25 parameters
+K1 = 1.5
+B = 0.75
+
+STOPWORDS = {
+    "the", "a", "an", "of", "to", "and", "or", "in", "on", "for", "by", "be", "is", "are", "was",
+    "any", "such", "shall", "may", "that", "this", "with", "as", "at", "from", "which", "who",
+    "under", "not", "no", "he", "his", "it", "its", "if", "than", "other", "has", "have",
+    "yang", "dan", "atau", "di", "ke", "untuk", "dengan", "ini", "itu", "tidak", "boleh", "hendaklah"
+}
+
+
+def tokenize(text: str) -> List[str]:
+    words = re.findall(r"[a-z0-9]+", (text or "").lower())
+    return [w for w in words if w not in STOPWORDS and len(w) > 1]
+
+
+def _doc_hash(table: str, title: str, text: str) -> str:
+    # The title is indexed with the text, so a renamed section must be re-tokenized too
+    return hashlib.sha1(f"{table}\n{title}\n{text}".encode("utf-8")).hexdigest()
+
+
+# ------------------ BUILD ------------------
+def load_knowledge_rows(parquet_path: str) -> List[Dict[str, str]]:
+    """
+    Reads the project export and returns [{"table", "title", "text"}] for the
+    statute knowledge tables. Column names vary between exports, so a few
+    common ones are tried.
+    """
+    import pandas as pd
+
+    df = pd.read_parquet(parquet_path)
+    table_col = next((c for c in ["table_id", "Table", "table", "source_table"] if c in df.columns), None)
+    text_col = next((c for c in ["Text", "text", "content", "chunk", "Chunk"] if c in df.columns), None)
+    title_col = next((c for c in ["Title", "title", "Section", "section", "Page", "page"] if c in df.columns), None)
+    if text_col is None:
+        raise ValueError(f"No text column found in {parquet_path}: {list(df.columns)}")
+
+    if table_col is not None:
+        df = df[df[table_col].astype(str).isin(KNOWLEDGE_TABLES)]
+
+    rows = []
+    for record in df.to_dict("records"):
+        text = str(record.get(text_col) or "").strip()
+        if not text:
+            continue
+        rows.append({
+            "table": str(record.get(table_col, "knowledge")) if table_col else "knowledge",
+            "title": str(record.get(title_col) or "") if title_col else "",
+            "text": text
+        })
+    return rows
+
+
+def build_index(parquet_path: str = STATUTE_PARQUET_PATH, index_dir: str = INDEX_DIR) -> dict:
+    """
+    Builds (or incrementally refreshes) the index. Term counts are cached per
+    document hash, so only new or edited sections are re-tokenized.
+    """
+    import numpy as np
+
+    os.makedirs(index_dir, exist_ok=True)
+    manifest_path = os.path.join(index_dir, "manifest.json")
+    terms_cache_path = os.path.join(index_dir, "doc_terms.json")
+
+    stat = os.stat(parquet_path)
+    source_sig = f"{os.path.abspath(parquet_path)}:{stat.st_size}:{int(stat.st_mtime)}"
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("source_sig") == source_sig:
+            print("✅ Statute index already up to date")
+            return manifest
+
+    old_terms = {}
+    if os.path.exists(terms_cache_path):
+        with open(terms_cache_path, encoding="utf-8") as f:
+            old_terms = json.load(f)
+
+    # --- 1. Tokenize (reusing cached counts for unchanged sections) ---
+    rows = load_knowledge_rows(parquet_path)
+    doc_terms, reused = {}, 0
+    hashes = []
+    for row in rows:
+        h = _doc_hash(row["table"], row["title"], row["text"])
+        hashes.append(h)
+        if h in old_terms:
+            doc_terms[h] = old_terms[h]
+            reused += 1
+        elif h not in doc_terms:
+            doc_terms[h] = dict(Counter(tokenize(f"{row['title']} {row['text']}")))
+
+    # --- 2. Documents file + byte offsets for random access ---
+    offsets = []
+    with open(os.path.join(index_dir, "docs.jsonl"), "wb") as f:
+        for row in rows:
+            offsets.append(f.tell())
+            f.write((json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8"))
+
+    # --- 3. Inverted index: vocab -> slice of the postings arrays ---
+    postings = {}
+    doc_len = []
+    for doc_id, h in enumerate(hashes):
+        counts = doc_terms[h]
+        doc_len.append(sum(counts.values()))
+        for term, tf in counts.items():
+            postings.setdefault(term, []).append((doc_id, tf))
+
+    vocab, ids, tfs = {}, [], []
+    for term in sorted(postings):
+        entries = postings[term]
+        vocab[term] = [len(ids), len(entries)]
+        ids.extend(doc_id for doc_id, _ in entries)
+        tfs.extend(tf for _, tf in entries)
+
+    np.save(os.path.join(index_dir, "postings_ids.npy"), np.asarray(ids, dtype=np.int32))
+    np.save(os.path.join(index_dir, "postings_tf.npy"), np.asarray(tfs, dtype=np.float32))
+    np.save(os.path.join(index_dir, "doc_len.npy"), np.asarray(doc_len, dtype=np.float32))
+    np.save(os.path.join(index_dir, "doc_offsets.npy"), np.asarray(offsets, dtype=np.int64))
+    with open(os.path.join(index_dir, "vocab.json"), "w", encoding="utf-8") as f:
+        json.dump(vocab, f)
+    with open(terms_cache_path, "w", encoding="utf-8") as f:
+        json.dump({h: doc_terms[h] for h in set(hashes)}, f)
+
+    manifest = {"source_sig": source_sig, "documents": len(rows), "terms": len(vocab), "reused": reused}
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+    print(f"✅ Statute index built: {len(rows)} sections ({reused} reused), {len(vocab)} terms")
+    return manifest
+
+
+# ------------------ SEARCH ------------------
+class StatuteIndex:
+    """Read-only BM25 index with memory-mapped postings."""
+
+    def __init__(self, index_dir: str = INDEX_DIR):
+        import numpy as np
+
+        self.np = np
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, "vocab.json"), encoding="utf-8") as f:
+            self.vocab = json.load(f)
+        self.ids = np.load(os.path.join(index_dir, "postings_ids.npy"), mmap_mode="r")
+        self.tfs = np.load(os.path.join(index_dir, "postings_tf.npy"), mmap_mode="r")
+        self.doc_len = np.load(os.path.join(index_dir, "doc_len.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(index_dir, "doc_offsets.npy"), mmap_mode="r")
+        self.n_docs = len(self.doc_len)
+        self.avg_len = float(self.doc_len.mean()) if self.n_docs else 1.0
+
+    def _doc(self, doc_id: int) -> dict:
+        with open(os.path.join(self.index_dir, "docs.jsonl"), "rb") as f:
+            f.seek(int(self.offsets[doc_id]))
+            return json.loads(f.readline().decode("utf-8"))
+
+    def search(self, query: str, k: int = LOCAL_RETRIEVAL_TOP_K) -> List[dict]:
+        np = self.np
+        if not self.n_docs:
+            return []
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for term in set(tokenize(query)):
+            if term not in self.vocab:
+                continue
+            start, count = self.vocab[term]
+            ids = self.ids[start:start + count]
+            tf = self.tfs[start:start + count]
+            idf = math.log(1 + (self.n_docs - count + 0.5) / (count + 0.5))
+            norm = K1 * (1 - B + B * self.doc_len[ids] / self.avg_len)
+            scores[ids] += idf * tf * (K1 + 1) / (tf + norm)
+
+        top = np.argsort(-scores, kind="stable")[:k]
+        return [{**self._doc(int(i)), "score": float(scores[i])} for i in top if scores[i] > 0]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> Optional[StatuteIndex]:
+    """Opens the index once per process. Returns None if it hasn't been built."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None and os.path.exists(os.path.join(INDEX_DIR, "vocab.json")):
+                try:
+                    _index = StatuteIndex()
+                except Exception as e:
+                    print(f"⚠️ Could not open statute index: {e}")
+    return _index
+
+
+def retrieve_sections(queries: List[str], k_per_query: int = 2, max_sections: int = LOCAL_RETRIEVAL_TOP_K * 2) -> List[dict]:
+    """Top sections for several queries (e.g. one per contract clause), de-duplicated."""
+    index = get_index() if LOCAL_RETRIEVAL_ENABLED else None
+    if index is None:
+        return []
+    seen, sections = set(), []
+    for query in queries:
+        for section in index.search(query, k_per_query):
+            key = (section["table"], section["text"])
+            if key not in seen:
+                seen.add(key)
+                sections.append(section)
+    sections.sort(key=lambda s: s["score"], reverse=True)
+    return sections[:max_sections]
+
+
+def format_sections(sections: List[dict]) -> str:
+    """Renders retrieved sections as a compact prompt block."""
+    if not sections:
+        return ""
+    lines = ["Relevant statute sections:"]
+    for section in sections:
+        title = f" {section['title']}" if section.get("title") else ""
+        lines.append(f"[{section['table']}{title}] {section['text']}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "build":
+        build_index(sys.argv[2] if len(sys.argv) > 2 else STATUTE_PARQUET_PATH)
+    elif len(sys.argv) >= 3 and sys.argv[1] == "search":
+        for hit in (get_index().search(" ".join(sys.argv[2:])) if get_index() else []):
+            print(f"{hit['score']:.2f} [{hit['table']}] {hit['text'][:120]}")
+    else:
+        print("Usage: python statute_index.py build [parquet_path] | search <query>")
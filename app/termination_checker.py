@@ -1,23 +1,79 @@
 # termination_checker.py
 import json
 import ast
-import os
 import re
-from config import PROJECT_ID, API_KEY
-from jamaibase import JamAI, types as t
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from cancellation import OperationCancelled, check
+from jamai_gateway import gateway, add_action_rows, CircuitOpenError, INTERACTIVE, BATCH
+from single_flight import single_flight, content_key
+from statute_index import retrieve_sections, format_sections
 
 # ------------------ JamAI Setup ------------------
-# Ensure credentials are loaded from your config file
-os.environ["JAMAI_API_KEY"] = API_KEY
-os.environ["JAMAI_PROJECT_ID"] = PROJECT_ID
-
-jamai = JamAI(project_id=PROJECT_ID, token=API_KEY)
+# Credentials come from config; the client is built lazily by jamai_gateway.get_jamai()
 
 # --- CONFIGURATION ---
 TABLE_ID = "Termination&Compensation_Generator"
 
+# One legality call per equivalence class runs here (the gateway still limits concurrency)
+_class_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="termination-class")
+
+def is_legal(value) -> bool:
+    """
+    The model's legal_to_terminate answer as a bool. It sometimes comes back as
+    a string ("false", "No"), so only true / "true" / "yes" count as legal.
+    """
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "yes")
+    return value is True
+
+# ------------------ LOCAL STATUTORY ESTIMATE ------------------
+def years_of_service(start_date) -> float:
+    """Years between start_date (e.g. "2022-01-01" or "1/01/2022") and today."""
+    for fmt in ["%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d"]:
+        try:
+            start = datetime.strptime(str(start_date).split(" ")[0], fmt)
+            return max((datetime.today() - start).days / 365.25, 0.0)
+        except ValueError:
+            continue
+    return 0.0
+
+def estimate_statutory_entitlements(employee_data: dict, reason: str) -> dict:
+    """
+    Minimum entitlements computed locally (no LLM):
+    - Notice: EA 1955 s12(2) -> 4 / 6 / 8 weeks for <2 / 2-5 / 5+ years of service
+    - Severance: Termination & Lay-Off Benefits Regs 1980 -> 10 / 15 / 20 days' wages
+      per year of service (only after 12 months, not for misconduct or resignation)
+    - Unused leave: daily rate (salary / 26) x unused days
+    """
+    try:
+        salary = float(str(employee_data.get("salary", 0)).upper().replace("RM", "").replace(",", ""))
+    except ValueError:
+        salary = 0.0
+    try:
+        unused_leave = float(employee_data.get("unused_leave", 0) or 0)
+    except (TypeError, ValueError):
+        unused_leave = 0.0
+
+    years = years_of_service(employee_data.get("start_date"))
+    daily_rate = salary / 26
+
+    notice_weeks = 4 if years < 2 else 6 if years < 5 else 8
+    days_per_year = 10 if years < 2 else 15 if years < 5 else 20
+    severance = 0.0
+    if years >= 1 and reason not in ["Misconduct", "Resignation"]:
+        severance = daily_rate * days_per_year * years
+
+    return {
+        "required_notice_period": round(notice_weeks / 4.33, 2),   # In months (the page multiplies by salary)
+        "severance_pay": round(severance, 2),
+        "unused_leave_pay": round(daily_rate * unused_leave, 2),
+        "years_of_service": round(years, 2)
+    }
+
 # ------------------ TERMINATION CHECKER ------------------
-def check_termination(employee_data: dict, reason: str) -> dict:
+def check_termination(employee_data: dict, reason: str, priority: str = INTERACTIVE, cancel=None) -> dict:
     """
     Sends employee data and termination reason to JamAI and returns a DICT with:
     - legal_to_terminate (bool)
@@ -25,78 +81,222 @@ def check_termination(employee_data: dict, reason: str) -> dict:
     - severance_pay (float)
     - unused_leave_pay (float)
     - legal_reasons_if_cannot (str)
+    Returns {} once the optional `cancel` token fires.
     """
 
     print(f"🚀 Sending termination check to JamAI for {employee_data.get('name')}...")
 
+    # --- Pick the relevant statute sections locally (falls back to remote knowledge tables) ---
+    sections = retrieve_sections([
+        f"termination {reason}",
+        f"{employee_data.get('contract_type', '')} {employee_data.get('probation_status', '')} termination notice",
+        f"termination benefits severance {reason}"
+    ])
+    law_context = format_sections(sections) or \
+        "Refer to knowledge tables: epf&socso_law, employment_act_1955, industrial_relations_act_1967"
+
     # --- Prepare input text for AI ---
     input_text = f"""
 Employee data: {employee_data}
 Termination reason: {reason}
-Refer to knowledge tables: epf&socso_law, employment_act_1955, industrial_relations_act_1967
+{law_context}
 Return as JSON object with:
 legal_to_terminate, required_notice_period, severance_pay, unused_leave_pay, legal_reasons_if_cannot
 """
 
     try:
-        # --- Send to JamAI Action Table ---
-        response = jamai.table.add_table_rows(
-            table_type=t.TableType.ACTION,
-            request=t.MultiRowAddRequest(
-                table_id=TABLE_ID,
-                data=[{"input": input_text}],
-                stream=False
-            )
+        check(cancel, "the termination request")
+        return _ask_jamai(input_text, priority, cancel)
+
+    except OperationCancelled as e:
+        print(f"🛑 Termination check cancelled: {e}")
+        return {}
+
+    except (CircuitOpenError, TimeoutError) as e:
+        # JamAI is unhealthy: fail fast with a local estimate instead of waiting it out
+        print(f"🔌 JamAI unhealthy, using local statutory estimate: {e}")
+        estimate = estimate_statutory_entitlements(employee_data, reason)
+        return _unavailable_result(estimate)
+
+    except Exception as e:
+        print(f"🔥 Critical API Error: {e}")
+        return {}
+
+def _unavailable_result(estimate: dict) -> dict:
+    """Answer used while JamAI is unhealthy: not cleared, with the statutory minimum estimate."""
+    return {
+        "legal_to_terminate": False,
+        **estimate,
+        "legal_reasons_if_cannot": (
+            "Legal check temporarily unavailable, please retry shortly. Statutory minimum estimate: "
+            f"{estimate['required_notice_period']} months notice, severance RM {estimate['severance_pay']:,.2f}, "
+            f"unused leave RM {estimate['unused_leave_pay']:,.2f}."
         )
+    }
+
+def _ask_jamai(input_text: str, priority: str, cancel=None) -> dict:
+    """Sends one termination question and returns the parsed JSON answer ({} if unusable)."""
+    # --- Send to JamAI Action Table (hedged: the check is idempotent) ---
+    response = gateway.call_hedged(
+        "termination",
+        add_action_rows,
+        TABLE_ID,
+        [{"input": input_text}],
+        priority=priority,
+        cancel=cancel
+    )
+    check(cancel, "parsing the answer")
+
+    if not response.rows:
+        print("⚠️ No rows returned from JamAI")
+        return {}
+
+    # 1. Extract output text
+    row = response.rows[0]
+    answer_text = ""
+    for col in ["output", "AI", "answer", "final_answer"]:
+        if col in row.columns:
+            answer_text = row.columns[col].text
+            break
+    if not answer_text:
+        answer_text = list(row.columns.values())[-1].text
 
-        if not response.rows:
-            print("⚠️ No rows returned from JamAI")
-            return {}
-
-        # 1. Extract output text
-        row = response.rows[0]
-        answer_text = ""
-        for col in ["output", "AI", "answer", "final_answer"]:
-            if col in row.columns:
-                answer_text = row.columns[col].text
-                break
-        if not answer_text:
-            answer_text = list(row.columns.values())[-1].text
-
-        # 2. Clean JSON formatting
-        clean_text = re.sub(r'```json|```', '', answer_text).strip()
-        clean_text = re.sub(r'\[@[^\]]*\]', '', clean_text)  # remove citations
-
-        # 3. Parse JSON
-        start = clean_text.find('{')
-        end = clean_text.rfind('}')
-        if start != -1 and end != -1:
-            clean_text = clean_text[start : end + 1]
+    # 2. Clean JSON formatting
+    clean_text = re.sub(r'```json|```', '', answer_text).strip()
+    clean_text = re.sub(r'\[@[^\]]*\]', '', clean_text)  # remove citations
+
+    # 3. Parse JSON
+    start = clean_text.find('{')
+    end = clean_text.rfind('}')
+    if start != -1 and end != -1:
+        clean_text = clean_text[start : end + 1]
+        try:
+            data = json.loads(clean_text)
+        except:
             try:
-                data = json.loads(clean_text)
+                data = ast.literal_eval(clean_text)
             except:
-                try:
-                    data = ast.literal_eval(clean_text)
-                except:
-                    print("❌ JSON Parse Failed")
-                    return {}
-
-            # Ensure all keys exist
-            defaults = {
-                "legal_to_terminate": False,
-                "required_notice_period": 0,
-                "severance_pay": 0,
-                "unused_leave_pay": 0,
-                "legal_reasons_if_cannot": ""
-            }
-            for key, val in defaults.items():
-                if key not in data:
-                    data[key] = val
-
-            return data
+                print("❌ JSON Parse Failed")
+                return {}
 
-        return {}
+        # Ensure all keys exist
+        defaults = {
+            "legal_to_terminate": False,
+            "required_notice_period": 0,
+            "severance_pay": 0,
+            "unused_leave_pay": 0,
+            "legal_reasons_if_cannot": ""
+        }
+        for key, val in defaults.items():
+            if key not in data:
+                data[key] = val
+        data["legal_to_terminate"] = is_legal(data["legal_to_terminate"])
+
+        return data
+
+    return {}
+
+# ------------------ EQUIVALENCE CLASSES (bulk terminations) ------------------
+def tenure_band(years: float) -> str:
+    """Service bands at which the statutory answer changes (severance after 12 months, notice at 2 / 5 years)."""
+    return "under 1 year" if years < 1 else "1-2 years" if years < 2 else "2-5 years" if years < 5 else "5+ years"
+
+def termination_class(employee_data: dict, reason: str) -> tuple:
+    """
+    The attributes the legality decision depends on:
+    (contract type, probation status, tenure band, reason).
+    """
+    def attribute(key):
+        return str(employee_data.get(key) or "unknown").strip().lower() or "unknown"
+
+    years = years_of_service(employee_data.get("start_date"))
+    return (attribute("contract_type"), attribute("probation_status"), tenure_band(years), reason)
 
+def check_termination_class(class_key: tuple, priority: str = BATCH, cancel=None) -> dict:
+    """
+    One legality decision for every employee in an equivalence class
+    (legal_to_terminate, legal_reasons_if_cannot). Money is computed per employee locally.
+    Identical classes asked at the same time (any session) share one JamAI call.
+    """
+    contract_type, probation_status, band, reason = class_key
+    print(f"🚀 Sending termination class check to JamAI: {contract_type} / {probation_status} / {band} / {reason}")
+
+    sections = retrieve_sections([
+        f"termination {reason}",
+        f"{contract_type} {probation_status} termination notice",
+        f"termination benefits severance {reason}"
+    ])
+    law_context = format_sections(sections) or \
+        "Refer to knowledge tables: epf&socso_law, employment_act_1955, industrial_relations_act_1967"
+
+    input_text = f"""
+Employee group (the answer must hold for every employee in it):
+contract_type: {contract_type}
+probation_status: {probation_status}
+length of service: {band}
+Termination reason: {reason}
+{law_context}
+Return as JSON object with:
+legal_to_terminate, required_notice_period, severance_pay, unused_leave_pay, legal_reasons_if_cannot
+"""
+    return single_flight(
+        content_key("termination-class", input_text), _ask_jamai, input_text, priority, cancel, cancel=cancel
+    )
+
+def _class_decision(class_key: tuple, priority: str, cancel) -> dict:
+    """check_termination_class() with the same failure handling as check_termination()."""
+    try:
+        return {"decision": check_termination_class(class_key, priority, cancel)}
+    except OperationCancelled:
+        raise
+    except (CircuitOpenError, TimeoutError) as e:
+        print(f"🔌 JamAI unhealthy, using local statutory estimate: {e}")
+        return {"unavailable": True}
     except Exception as e:
         print(f"🔥 Critical API Error: {e}")
-        return {}
+        return {"decision": {}}
+
+def check_terminations(employees: list, reason: str, priority: str = BATCH, cancel=None) -> list:
+    """
+    Bulk version of check_termination(): employees are grouped into equivalence
+    classes (see termination_class), one legality call is made per class and
+    notice / severance / unused leave are computed per employee with
+    estimate_statutory_entitlements(). Returns one result per employee, in
+    order, with the same keys as check_termination() plus "class_key" and
+    "class_size" ({} where the class decision could not be read).
+    Bulk runs queue as BATCH so they can't crowd out chat and contract checks.
+    Every result is {} once the optional `cancel` token fires.
+    """
+    classes = OrderedDict()
+    for index, employee_data in enumerate(employees):
+        classes.setdefault(termination_class(employee_data, reason), []).append(index)
+    print(f"👥 {len(employees)} employees -> {len(classes)} termination classes")
+
+    try:
+        decisions = dict(zip(classes, _class_pool.map(
+            _class_decision, list(classes), [priority] * len(classes), [cancel] * len(classes)
+        )))
+    except OperationCancelled as e:
+        print(f"🛑 Bulk termination check cancelled: {e}")
+        return [{} for _ in employees]
+
+    results = [{} for _ in employees]
+    for class_key, members in classes.items():
+        outcome = decisions[class_key]
+        decision = outcome.get("decision") or {}
+        if not outcome.get("unavailable") and not decision:
+            continue
+        for index in members:
+            estimate = estimate_statutory_entitlements(employees[index], reason)
+            if outcome.get("unavailable"):
+                result = _unavailable_result(estimate)
+            else:
+                result = {
+                    "legal_to_terminate": is_legal(decision.get("legal_to_terminate", False)),
+                    **estimate,
+                    "legal_reasons_if_cannot": decision.get("legal_reasons_if_cannot", "")
+                }
+            result["class_key"] = class_key
+            result["class_size"] = len(members)
+            results[index] = result
+    return results
\ No newline at end of file
@@ -0,0 +1,61 @@
+# warmup.py
+"""
+Optional background pre-warming. Pages start with only the light imports
+they need to paint; the slow ones (PyMuPDF, ReportLab, pandas, jamaibase and
+the JamAI client) are loaded in a daemon thread so the first click doesn't
+pay for them. Profile with:  python profile_startup.py
+"""
+import importlib
+import threading
+import time
+
+from config import PREWARM_ENABLED
+
+# Heavy dependencies each page loads lazily on first use
+PAGE_MODULES = {
+    "chat": ["jamaibase"],
+    "contract": ["fitz", "reportlab.platypus", "jamaibase"],
+    "termination": ["pandas", "pyarrow.feather", "reportlab.pdfgen.canvas", "jamaibase"],
+}
+
+_lock = threading.Lock()
+_started = set()
+_timings = {}       # module -> seconds spent importing it in the background
+
+
+def _run(modules, credentials):
+    for name in modules:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"⚠️ Pre-warm import of {name} failed: {e}")
+            continue
+        with _lock:
+            _timings[name] = time.perf_counter() - start
+
+    if "jamaibase" in modules:
+        from jamai_gateway import get_jamai
+
+        try:
+            get_jamai(*credentials)
+        except Exception as e:
+            print(f"⚠️ Pre-warm of JamAI client failed: {e}")
+
+
+def prewarm(page: str, credentials: tuple = ()):
+    """Starts loading the page's heavy modules in the background (once per process)."""
+    if not PREWARM_ENABLED:
+        return
+    with _lock:
+        if page in _started:
+            return
+        _started.add(page)
+    threading.Thread(
+        target=_run, args=(PAGE_MODULES.get(page, []), credentials), daemon=True, name=f"prewarm-{page}"
+    ).start()
+
+
+def get_stats() -> dict:
+    with _lock:
+        return dict(_timings)
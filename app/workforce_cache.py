@@ -0,0 +1,134 @@
+# workforce_cache.py
+"""
+Uploaded employee CSV/XLSX files are parsed once and cached as uncompressed
+Arrow (Feather v2) files keyed by the upload's hash. Later reruns memory-map
+the cached file instead of re-parsing the workbook.
+"""
+import hashlib
+import os
+import threading
+from io import BytesIO
+
+from config import CACHE_DIR, WORKFORCE_CACHE_MAX_FILES
+
+WORKFORCE_DIR = os.path.join(CACHE_DIR, "workforce")
+
+_lock = threading.Lock()
+_stats = {"parsed": 0, "cached": 0}
+
+
+def file_digest(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+def _read_excel_streaming(data: bytes):
+    """
+    Reads the first sheet with openpyxl in read-only mode: rows are streamed
+    from the XML instead of building the whole workbook in memory.
+    """
+    import pandas as pd
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(BytesIO(data), read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return pd.DataFrame()
+        # Same header handling as pd.read_excel: unnamed columns get a placeholder name
+        names = [str(h) if h is not None else f"Unnamed: {i}" for i, h in enumerate(header)]
+        columns = [[] for _ in names]
+        for row in rows:
+            if row is None or all(v is None for v in row):
+                continue
+            for i, column in enumerate(columns):
+                column.append(row[i] if i < len(row) else None)
+        return pd.DataFrame(dict(zip(names, columns)))
+    finally:
+        workbook.close()
+
+
+def _parse(file_name: str, data: bytes):
+    import pandas as pd
+
+    if file_name.lower().endswith(".csv"):
+        return pd.read_csv(BytesIO(data))
+    return _read_excel_streaming(data)
+
+
+def _to_arrow(df):
+    """Arrow table for the frame. Only columns Arrow can't type (e.g. numbers mixed with text) become text."""
+    import pyarrow as pa
+
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        pass
+    df = df.copy()
+    for col in df.columns[df.dtypes == object]:
+        try:
+            pa.array(df[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            df[col] = df[col].map(lambda v: None if v is None or v != v else str(v))
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def _write_arrow(table, path: str):
+    from pyarrow import feather
+
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    # Uncompressed so the file can be memory-mapped without decoding
+    feather.write_feather(table, tmp_path, compression="uncompressed")
+    os.replace(tmp_path, path)
+
+
+def _cleanup_old_files():
+    try:
+        paths = [os.path.join(WORKFORCE_DIR, n) for n in os.listdir(WORKFORCE_DIR) if n.endswith(".arrow")]
+        paths.sort(key=os.path.getmtime, reverse=True)
+        for path in paths[WORKFORCE_CACHE_MAX_FILES:]:
+            os.remove(path)
+    except OSError:
+        pass
+
+
+def load_workforce_file(file_name: str, data: bytes):
+    """
+    Employee table for an uploaded CSV/XLSX. The first call for a file parses
+    it and writes the Arrow cache; later calls (any rerun, any session) read it
+    memory-mapped. Without pyarrow the file is simply parsed every time.
+    """
+    try:
+        from pyarrow import feather
+    except ImportError:
+        return _parse(file_name, data)
+
+    path = os.path.join(WORKFORCE_DIR, f"{file_digest(data)}.arrow")
+    if os.path.exists(path):
+        try:
+            df = feather.read_table(path, memory_map=True).to_pandas()
+            with _lock:
+                _stats["cached"] += 1
+            return df
+        except Exception as e:
+            print(f"⚠️ Workforce cache unreadable, re-parsing: {e}")
+
+    df = _parse(file_name, data)
+    with _lock:
+        _stats["parsed"] += 1
+    try:
+        table = _to_arrow(df)
+        # The same frame a cached reload gives, so types don't change between reruns
+        df = table.to_pandas()
+        os.makedirs(WORKFORCE_DIR, exist_ok=True)
+        _write_arrow(table, path)
+        _cleanup_old_files()
+        print(f"💾 Cached {file_name} ({len(df)} rows) as Arrow")
+    except Exception as e:
+        print(f"⚠️ Could not cache {file_name}: {e}")
+    return df
+
+
+def get_stats() -> dict:
+    with _lock:
+        return dict(_stats)
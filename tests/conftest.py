@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+# The app modules import each other as top-level modules (streamlit runs from app/)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+
+@pytest.fixture(autouse=True, scope="session")
+def cache_dir(tmp_path_factory):
+    """CACHE_DIR is relative to the working directory: keep test caches out of the tree."""
+    previous = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("app"))
+    yield
+    os.chdir(previous)
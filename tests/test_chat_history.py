@@ -0,0 +1,41 @@
+import os
+import time
+
+import chat_history
+
+SESSION = "test-session"
+
+
+def test_model_html_is_escaped_before_rendering():
+    message = chat_history.new_message("assistant", "Hi <img src=x onerror=alert(1)>\n  - **indented** & kept", SESSION)
+    body, is_html = chat_history.render_args(message, SESSION)
+    assert is_html
+    assert "<img" not in body
+    assert body == "Hi &lt;img src=x onerror=alert(1)&gt;<br>&nbsp;&nbsp;- **indented** &amp; kept"
+
+
+def test_user_messages_are_never_rendered_as_html():
+    message = chat_history.new_message("user", "<b>hi</b>", SESSION)
+    assert chat_history.render_args(message, SESSION) == ("<b>hi</b>", False)
+
+
+def test_conversation_history_is_rebuilt_from_the_last_messages_only():
+    messages = [chat_history.new_message("user" if i % 2 == 0 else "assistant", f"message {i}", SESSION) for i in range(30)]
+
+    history = chat_history.conversation_history(messages, SESSION, limit=4)
+
+    assert history == "User: message 26\nAssistant: message 27\nUser: message 28\nAssistant: message 29\n"
+
+
+def test_idle_transcripts_are_deleted(tmp_path, monkeypatch):
+    monkeypatch.setattr(chat_history, "TRANSCRIPT_DIR", str(tmp_path))
+    old_chat, new_chat = chat_history.new_chat_id(), chat_history.new_chat_id()
+    chat_history.append_transcript(old_chat, "user", "old question")
+    chat_history.append_transcript(new_chat, "user", "new question")
+    stale = time.time() - chat_history.CHAT_TRANSCRIPT_TTL_S - 60
+    os.utime(os.path.join(str(tmp_path), f"{old_chat}.jsonl"), (stale, stale))
+
+    chat_history.cleanup_expired()
+
+    assert chat_history.load_transcript(old_chat) == []
+    assert chat_history.load_transcript(new_chat) == [("user", "new question")]
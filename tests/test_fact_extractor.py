@@ -0,0 +1,32 @@
+import os
+
+import pytest
+
+from contractChecker.fact_extractor import extract_employee_facts
+from contractChecker.pdf_parser import extract_text_from_pdf
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def mock_contract(name):
+    return extract_text_from_pdf(os.path.join(REPO_ROOT, name))
+
+
+def test_employee_name_skips_company_name_in_mock_contract():
+    facts = extract_employee_facts(mock_contract("mock_contract3.pdf"))
+
+    assert facts["employee_name"] == "Josephine Ding Jia Xin"
+
+
+@pytest.mark.parametrize("name", ["mock_contract1.pdf", "mock_contract2.pdf"])
+def test_placeholder_name_in_mock_contract_is_not_a_name(name):
+    assert "employee_name" not in extract_employee_facts(mock_contract(name))
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Company Name: Acme Sdn Bhd\nName: Ali bin Abu\nIC: 900101-01-1234", "Ali bin Abu"),
+    ("**Employer** Company Name: Acme Sdn Bhd **Employee** Name: Siti Aminah binti Yusof Address: 1, Jalan Mawar", "Siti Aminah binti Yusof"),
+    ("Nama Syarikat: Acme Sdn Bhd Nama Pekerja: Tan Mei Ling No. K/P: 900101-01-1234", "Tan Mei Ling"),
+])
+def test_employee_name_stops_at_the_next_label(text, expected):
+    assert extract_employee_facts(text)["employee_name"] == expected
@@ -0,0 +1,55 @@
+import pytest
+
+from contractChecker import financial_calculator
+from contractChecker.financial_calculator import calculate_liability, simulate_liability
+
+RISK = {"risk_assessment": [
+    {"calc_tag": "CALC_OT", "violation_name": "Unpaid overtime", "max_fine_rm": 50000},
+    {"calc_tag": "CALC_LEAVE", "violation_name": "Leave denied", "max_fine_rm": 10000},
+    {"calc_tag": "CALC_NOTICE", "violation_name": "No notice pay", "max_fine_rm": 10000, "jail_term": "2 years"},
+]}
+EMPLOYEE = {"basic_salary_monthly": "RM 2,600", "probation_months": 3, "notice_period_months": 1}
+
+# The fixed assumptions of calculate_liability()
+DETERMINISTIC = {
+    "ot_hours_per_week": ("fixed", 5), "ot_weeks": ("fixed", 52), "leave_days_denied": ("fixed", 4),
+    "fine_fraction": ("fixed", 0.25), "serious_fine_fraction": ("fixed", 1.0),
+}
+
+
+def test_same_seed_gives_the_same_numbers():
+    first = simulate_liability(RISK, EMPLOYEE, n_scenarios=2000, seed=7)
+
+    assert simulate_liability(RISK, EMPLOYEE, n_scenarios=2000, seed=7) == first
+    assert simulate_liability(RISK, EMPLOYEE, n_scenarios=2000, seed=8)["total"] != first["total"]
+
+
+def test_percentiles_are_ordered():
+    result = simulate_liability(RISK, EMPLOYEE, n_scenarios=2000)
+
+    for stats in result["items"] + [result["total"]]:
+        assert 0 <= stats["p50"] <= stats["p90"] <= stats["p99"]
+    assert [item["calc_tag"] for item in result["items"]] == ["CALC_OT", "CALC_LEAVE", "CALC_NOTICE"]
+
+
+def test_fixed_assumptions_match_the_linear_model(monkeypatch):
+    monkeypatch.setattr(financial_calculator, "LIABILITY_DISTRIBUTIONS", DETERMINISTIC)
+
+    total = simulate_liability(RISK, EMPLOYEE, n_scenarios=100)["total"]
+
+    expected = calculate_liability(RISK, EMPLOYEE)["total_likely_liability"]
+    assert total["p50"] == pytest.approx(expected)
+    assert total["p99"] == pytest.approx(expected)
+
+
+def test_min_wage_top_up_only_below_the_minimum(monkeypatch):
+    monkeypatch.setattr(financial_calculator, "LIABILITY_DISTRIBUTIONS", DETERMINISTIC)
+    risk = {"risk_assessment": [{"calc_tag": "CALC_MIN_WAGE", "violation_name": "Below minimum wage", "max_fine_rm": 0}]}
+
+    assert simulate_liability(risk, {"basic_salary_monthly": 1400}, n_scenarios=10)["total"]["p50"] == pytest.approx(1200)
+    assert simulate_liability(risk, {"basic_salary_monthly": 1800}, n_scenarios=10)["total"]["p99"] == 0
+
+
+def test_no_risk_items_is_empty():
+    assert simulate_liability({}, EMPLOYEE) == {}
+    assert simulate_liability({"risk_assessment": []}, EMPLOYEE) == {}
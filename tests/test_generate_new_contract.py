@@ -0,0 +1,122 @@
+from types import SimpleNamespace
+
+import pytest
+
+import jamai_gateway
+from config import CIRCUIT_COOLDOWN_S, CIRCUIT_FAILURE_THRESHOLD
+from contractChecker.generate_new_contract import (
+    FenceStripper, GenerationError, generate_targeted_contract, locate_flagged_spans, strip_markdown_fences
+)
+from jamai_gateway import CircuitBreaker
+
+CONTRACT = """EMPLOYMENT CONTRACT
+
+1. Working Hours: The employee shall work 12 hours a day, Monday to Sunday.
+
+2. Salary: The employee shall be paid RM 2,000 per month.
+
+3. Overtime: No overtime pay will be provided."""
+
+HOURS = {"text": "The employee shall work 12 hours a day, Monday to Sunday.",
+         "illegal": {"working_hours": {"status": "illegal", "reason": "Over 8 hours a day"}}}
+OVERTIME = {"text": "3. Overtime: No overtime shall be paid",
+            "illegal": {"overtime": {"status": "illegal", "reason": "Overtime must be paid"}}}
+
+
+class Drafter:
+    """Contract_Generator stand-in: answers each prompt with answer(prompt)."""
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.prompts = []
+
+    def add_action_rows(self, table_id, data, stream):
+        prompt = data[0]["question"]
+        self.prompts.append(prompt)
+        text = self.answer(prompt)
+        return SimpleNamespace(rows=[SimpleNamespace(columns={"answer": SimpleNamespace(text=text)})])
+
+
+@pytest.fixture
+def drafter(monkeypatch):
+    monkeypatch.setattr(jamai_gateway.gateway, "breaker", CircuitBreaker(CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_COOLDOWN_S))
+
+    def use(answer):
+        backend = Drafter(answer)
+        jamai_gateway.use_standin(backend)
+        return backend
+
+    yield use
+    jamai_gateway.use_standin(None)
+
+
+def clause_rewrite(prompt):
+    if "Rewrite ONLY the clause" not in prompt:
+        return "FULL REWRITE"
+    clause = prompt.split("Contract:\n", 1)[1]
+    return "```markdown\n" + clause.replace("12 hours", "8 hours").replace("No overtime pay will be", "Overtime pay shall be") + "\n```"
+
+
+def test_verbatim_quote_is_located_exactly():
+    [(start, end, items)] = locate_flagged_spans(CONTRACT, [HOURS])
+    assert CONTRACT[start:end] == HOURS["text"]
+    assert items == [HOURS]
+
+
+def test_paraphrased_quote_falls_back_to_its_whole_clause():
+    [(start, end, _)] = locate_flagged_spans(CONTRACT, [OVERTIME])
+    assert CONTRACT[start:end] == "3. Overtime: No overtime pay will be provided."
+
+
+def test_unlocatable_quote_gives_no_spans():
+    assert locate_flagged_spans(CONTRACT, [HOURS, {"text": "Employee must surrender passport", "illegal": {}}]) == []
+
+
+def test_only_flagged_clauses_are_rewritten(drafter):
+    backend = drafter(clause_rewrite)
+
+    result = generate_targeted_contract(CONTRACT, [HOURS, OVERTIME], "en")
+
+    assert result == CONTRACT.replace("12 hours", "8 hours").replace("No overtime pay will be", "Overtime pay shall be")
+    assert len(backend.prompts) == 2
+
+
+def test_clause_returned_unchanged_falls_back_to_full_rewrite(drafter):
+    backend = drafter(lambda prompt: "FULL REWRITE" if "Rewrite ONLY" not in prompt else prompt.split("Contract:\n", 1)[1])
+
+    assert generate_targeted_contract(CONTRACT, [HOURS], "en") == "FULL REWRITE"
+    # First try, one retry, then the whole contract
+    assert len(backend.prompts) == 3
+
+
+def test_drafter_failure_raises_instead_of_returning_text(drafter):
+    def down(prompt):
+        raise RuntimeError("upstream down")
+
+    drafter(down)
+    with pytest.raises(GenerationError):
+        generate_targeted_contract(CONTRACT, [HOURS], "ms")
+
+
+
+@pytest.mark.parametrize("chunks", [
+    ["```markdown\n# Contract\n\nBody text.\n```"],
+    ["``", "`mark", "down\n# Contract\n\nBody", " text.\n`", "``"],
+    ["```\n# Contract", "\n\nBody text.", "\n```\n"],
+    ["# Contract\n\nBody text."],
+    ["# Contract\n\n", "Body text.\n``", "`\n"],
+    ["Use `code` and ``", "quotes`` in text."],
+])
+def test_fence_stripper_matches_strip_markdown_fences(chunks):
+    stripper = FenceStripper()
+    streamed = "".join(stripper.feed(chunk) for chunk in chunks) + stripper.flush()
+    assert streamed == strip_markdown_fences("".join(chunks))
+
+
+def test_fence_stripper_passes_text_through_as_it_arrives():
+    stripper = FenceStripper()
+    assert stripper.feed("```mark") == ""
+    assert stripper.feed("down\n# Contract\n") == "# Contract"
+    assert stripper.feed("\n1. Salary: RM 2,000``") == "\n\n1. Salary: RM 2,000"
+    assert stripper.feed("`") == ""
+    assert stripper.flush() == ""
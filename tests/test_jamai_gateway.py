@@ -0,0 +1,259 @@
+import threading
+import time
+
+import pytest
+
+import jamai_gateway
+from concurrent.futures import ThreadPoolExecutor
+
+from cancellation import CancelToken, OperationCancelled
+from config import JAMAI_PRIORITY_WEIGHTS
+from jamai_gateway import (
+    BATCH, INTERACTIVE, AdaptiveConcurrency, CircuitBreaker, CircuitOpenError, JamAIGateway, LocalTimeoutError,
+    TokenBucket
+)
+
+
+def fail():
+    raise RuntimeError("upstream down")
+
+
+def shutdown(gw):
+    for pool in gw.pools.values():
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+@pytest.fixture
+def half_open_gateway():
+    """Gateway whose breaker opened on one failure and is now half-open (zero cooldown)."""
+    gw = JamAIGateway()
+    gw.bucket = TokenBucket(1000, 1000)
+    gw.breaker = CircuitBreaker(threshold=1, cooldown=0.0)
+    with pytest.raises(RuntimeError):
+        gw.call(fail)
+    assert gw.breaker.state == "open"
+    yield gw
+    shutdown(gw)
+
+
+def test_cancel_during_half_open_trial_allows_next_call(half_open_gateway):
+    gw = half_open_gateway
+    started, unblock = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        unblock.wait(5)
+        return "late"
+
+    token = CancelToken()
+    threading.Timer(0.2, token.cancel).start()
+    with pytest.raises(OperationCancelled):
+        gw.call(slow, cancel=token)
+    assert started.is_set()
+
+    # The cancelled trial no longer holds the half-open slot
+    assert gw.call(lambda: "ok") == "ok"
+    assert gw.breaker.state == "closed"
+    unblock.set()
+
+
+def test_cancelled_stream_trial_allows_next_call(half_open_gateway):
+    gw = half_open_gateway
+    token = CancelToken()
+    chunks = gw.stream(lambda: iter(["a", "b", "c"]), cancel=token)
+    assert next(chunks) == "a"
+    token.cancel()
+    with pytest.raises(OperationCancelled):
+        next(chunks)
+
+    assert list(gw.stream(lambda: iter(["x"]))) == ["x"]
+    assert gw.breaker.state == "closed"
+
+
+def test_running_trial_still_blocks_other_calls(half_open_gateway):
+    gw = half_open_gateway
+    started, unblock = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        unblock.wait(5)
+        return "done"
+
+    trial = threading.Thread(target=gw.call, args=(slow,))
+    trial.start()
+    started.wait(5)
+    with pytest.raises(CircuitOpenError):
+        gw.call(lambda: "ok")
+    unblock.set()
+    trial.join(5)
+    assert gw.breaker.state == "closed"
+
+
+class Throttled(Exception):
+    status_code = 429
+
+
+@pytest.fixture
+def single_slot_gateway(monkeypatch):
+    """Gateway with one JamAI slot, no rate limit and a short hedged-call timeout."""
+    monkeypatch.setattr(jamai_gateway, "JAMAI_CALL_TIMEOUT_S", 0.3)
+    gw = JamAIGateway()
+    gw.bucket = TokenBucket(1000, 1000)
+    gw.concurrency = AdaptiveConcurrency(1, 1, 1, JAMAI_PRIORITY_WEIGHTS)
+    yield gw
+    shutdown(gw)
+
+
+def test_hedged_timeout_starts_once_the_call_has_a_slot(single_slot_gateway):
+    gw = single_slot_gateway
+    unblock = threading.Event()
+    holder = threading.Thread(target=gw.call, args=(lambda: unblock.wait(5),))
+    holder.start()
+    threading.Timer(0.6, unblock.set).start()
+
+    # Queued for twice the timeout, then answered at once
+    assert gw.call_hedged("audit", lambda: "ok") == "ok"
+    holder.join(5)
+    assert gw.breaker.failures == 0
+
+
+def test_timeout_while_backing_off_is_local_and_stops_retrying(single_slot_gateway):
+    gw = single_slot_gateway
+    calls = []
+
+    def throttled():
+        calls.append(time.monotonic())
+        raise Throttled("429 too many requests")
+
+    with pytest.raises(LocalTimeoutError):
+        gw.call_hedged("audit", throttled)
+    assert gw.breaker.failures == 0
+
+    # The abandoned attempt was cancelled during its backoff, not retried later
+    time.sleep(1.0)
+    assert len(calls) == 1
+
+
+def test_timeout_while_upstream_is_slow_counts_as_failure(single_slot_gateway):
+    gw = single_slot_gateway
+    unblock = threading.Event()
+
+    with pytest.raises(TimeoutError) as raised:
+        gw.call_hedged("audit", lambda: unblock.wait(5))
+    assert not isinstance(raised.value, LocalTimeoutError)
+    assert gw.breaker.failures == 1
+    assert gw.stats()["abandoned"] == 1
+    unblock.set()
+
+
+def wait_until(condition, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, "timed out"
+        time.sleep(0.01)
+
+
+def test_wfq_gives_interactive_its_share_of_freed_slots():
+    limiter = AdaptiveConcurrency(1, 1, 1, {INTERACTIVE: 4, BATCH: 1})
+    limiter.acquire(INTERACTIVE)
+    order, lock = [], threading.Lock()
+
+    def queued(priority):
+        limiter.acquire(priority)
+        with lock:
+            order.append(priority)
+        limiter.release()
+
+    threads = []
+    for n, priority in enumerate([BATCH] * 4 + [INTERACTIVE] * 4):
+        threads.append(threading.Thread(target=queued, args=(priority,), daemon=True))
+        threads[-1].start()
+        wait_until(lambda: sum(limiter.queue_depths().values()) == n + 1)
+    limiter.release()
+    for thread in threads:
+        thread.join(5)
+
+    # Batch queued first, yet interactive takes 4 of the first 5 slots
+    assert order == [BATCH, INTERACTIVE, INTERACTIVE, INTERACTIVE, INTERACTIVE, BATCH, BATCH, BATCH]
+
+
+def test_cancelled_call_leaves_the_queue_without_a_slot():
+    limiter = AdaptiveConcurrency(1, 1, 1, JAMAI_PRIORITY_WEIGHTS)
+    limiter.acquire(BATCH)
+    token = CancelToken()
+    threading.Timer(0.1, token.cancel).start()
+
+    with pytest.raises(OperationCancelled):
+        limiter.acquire(BATCH, cancel=token)
+    assert limiter.queue_depths()[BATCH] == 0
+    assert limiter.in_flight == 1
+
+
+def test_batch_flood_does_not_delay_interactive_calls():
+    gw = JamAIGateway()
+    gw.bucket = TokenBucket(1000, 1000)
+    gw.concurrency = AdaptiveConcurrency(2, 2, 2, JAMAI_PRIORITY_WEIGHTS)
+    finished, lock = [], threading.Lock()
+    flood_token = CancelToken()
+
+    def batch_job():
+        time.sleep(0.05)
+        with lock:
+            finished.append(BATCH)
+
+    callers = ThreadPoolExecutor(max_workers=100)
+    try:
+        for _ in range(100):
+            callers.submit(gw.call, batch_job, priority=BATCH, cancel=flood_token)
+        wait_until(lambda: gw.concurrency.queue_depths()[BATCH] > 20)
+
+        start = time.monotonic()
+        assert gw.call(lambda: INTERACTIVE, priority=INTERACTIVE, cancel=CancelToken()) == INTERACTIVE
+        latency = time.monotonic() - start
+        with lock:
+            batch_done = len(finished)
+
+        # Admitted at the next freed slot, ahead of the queued batch calls
+        assert latency < 0.5
+        assert batch_done < 20
+    finally:
+        flood_token.cancel()
+        callers.shutdown(wait=True)
+        shutdown(gw)
+
+
+def test_cancelled_call_with_jamai_is_counted_as_abandoned(single_slot_gateway):
+    gw = single_slot_gateway
+    started, unblock = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        unblock.wait(5)
+
+    token = CancelToken()
+    threading.Timer(0.1, token.cancel).start()
+    with pytest.raises(OperationCancelled):
+        gw.call(slow, cancel=token)
+
+    # The request can't be aborted: it is still running, and counted as such
+    assert started.is_set() and gw.concurrency.in_flight == 1
+    assert gw.stats()["abandoned"] == 1
+    unblock.set()
+
+
+def test_cancelled_call_still_queued_never_reaches_jamai(single_slot_gateway):
+    gw = single_slot_gateway
+    unblock, calls = threading.Event(), []
+    holder = threading.Thread(target=gw.call, args=(lambda: unblock.wait(5),), daemon=True)
+    holder.start()
+    wait_until(lambda: gw.concurrency.in_flight == 1)
+
+    token = CancelToken()
+    threading.Timer(0.1, token.cancel).start()
+    with pytest.raises(OperationCancelled):
+        gw.call(lambda: calls.append("sent"), cancel=token)
+    unblock.set()
+    holder.join(5)
+
+    assert calls == []
+    assert gw.stats()["abandoned"] == 0
@@ -0,0 +1,51 @@
+import json
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import pytest
+
+import jamai_gateway
+from config import CIRCUIT_COOLDOWN_S, CIRCUIT_FAILURE_THRESHOLD
+from contractChecker import law_checker, template_index
+from jamai_gateway import CircuitBreaker
+
+CONTRACT = "\n\n".join([
+    "1. Salary: RM 2,000 per month.",
+    "2. Working Hours: 60 hours per week, overtime is not paid.",
+])
+
+
+class Auditor:
+    """Contract_Auditor_Full stand-in; fails every call once `down` is set."""
+
+    def __init__(self):
+        self.down = False
+
+    def add_action_rows(self, table_id, data, stream):
+        if self.down:
+            raise jamai_gateway.CircuitOpenError("JamAI down")
+        report = {"summary": {"total_clauses_found": 2}, "violations": [{"text": "60 hours", "illegal": {}}]}
+        return SimpleNamespace(rows=[SimpleNamespace(columns={"final_json_report": SimpleNamespace(text=json.dumps(report))})])
+
+
+@pytest.fixture
+def auditor(tmp_path, monkeypatch):
+    monkeypatch.setattr(jamai_gateway.gateway, "breaker", CircuitBreaker(CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_COOLDOWN_S))
+    monkeypatch.setattr(template_index, "TEMPLATE_REUSE_ENABLED", False)
+    monkeypatch.setattr(law_checker, "_recent_reports", OrderedDict())
+    backend = Auditor()
+    jamai_gateway.use_standin(backend)
+    yield backend
+    jamai_gateway.use_standin(None)
+
+
+def test_recent_report_is_served_as_a_copy(auditor):
+    report = law_checker.check_full_contract(CONTRACT)
+    report["violations"].clear()
+
+    auditor.down = True
+    served = law_checker.check_full_contract(CONTRACT)
+    assert len(served["violations"]) == 1
+
+    served["violations"].clear()
+    assert len(law_checker.check_full_contract(CONTRACT)["violations"]) == 1
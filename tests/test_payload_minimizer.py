@@ -0,0 +1,78 @@
+from contractChecker.payload_minimizer import minimize_contract
+
+SALARY_SCHEDULE = """4. Salary: The basic salary shall be revised every year as follows.
+
+Year 1: RM 3,000 per month
+
+Year 2: RM 3,300 per month
+
+Year 3: RM 3,600 per month
+
+5. Annual Leave: 8 days of paid annual leave per year."""
+
+
+def pages_of(*pages):
+    """Joins pages the way pdf_parser does and returns (text, page_starts)."""
+    text, starts = "", []
+    for page in pages:
+        if text:
+            text += "\n\n"
+        starts.append(len(text))
+        text += page
+    return text, starts
+
+
+def test_salary_schedule_without_page_boundaries_is_kept():
+    payload = minimize_contract(SALARY_SCHEDULE)
+
+    for line in ("Year 1: RM 3,000", "Year 2: RM 3,300", "Year 3: RM 3,600"):
+        assert line in payload.text
+    assert "headers_footers" not in payload.removed
+
+
+def test_salary_schedule_on_its_own_page_is_kept():
+    text, starts = pages_of("1. Commencement: The employment starts on 1 March 2025.", SALARY_SCHEDULE,
+                            "6. Termination: Four weeks' written notice.")
+    payload = minimize_contract(text, starts)
+
+    assert "Year 2: RM 3,300" in payload.text
+    assert "headers_footers" not in payload.removed
+
+
+def test_repeated_clause_line_in_the_body_is_kept():
+    clause = "The employee shall comply with all lawful instructions."
+    page = "{n}. Duties: Section {n} applies.\n\n" + clause + "\n\n{n}. Further terms follow."
+    text, starts = pages_of(*(page.format(n=n) for n in (1, 2, 3)))
+    payload = minimize_contract(text, starts)
+
+    assert clause in payload.text
+    assert "headers_footers" not in payload.removed
+
+
+def test_running_header_and_footer_are_dropped():
+    page = "ACME SDN BHD - EMPLOYMENT CONTRACT\n\n{n}. Clause {n}: the terms of clause {n} apply.\n\nConfidential - Page {n} of 3"
+    text, starts = pages_of(*(page.format(n=n) for n in (1, 2, 3)))
+    payload = minimize_contract(text, starts)
+
+    assert "ACME SDN BHD" not in payload.text
+    assert "Confidential" not in payload.text
+    assert payload.removed["headers_footers"] == 6
+    for n in (1, 2, 3):
+        assert f"Clause {n}: the terms of clause {n} apply." in payload.text
+
+
+def test_header_on_fewer_pages_than_the_threshold_is_kept():
+    page = "ACME SDN BHD - EMPLOYMENT CONTRACT\n\n{n}. Clause {n}: the terms of clause {n} apply."
+    text, starts = pages_of(*(page.format(n=n) for n in (1, 2)))
+
+    assert "ACME SDN BHD" in minimize_contract(text, starts).text
+
+
+def test_schedule_lines_that_differ_only_in_figures_are_not_duplicates():
+    schedule = "\n\n".join(
+        f"Year {n}: the basic salary shall be RM {amount} per month." for n, amount in ((1, "3,000"), (2, "3,300"), (3, "3,600"))
+    )
+    text, starts = pages_of(*schedule.split("\n\n"))
+    payload = minimize_contract(text, starts)
+
+    assert payload.text == schedule
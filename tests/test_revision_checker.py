@@ -0,0 +1,141 @@
+import json
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import pytest
+
+import jamai_gateway
+from config import CIRCUIT_COOLDOWN_S, CIRCUIT_FAILURE_THRESHOLD
+from contractChecker import law_checker, revision_checker, template_index
+from jamai_gateway import CircuitBreaker
+
+OLD = "\n\n".join([
+    "1. Salary: RM 2,000 per month.",
+    "2. Working Hours: 60 hours per week, overtime is not paid.",
+    "3. Annual Leave: 14 days per year.",
+])
+OLD_HOURS = "2. Working Hours: 60 hours per week, overtime is not paid."
+
+
+def illegal(*laws):
+    return {law: {"status": "illegal", "reason": law, "corrected": ""} for law in laws}
+
+
+PREVIOUS_REPORT = {
+    "summary": {"total_clauses_found": 3},
+    "violations": [{"text": OLD_HOURS, "illegal": illegal("working_hours", "overtime")}],
+    "contract_risk": {"risk_assessment": [
+        {"calc_tag": "CALC_OT", "violation_name": "Unpaid overtime"},
+        {"calc_tag": "CALC_NONE", "violation_name": "Leave clause", "text": "3. Annual Leave: 14 days per year."},
+    ]},
+    "employee_data": {"monthly_salary": 2000},
+}
+
+
+class Auditor:
+    """Contract_Auditor_Full stand-in: answers every audit with the same report."""
+
+    def __init__(self, report):
+        self.report = report
+        self.audited = []
+
+    def add_action_rows(self, table_id, data, stream):
+        self.audited.append(data[0]["full_contract_text"])
+        columns = {
+            "final_json_report": {k: v for k, v in self.report.items() if k in ("summary", "violations")},
+            "contract_risk": self.report.get("contract_risk", {}),
+            "employee_data": self.report.get("employee_data", {}),
+        }
+        return SimpleNamespace(rows=[SimpleNamespace(columns={
+            column: SimpleNamespace(text=json.dumps(value)) for column, value in columns.items()
+        })])
+
+
+@pytest.fixture
+def auditor(tmp_path, monkeypatch):
+    monkeypatch.setattr(jamai_gateway.gateway, "breaker", CircuitBreaker(CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_COOLDOWN_S))
+    monkeypatch.setattr(template_index, "DB_PATH", str(tmp_path / "templates.sqlite3"))
+    monkeypatch.setattr(template_index, "_initialized", False)
+    monkeypatch.setattr(template_index, "TEMPLATE_REUSE_ENABLED", True)
+    monkeypatch.setattr(law_checker, "_recent_reports", OrderedDict())
+
+    def use(report):
+        backend = Auditor(report)
+        jamai_gateway.use_standin(backend)
+        return backend
+
+    yield use
+    jamai_gateway.use_standin(None)
+
+
+def test_unquoted_risk_tags_come_from_the_reaudit(auditor):
+    new_hours = "2. Working Hours: 45 hours per week, overtime paid at 1.5x."
+    auditor({"summary": {"total_clauses_found": 1}, "violations": [], "contract_risk": {}})
+
+    report = revision_checker.check_contract_revision(OLD.replace(OLD_HOURS, new_hours), OLD, PREVIOUS_REPORT)
+
+    tags = [item["calc_tag"] for item in report["contract_risk"]["risk_assessment"]]
+    # The overtime tag had no quoted clause and the re-audit no longer raises it
+    assert "CALC_OT" not in tags
+    # Quoted tags on unchanged clauses are still reused
+    assert tags == ["CALC_NONE"]
+
+
+def test_old_violation_resolved_only_for_laws_the_reaudit_no_longer_flags(auditor):
+    new_hours = "2. Working Hours: 45 hours per week, overtime is not paid."
+    backend = auditor({
+        "summary": {"total_clauses_found": 1},
+        "violations": [{"text": new_hours, "illegal": illegal("overtime")}],
+        "contract_risk": {"risk_assessment": [{"calc_tag": "CALC_OT", "violation_name": "Unpaid overtime"}]},
+    })
+
+    report = revision_checker.check_contract_revision(OLD.replace(OLD_HOURS, new_hours), OLD, PREVIOUS_REPORT)
+
+    assert backend.audited == [new_hours]
+    resolved = report["revision"]["resolved_violations"]
+    assert [list(v["illegal"]) for v in resolved] == [["working_hours"]]
+    assert [v["revision_status"] for v in report["violations"]] == ["new"]
+
+
+def test_old_violation_not_resolved_when_the_rewrite_still_breaks_the_same_law(auditor):
+    new_hours = "2. Working Hours: 58 hours per week, overtime is not paid."
+    auditor({
+        "summary": {"total_clauses_found": 1},
+        "violations": [{"text": new_hours, "illegal": illegal("working_hours", "overtime")}],
+        "contract_risk": {},
+    })
+
+    report = revision_checker.check_contract_revision(OLD.replace(OLD_HOURS, new_hours), OLD, PREVIOUS_REPORT)
+
+    assert report["revision"]["resolved_violations"] == []
+
+
+def test_nothing_changed_keeps_every_finding(auditor):
+    backend = auditor({})
+    report = revision_checker.check_contract_revision(OLD, OLD, PREVIOUS_REPORT)
+
+    assert backend.audited == []
+    assert len(report["contract_risk"]["risk_assessment"]) == 2
+    assert [v["revision_status"] for v in report["violations"]] == ["unchanged"]
+
+
+def test_reaudited_clauses_are_not_learned_or_cached(auditor):
+    new_text = OLD.replace(OLD_HOURS, "2. Working Hours: 58 hours per week, overtime is not paid.")
+    auditor({"summary": {"total_clauses_found": 1}, "violations": [{"text": "58 hours", "illegal": illegal("working_hours")}]})
+
+    report = revision_checker.check_contract_revision(new_text, OLD, PREVIOUS_REPORT)
+
+    assert report["revision"]["reaudited_count"] == 1
+    assert template_index.get_stats()["templates"] == 0
+    assert not law_checker._recent_reports
+    # Sizes of the excerpt are not the contract's payload
+    assert "payload" not in report
+
+
+def test_failed_reaudit_is_not_reported_as_clean(auditor, monkeypatch):
+    auditor({})
+    monkeypatch.setattr(jamai_gateway.gateway, "breaker", CircuitBreaker(1, 60))
+    jamai_gateway.gateway.breaker.record_failure()
+
+    new_text = OLD.replace(OLD_HOURS, "2. Working Hours: 45 hours per week, overtime paid at 1.5x.")
+    assert revision_checker.check_contract_revision(new_text, OLD, PREVIOUS_REPORT) == {}
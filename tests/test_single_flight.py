@@ -0,0 +1,81 @@
+import fcntl
+import json
+import os
+import threading
+import time
+
+import pytest
+
+import single_flight as sf
+from cancellation import CancelToken, OperationCancelled
+
+
+@pytest.fixture
+def flight_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(sf, "FLIGHT_DIR", str(tmp_path))
+    return tmp_path
+
+
+def hold_lock(flight_dir, key):
+    """Takes the key's lock the way another server process running it would."""
+    lock_file = open(os.path.join(flight_dir, f"{key}.lock"), "a")
+    fcntl.flock(lock_file, fcntl.LOCK_EX)
+    return lock_file
+
+
+def test_waiting_on_another_process_can_be_cancelled(flight_dir):
+    other = hold_lock(flight_dir, "k-cancel")
+    token = CancelToken()
+    threading.Timer(0.2, token.cancel).start()
+    start = time.monotonic()
+    with pytest.raises(OperationCancelled):
+        sf.single_flight("k-cancel", lambda: {"ok": True}, cancel=token)
+    assert time.monotonic() - start < 2
+    other.close()
+
+
+def test_waiting_on_another_process_times_out(flight_dir, monkeypatch):
+    monkeypatch.setattr(sf, "SINGLE_FLIGHT_WAIT_S", 0.3)
+    other = hold_lock(flight_dir, "k-timeout")
+    with pytest.raises(TimeoutError):
+        sf.single_flight("k-timeout", lambda: {"ok": True})
+    other.close()
+
+
+def test_runs_once_the_other_process_releases(flight_dir):
+    other = hold_lock(flight_dir, "k-release")
+    threading.Timer(0.2, other.close).start()
+    assert sf.single_flight("k-release", lambda: {"ok": True}) == {"ok": True}
+
+
+def write_result(flight_dir, key, result, finished_at):
+    with open(os.path.join(flight_dir, f"{key}.json"), "w", encoding="utf-8") as f:
+        json.dump({"finished_at": finished_at, "result": result}, f)
+
+
+def test_reuses_result_of_the_call_in_flight(flight_dir):
+    other = hold_lock(flight_dir, "k-shared")
+
+    def finish():
+        write_result(flight_dir, "k-shared", {"from": "other"}, time.time())
+        other.close()
+
+    threading.Timer(0.2, finish).start()
+    assert sf.single_flight("k-shared", lambda: {"from": "us"}) == {"from": "other"}
+
+
+def test_finished_results_are_not_cached(flight_dir):
+    write_result(flight_dir, "k-stale", {"from": "earlier"}, time.time() - 1)
+    assert sf.single_flight("k-stale", lambda: {"from": "us"}) == {"from": "us"}
+
+
+def test_empty_and_failed_results_are_not_persisted(flight_dir):
+    assert sf.single_flight("k-empty", lambda: {}) == {}
+    assert not os.path.exists(os.path.join(flight_dir, "k-empty.json"))
+
+    def fail():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        sf.single_flight("k-error", fail)
+    assert not os.path.exists(os.path.join(flight_dir, "k-error.json"))
@@ -0,0 +1,89 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from contractChecker import speculative
+
+
+@pytest.fixture
+def budget(tmp_path, monkeypatch):
+    monkeypatch.setattr(speculative, "BUDGET_DB_PATH", str(tmp_path / "budget.sqlite3"))
+    monkeypatch.setattr(speculative, "SPECULATIVE_MAX_CALLS_PER_HOUR", 6)
+
+
+def take_many(n, results):
+    results.put(sum(speculative._take_budget() for _ in range(n)))
+
+
+def test_budget_is_shared_by_every_server_process(budget):
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    workers = [context.Process(target=take_many, args=(5, results)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+
+    assert sum(results.get(timeout=5) for _ in workers) == 6
+    assert not speculative._take_budget()
+    assert speculative.get_stats()["in_last_hour"] == 6
+
+
+def answer(value, cancel=None):
+    return value
+
+
+def fail(cancel=None):
+    raise RuntimeError("Generation Error: upstream down")
+
+
+@pytest.mark.parametrize("background", [fail, lambda cancel=None: {}])
+def test_failed_or_empty_speculative_result_is_a_miss(budget, background):
+    task = speculative.speculate("rewrite:a", background)
+    task.future.exception()
+
+    assert speculative.collect(task, "rewrite:a", answer, "direct") == "direct"
+
+
+def test_finished_speculative_result_is_used(budget):
+    task = speculative.speculate("rewrite:a", answer, "speculative")
+    task.future.result()
+
+    assert speculative.collect(task, "rewrite:a", answer, "direct") == "speculative"
+    assert speculative.collect(task, "rewrite:b", answer, "direct") == "direct"
+
+
+def test_task_still_queued_runs_inline(budget, monkeypatch):
+    monkeypatch.setattr(speculative, "_executor", ThreadPoolExecutor(max_workers=1))
+    unblock = threading.Event()
+    speculative._executor.submit(unblock.wait, 5)
+    task = speculative.speculate("rewrite:a", answer, "speculative")
+
+    start = time.monotonic()
+    assert speculative.collect(task, "rewrite:a", answer, "direct") == "direct"
+    assert time.monotonic() - start < 1
+    assert task.future.cancelled()
+    unblock.set()
+
+
+def test_cancel_counts_queued_and_running_tasks_apart(budget, monkeypatch):
+    monkeypatch.setattr(speculative, "_executor", ThreadPoolExecutor(max_workers=1))
+    monkeypatch.setattr(speculative, "_stats", dict.fromkeys(speculative._stats, 0))
+    started, unblock = threading.Event(), threading.Event()
+
+    def slow(cancel=None):
+        started.set()
+        unblock.wait(5)
+
+    running = speculative.speculate("rewrite:a", slow)
+    queued = speculative.speculate("rewrite:b", answer, "speculative")
+    started.wait(5)
+    speculative.cancel(queued)
+    speculative.cancel(running)
+
+    stats = speculative.get_stats()
+    assert (stats["cancelled"], stats["abandoned"]) == (1, 1)
+    unblock.set()
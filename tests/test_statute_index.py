@@ -0,0 +1,26 @@
+import os
+
+import pandas as pd
+
+import statute_index
+
+
+def export(path, title):
+    pd.DataFrame([
+        {"table_id": "employment_act_1955", "Title": title, "Text": "Every employee shall be entitled to paid annual leave."},
+        {"table_id": "employment_act_1955", "Title": "Section 12", "Text": "Either party may terminate the contract by notice."},
+    ]).to_parquet(path)
+    # The build is skipped when the export's size and mtime are unchanged
+    os.utime(path, (os.path.getmtime(path) + 10,) * 2)
+
+
+def test_renamed_section_is_reindexed(tmp_path):
+    parquet, index_dir = str(tmp_path / "export.parquet"), str(tmp_path / "index")
+    export(parquet, "Section 60E")
+    statute_index.build_index(parquet, index_dir)
+    assert statute_index.StatuteIndex(index_dir).search("holidays") == []
+
+    export(parquet, "Section 60E Holidays")
+    statute_index.build_index(parquet, index_dir)
+    hits = statute_index.StatuteIndex(index_dir).search("holidays")
+    assert [hit["title"] for hit in hits] == ["Section 60E Holidays"]
@@ -0,0 +1,118 @@
+import json
+import sqlite3
+import time
+
+import pytest
+
+from contractChecker import template_index
+
+CONTRACT = """EMPLOYMENT CONTRACT
+
+Employee Name: {name}
+NRIC: {nric}
+Email: {email}
+
+1. Commencement: The employment starts on the commencement date: {start}.
+
+2. Salary: The employee's basic salary is RM {salary} per month, paid on the 7th of every month.
+
+3. Working Hours: 48 hours per week, Monday to Saturday, 8.00 am to 5.00 pm with one hour lunch break.
+
+4. Overtime: Overtime work is paid at RM {ot} per hour for every hour worked beyond the normal hours.
+
+5. Deductions: The employer may deduct RM {deduction} per month for uniforms and accommodation provided.
+
+6. Annual Leave: 8 days of paid annual leave per year, in addition to gazetted public holidays.
+
+7. Termination: Either party may terminate this contract by giving four weeks' written notice.
+"""
+
+REPORT = {
+    "summary": {"total_clauses_found": 7},
+    "violations": [{"text": "5. Deductions: The employer may deduct", "illegal": {"deductions": {"status": "illegal"}}}],
+    "contract_risk": {},
+    "employee_data": {"employer_name": "Acme Sdn Bhd"},
+}
+
+
+def contract(name="Ali bin Abu", nric="900101-07-1234", email="ali@example.com", start="1 March 2025",
+             salary="2,000", ot="12.50", deduction="150"):
+    return CONTRACT.format(name=name, nric=nric, email=email, start=start, salary=salary, ot=ot, deduction=deduction)
+
+
+@pytest.fixture(autouse=True)
+def template_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(template_index, "DB_PATH", str(tmp_path / "templates.sqlite3"))
+    monkeypatch.setattr(template_index, "_initialized", False)
+    monkeypatch.setattr(template_index, "TEMPLATE_REUSE_ENABLED", True)
+    template_index.remember_audit(contract(), REPORT)
+
+
+def test_new_employee_on_the_same_template_reuses_the_audit():
+    report = template_index.reuse_template_audit(contract(
+        name="Siti binti Hassan", nric="950505-10-5678", email="siti@example.com", start="15 June 2025", salary="2,400"
+    ))
+    assert report is not None
+    assert report["employee_data"]["basic_salary_monthly"] == 2400
+    assert report["employee_data"]["start_date"] == "15 June 2025"
+    # A regex-read name is never put in a reused report (nor the template employee's)
+    assert "employee_name" not in report["employee_data"]
+
+
+def test_reused_finding_quoting_a_name_points_at_the_new_contract():
+    report = dict(REPORT, violations=[{"text": "Employee Name: Ali bin Abu", "illegal": {}}])
+    template_index.remember_audit(contract(ot="20.00"), report)
+
+    reused = template_index.reuse_template_audit(contract(name="Siti binti Hassan", ot="20.00"))
+    assert reused["violations"][0]["text"].startswith("Employee Name: Siti binti Hassan\n")
+
+
+@pytest.mark.parametrize("changed", [{"ot": "5.00"}, {"deduction": "600"}])
+def test_changed_overtime_or_deduction_amount_is_audited_again(changed):
+    assert template_index.reuse_template_audit(contract(name="Siti binti Hassan", **changed)) is None
+
+
+def test_salary_crossing_the_minimum_wage_is_audited_again():
+    assert template_index.reuse_template_audit(contract(salary="1,200")) is None
+
+
+def test_stored_template_holds_no_personal_details():
+    report = dict(REPORT, employee_data={"employer_name": "Acme Sdn Bhd", "employee_name": "Ali bin Abu"},
+                  violations=[{"text": "Employee Name: Ali bin Abu NRIC: 900101-07-1234", "illegal": {}}])
+    template_index.remember_audit(contract(salary="1,200"), report)
+
+    conn = sqlite3.connect(template_index.DB_PATH)
+    rows = conn.execute("SELECT * FROM templates").fetchall()
+    conn.close()
+    stored = json.dumps(rows, default=str)
+    assert len(rows) == 2
+    for personal in ("Ali bin Abu", "900101-07-1234", "ali@example.com"):
+        assert personal not in stored
+
+
+def test_auditor_name_is_masked_when_the_regex_misses_it():
+    text = contract().replace("Employee Name: Ali bin Abu", "Company Name: Acme Sdn Bhd\nEmployee: Ali bin Abu")
+    report = dict(REPORT, employee_data={"employee_name": "Ali bin Abu"})
+    template_index.remember_audit(text, report)
+
+    conn = sqlite3.connect(template_index.DB_PATH)
+    clause_keys = [row[0] for row in conn.execute("SELECT clause_keys FROM templates")]
+    conn.close()
+    assert not any("ali bin abu" in keys for keys in clause_keys)
+
+
+def test_expired_templates_are_not_reused_and_get_pruned(monkeypatch):
+    monkeypatch.setattr(template_index, "TEMPLATE_TTL_S", 0.05)
+    time.sleep(0.1)
+    assert template_index.reuse_template_audit(contract(name="Siti binti Hassan")) is None
+
+    template_index.remember_audit(contract(salary="1,200"), REPORT)
+    assert template_index.get_stats()["templates"] == 1
+
+
+def test_template_count_is_capped(monkeypatch):
+    monkeypatch.setattr(template_index, "TEMPLATE_MAX_ROWS", 2)
+    for ot in ("5.00", "6.00", "7.00"):
+        template_index.remember_audit(contract(ot=ot), REPORT)
+
+    assert template_index.get_stats()["templates"] == 2
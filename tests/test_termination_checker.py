@@ -0,0 +1,19 @@
+import pytest
+
+import termination_checker
+
+EMPLOYEE = {"name": "Ahmad Bin Ali", "role": "Software Engineer", "start_date": "1/01/2022", "salary": 5000,
+            "unused_leave": 5, "contract_type": "permanent", "probation_status": "completed"}
+
+
+@pytest.mark.parametrize("answer, legal", [
+    (True, True), ("true", True), ("Yes", True), (" TRUE ", True),
+    (False, False), ("false", False), ("No", False), ("", False), (None, False), (1, False),
+])
+def test_bulk_check_reads_legal_to_terminate_strictly(monkeypatch, answer, legal):
+    monkeypatch.setattr(
+        termination_checker, "check_termination_class",
+        lambda class_key, priority, cancel: {"legal_to_terminate": answer, "legal_reasons_if_cannot": ""}
+    )
+    (result,) = termination_checker.check_terminations([EMPLOYEE], "Misconduct")
+    assert result["legal_to_terminate"] is legal
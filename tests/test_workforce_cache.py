@@ -0,0 +1,39 @@
+import pandas as pd
+import pytest
+
+import workforce_cache
+
+CSV = b"""name,salary,years_of_service,notes
+Ali bin Abu,5000,3,
+Siti binti Hassan,4200,7,on leave
+"""
+
+
+@pytest.fixture(autouse=True)
+def workforce_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(workforce_cache, "WORKFORCE_DIR", str(tmp_path))
+
+
+def test_first_load_and_cached_reload_give_the_same_frame():
+    first = workforce_cache.load_workforce_file("employees.csv", CSV)
+    again = workforce_cache.load_workforce_file("employees.csv", CSV)
+
+    pd.testing.assert_frame_equal(first, again)
+    assert workforce_cache.get_stats()["cached"] >= 1
+    assert isinstance(again["salary"][0].item(), int)
+    assert again["salary"][0] * 2 == 10000
+
+
+def test_only_columns_arrow_cannot_type_become_text():
+    df = pd.DataFrame({
+        "name": ["Ali", "Siti"],
+        "salary": pd.Series([5000, "4,200"], dtype=object),   # Mixed: stored as text
+        "bonus": pd.Series([500, 600], dtype=object),         # Object dtype but all ints: kept as numbers
+        "notes": ["", None],
+    })
+
+    stored = workforce_cache._to_arrow(df).to_pandas()
+
+    assert list(stored["salary"]) == ["5000", "4,200"]
+    assert list(stored["bonus"]) == [500, 600]
+    assert pd.isna(stored["notes"][1])